@@ -1,4 +1,7 @@
-from django.test import TestCase
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase, override_settings
 
 from accounts.models import User
 
@@ -40,3 +43,53 @@ class UserTests(TestCase):
         self.assertTrue(self.u1.has_usable_password())
         self.assertTrue(self.u2.has_usable_password())
         self.assertTrue(self.u3.has_usable_password())
+
+
+@override_settings(DB_ENCRYPTION_KEY="k" * 32)
+class EncryptedTokenTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            "token@mail.com", "Token Owner", "demo", smartsheet_token="secret"
+        )
+
+    def stored_token(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT smartsheet_token FROM accounts_user WHERE id = %s",
+                [self.user.pk],
+            )
+            return cursor.fetchone()[0]
+
+    def test_token_is_encrypted_at_rest(self):
+        self.assertNotIn("secret", self.stored_token())
+
+    def test_decrypts_once_on_first_access(self):
+        with mock.patch("core.fields.decrypt", return_value="secret") as dec:
+            user = User.objects.get(pk=self.user.pk)
+            self.assertEqual(dec.call_count, 0)
+
+            self.assertEqual(user.smartsheet_token, "secret")
+            self.assertEqual(user.smartsheet_token, "secret")
+
+        self.assertEqual(dec.call_count, 1)
+
+    def test_untouched_token_is_saved_unchanged(self):
+        stored = self.stored_token()
+        user = User.objects.get(pk=self.user.pk)
+        user.name = "Renamed"
+        user.save()
+
+        self.assertEqual(self.stored_token(), stored)
+        self.assertEqual(
+            User.objects.get(pk=self.user.pk).smartsheet_token, "secret"
+        )
+
+    def test_assigned_token_is_encrypted(self):
+        user = User.objects.get(pk=self.user.pk)
+        user.smartsheet_token = "rotated"
+        user.save()
+
+        self.assertNotIn("rotated", self.stored_token())
+        self.assertEqual(
+            User.objects.get(pk=self.user.pk).smartsheet_token, "rotated"
+        )
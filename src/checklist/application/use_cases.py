@@ -1,7 +1,10 @@
-from dataclasses import dataclass
+from abc import ABC, abstractmethod
+from collections.abc import Iterator
+from dataclasses import asdict, dataclass
+from itertools import groupby
 
 from checklist.domain.interfaces import SheetProviderInterface
-from checklist.domain.services import TreeBuilder
+from checklist.domain.services import TreeBuilder, TreeIndex
 from checklist.domain.types import ChecklistItem
 
 
@@ -27,8 +30,13 @@ class GetChecklist:
         self.provider = provider
 
     def execute(self) -> list[ChecklistItem]:
-        items = self.provider.get_rows()
-        return TreeBuilder.build(items)
+        # The tree needs every row before it can be built, so nothing is
+        # gained by streaming; get_rows also retries and shares reads.
+        return TreeBuilder.build(self.provider.get_rows())
+
+    def rows(self) -> Iterator[ChecklistItem]:
+        """Flat rows in display order, for callers that stream them."""
+        return self.provider.iter_rows()
 
 
 class AddItem:
@@ -68,55 +76,195 @@ class DeleteItem:
         return GetChecklist(self.provider).execute()
 
 
-class IndentItem:
+def _moved_tree(
+    provider: SheetProviderInterface,
+    items: list[ChecklistItem],
+    version: int | None,
+    moved: ChecklistItem,
+    **location,
+) -> list[ChecklistItem]:
+    """Build the post-move tree from the rows read before the write.
+
+    The local result is only trusted when the write landed right on top
+    of the version we read and the row ended up under the parent we
+    expected; otherwise the sheet is read again.
+    """
+    if version is not None and provider.version != version + 1:
+        return GetChecklist(provider).execute()
+
+    rows = TreeBuilder.move(items, moved.id, **location)
+    index = next(i for i, item in enumerate(rows) if item.id == moved.id)
+    if rows[index].parent_id != moved.parent_id:
+        return GetChecklist(provider).execute()
+
+    rows[index] = moved
+    return TreeBuilder.build(rows)
+
+
+class _MoveItem(ABC):
+    """Structural move of one row, located against the current rows."""
+
     def __init__(self, provider: SheetProviderInterface):
         self.provider = provider
 
+    @staticmethod
+    @abstractmethod
+    def locate(index: TreeIndex, row_id: int) -> dict:
+        """Location arguments for the move; ValueError if impossible."""
+
     def execute(self, row_id: int) -> list[ChecklistItem]:
-        items = self.provider.get_rows()
-        sibling = TreeBuilder.find_previous_sibling(items, row_id)
+        index = TreeIndex(self.provider.get_rows())
+        version = self.provider.version
+        location = self.locate(index, row_id)
+        if "sibling_id" in location:
+            moved = self.provider.reorder_row(row_id, **location)
+        else:
+            moved = self.provider.move_row(row_id, **location)
+        return _moved_tree(
+            self.provider, index.items, version, moved, **location
+        )
+
+
+class IndentItem(_MoveItem):
+    @staticmethod
+    def locate(index: TreeIndex, row_id: int) -> dict:
+        sibling = index.previous_sibling(row_id)
         if not sibling:
             raise ValueError("Cannot indent: no sibling above")
-        self.provider.move_row(row_id, parent_id=sibling.id)
-        return GetChecklist(self.provider).execute()
-
+        return {"parent_id": sibling.id}
 
-class MoveItemUp:
-    def __init__(self, provider: SheetProviderInterface):
-        self.provider = provider
 
-    def execute(self, row_id: int) -> list[ChecklistItem]:
-        items = self.provider.get_rows()
-        sibling = TreeBuilder.find_previous_sibling(items, row_id)
+class MoveItemUp(_MoveItem):
+    @staticmethod
+    def locate(index: TreeIndex, row_id: int) -> dict:
+        sibling = index.previous_sibling(row_id)
         if not sibling:
             raise ValueError("Cannot move up: already at the top")
-        self.provider.reorder_row(row_id, sibling_id=sibling.id, above=True)
-        return GetChecklist(self.provider).execute()
+        return {"sibling_id": sibling.id, "above": True}
 
 
-class MoveItemDown:
-    def __init__(self, provider: SheetProviderInterface):
-        self.provider = provider
-
-    def execute(self, row_id: int) -> list[ChecklistItem]:
-        items = self.provider.get_rows()
-        sibling = TreeBuilder.find_next_sibling(items, row_id)
+class MoveItemDown(_MoveItem):
+    @staticmethod
+    def locate(index: TreeIndex, row_id: int) -> dict:
+        sibling = index.next_sibling(row_id)
         if not sibling:
             raise ValueError("Cannot move down: already at the bottom")
-        self.provider.reorder_row(row_id, sibling_id=sibling.id, above=False)
-        return GetChecklist(self.provider).execute()
+        return {"sibling_id": sibling.id, "above": False}
+
+
+class OutdentItem(_MoveItem):
+    @staticmethod
+    def locate(index: TreeIndex, row_id: int) -> dict:
+        parent = index.parent(row_id)
+        if not parent:
+            raise ValueError("Cannot outdent: already at top level")
+        grandparent = index.parent(parent.id)
+        return {"parent_id": grandparent.id if grandparent else None}
 
 
-class OutdentItem:
+@dataclass
+class ItemOperation:
+    op: str
+    row_id: int | None = None
+    data: CreateItemInput | UpdateItemInput | None = None
+
+
+class ApplyItemOperations:
+    """Apply a list of item operations in order, batching writes.
+
+    Every operation is first checked against the current rows with the
+    earlier ones applied, so an operation that cannot be applied fails
+    the request before anything is written. Consecutive creates,
+    updates and deletes each go upstream as one batched write;
+    structural moves run one by one against the rows kept current by
+    the provider. The tree is read once at the end.
+    """
+
+    MOVES = {
+        "indent": IndentItem,
+        "outdent": OutdentItem,
+        "move_up": MoveItemUp,
+        "move_down": MoveItemDown,
+    }
+
     def __init__(self, provider: SheetProviderInterface):
         self.provider = provider
 
-    def execute(self, row_id: int) -> list[ChecklistItem]:
+    def check(self, operations: list[ItemOperation]) -> None:
+        """Raise ValueError naming the first operation that would fail."""
         items = self.provider.get_rows()
-        parent = TreeBuilder.find_parent(items, row_id)
-        if not parent:
-            raise ValueError("Cannot outdent: already at top level")
-        grandparent = TreeBuilder.find_parent(items, parent.id)
-        new_parent_id = grandparent.id if grandparent else None
-        self.provider.move_row(row_id, parent_id=new_parent_id)
+        # Rows to be created get placeholder ids; clients cannot refer
+        # to them, but they still take up a place among their siblings.
+        new_id = -1
+        # Rows removed with a parent deleted earlier in the request.
+        deleted: set[int] = set()
+        for number, operation in enumerate(operations):
+            index = TreeIndex(items)
+            try:
+                if operation.op == "create":
+                    parent_id = operation.data.parent_id
+                    if parent_id is None:
+                        position = len(items)
+                    elif parent_id in index:
+                        position = TreeBuilder.subtree_end(
+                            items, items.index(index.get(parent_id))
+                        )
+                    else:
+                        raise ValueError(f"Row {parent_id} not found")
+                    items.insert(
+                        position,
+                        ChecklistItem(
+                            id=new_id,
+                            name="",
+                            status="",
+                            assignee="",
+                            notes="",
+                            parent_id=parent_id,
+                        ),
+                    )
+                    new_id -= 1
+                elif operation.op == "update":
+                    if operation.row_id not in index:
+                        raise ValueError(f"Row {operation.row_id} not found")
+                elif operation.op == "delete":
+                    row = index.get(operation.row_id)
+                    if row is None:
+                        if operation.row_id in deleted:
+                            continue
+                        raise ValueError(f"Row {operation.row_id} not found")
+                    start = items.index(row)
+                    end = TreeBuilder.subtree_end(items, start)
+                    deleted.update(item.id for item in items[start:end])
+                    del items[start:end]
+                else:
+                    location = self.MOVES[operation.op].locate(
+                        index, operation.row_id
+                    )
+                    items = TreeBuilder.move(
+                        items, operation.row_id, **location
+                    )
+            except ValueError as exc:
+                raise ValueError(f"Operation {number}: {exc}") from exc
+
+    def execute(self, operations: list[ItemOperation]) -> list[ChecklistItem]:
+        self.check(operations)
+        for op, run in groupby(operations, key=lambda operation: operation.op):
+            batch = list(run)
+            if op == "create":
+                self.provider.add_rows([asdict(item.data) for item in batch])
+            elif op == "update":
+                updates: dict[int, dict] = {}
+                for item in batch:
+                    fields = {
+                        k: v
+                        for k, v in vars(item.data).items()
+                        if v is not None
+                    }
+                    updates.setdefault(item.row_id, {}).update(fields)
+                self.provider.update_rows(updates)
+            elif op == "delete":
+                self.provider.delete_rows([item.row_id for item in batch])
+            else:
+                for item in batch:
+                    self.MOVES[op](self.provider).execute(item.row_id)
         return GetChecklist(self.provider).execute()
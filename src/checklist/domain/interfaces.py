@@ -1,13 +1,27 @@
 from abc import ABC, abstractmethod
+from collections.abc import Iterator
 
 from checklist.domain.types import ChecklistItem
 
 
 class SheetProviderInterface(ABC):
+    @property
+    def version(self) -> int | None:
+        """Sheet version seen by the last read or write, if known."""
+        return None
+
+    def get_cached_rows(self, version: int) -> list[ChecklistItem] | None:
+        """Rows as they were at version, if the provider still has them."""
+        return None
+
     @abstractmethod
     def get_rows(self) -> list[ChecklistItem]:
         pass
 
+    def iter_rows(self) -> Iterator[ChecklistItem]:
+        """Rows in display order, possibly read lazily as they arrive."""
+        return iter(self.get_rows())
+
     @abstractmethod
     def add_row(
         self,
@@ -36,3 +50,19 @@ class SheetProviderInterface(ABC):
         self, row_id: int, sibling_id: int, above: bool = True
     ) -> ChecklistItem:
         pass
+
+    def add_rows(self, rows: list[dict]) -> list[ChecklistItem]:
+        """Add rows given as add_row keyword arguments, in order."""
+        return [self.add_row(**row) for row in rows]
+
+    def update_rows(self, updates: dict[int, dict]) -> list[ChecklistItem]:
+        """Update the fields of several rows, keyed by row id."""
+        return [
+            self.update_row(row_id, **fields)
+            for row_id, fields in updates.items()
+        ]
+
+    def delete_rows(self, row_ids: list[int]) -> None:
+        """Delete rows together with their children."""
+        for row_id in row_ids:
+            self.delete_row(row_id)
@@ -3,6 +3,8 @@ import uuid
 from django.conf import settings
 from django.db import models
 
+from core.fields import EncryptedCharField
+
 
 class Sheet(models.Model):
     uuid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
@@ -13,6 +15,15 @@ class Sheet(models.Model):
     )
     smartsheet_id = models.BigIntegerField()
     name = models.CharField(max_length=255)
+    webhook_id = models.BigIntegerField(null=True, blank=True)
+    webhook_secret = EncryptedCharField(max_length=255, blank=True)
+    # Sheet version held in the row mirror and when it was last known to
+    # be current; mirrored_at is cleared when the sheet changes.
+    mirror_version = models.BigIntegerField(null=True, blank=True)
+    mirrored_at = models.DateTimeField(null=True, blank=True)
+    # Bumped on every change, so a sync that read the sheet before the
+    # change cannot mark the mirror current.
+    revision = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -21,3 +32,58 @@ class Sheet(models.Model):
 
     def __str__(self):
         return self.name
+
+
+class SheetRow(models.Model):
+    """Row of a sheet as last mirrored from Smartsheet."""
+
+    sheet = models.ForeignKey(
+        Sheet, on_delete=models.CASCADE, related_name="rows"
+    )
+    row_id = models.BigIntegerField()
+    parent_id = models.BigIntegerField(null=True, blank=True)
+    position = models.PositiveIntegerField()
+    indent = models.PositiveSmallIntegerField(default=0)
+    name = models.TextField(blank=True)
+    status = models.CharField(max_length=255, blank=True)
+    assignee = models.CharField(max_length=255, blank=True)
+    notes = models.TextField(blank=True)
+    version = models.BigIntegerField()
+
+    class Meta:
+        unique_together = ["sheet", "position"]
+        ordering = ["sheet", "position"]
+
+    def __str__(self):
+        return self.name
+
+
+class PendingWrite(models.Model):
+    """Row change accepted by the API but not yet sent to Smartsheet."""
+
+    class Op(models.TextChoices):
+        UPDATE = "update"
+        DELETE = "delete"
+
+    class Status(models.TextChoices):
+        PENDING = "pending"
+        FAILED = "failed"
+
+    sheet = models.ForeignKey(
+        Sheet, on_delete=models.CASCADE, related_name="pending_writes"
+    )
+    op = models.CharField(max_length=16, choices=Op.choices)
+    row_id = models.BigIntegerField()
+    data = models.JSONField(default=dict, blank=True)
+    status = models.CharField(
+        max_length=16, choices=Status.choices, default=Status.PENDING
+    )
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [models.Index(fields=["sheet", "status"])]
+
+    def __str__(self):
+        return f"{self.op} row {self.row_id}"
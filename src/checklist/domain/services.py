@@ -1,69 +1,200 @@
-from checklist.domain.types import ChecklistItem
+from collections.abc import Iterable, Iterator
+from dataclasses import replace
 
+from checklist.domain.types import ChecklistDelta, ChecklistItem, ChildOrder
 
-class TreeBuilder:
-    @staticmethod
-    def build(items: list[ChecklistItem]) -> list[ChecklistItem]:
-        """Build tree from flat list in single pass."""
-        items_by_id = {}
-        roots = []
 
-        for item in items:
-            item.children = []
-            items_by_id[item.id] = item
+class TreeIndex:
+    """Flat rows indexed once for parent, sibling and depth lookups.
 
-        for item in items:
-            if item.parent_id and item.parent_id in items_by_id:
-                items_by_id[item.parent_id].children.append(item)
-            else:
-                roots.append(item)
+    Rows whose parent is not among the items are treated as roots, the
+    same way the tree is built.
+    """
 
-        return roots
+    def __init__(self, items: Iterable[ChecklistItem]):
+        self.items = list(items)
+        self.by_id: dict[int, ChecklistItem] = {}
+        self.children: dict[int | None, list[int]] = {}
+        self._position: dict[int, int] = {}
+        self._depth: dict[int, int] = {}
 
-    @staticmethod
-    def find_previous_sibling(
-        items: list[ChecklistItem], row_id: int
-    ) -> ChecklistItem | None:
-        """Find sibling directly above target in single pass."""
-        items_by_id = {item.id: item for item in items}
-        target = items_by_id.get(row_id)
-        if not target:
+        for item in self.items:
+            self.by_id[item.id] = item
+        for item in self.items:
+            parent_id = self.parent_id(item.id)
+            siblings = self.children.setdefault(parent_id, [])
+            self._position[item.id] = len(siblings)
+            siblings.append(item.id)
+
+    def __contains__(self, row_id: int) -> bool:
+        return row_id in self.by_id
+
+    def get(self, row_id: int) -> ChecklistItem | None:
+        return self.by_id.get(row_id)
+
+    def parent_id(self, row_id: int) -> int | None:
+        parent_id = self.by_id[row_id].parent_id
+        return parent_id if parent_id in self.by_id else None
+
+    def parent(self, row_id: int) -> ChecklistItem | None:
+        if row_id not in self.by_id:
             return None
+        return self.by_id.get(self.parent_id(row_id))
 
-        prev = None
-        for item in items:
-            if item.parent_id == target.parent_id:
-                if item.id == row_id:
-                    return prev
-                prev = item
-        return None
+    def siblings(self, row_id: int) -> list[int]:
+        return self.children[self.parent_id(row_id)]
 
-    @staticmethod
-    def find_next_sibling(
-        items: list[ChecklistItem], row_id: int
-    ) -> ChecklistItem | None:
-        """Find sibling directly below target in single pass."""
-        items_by_id = {item.id: item for item in items}
-        target = items_by_id.get(row_id)
-        if not target:
+    def previous_sibling(self, row_id: int) -> ChecklistItem | None:
+        if row_id not in self.by_id:
             return None
+        position = self._position[row_id]
+        if position == 0:
+            return None
+        return self.by_id[self.siblings(row_id)[position - 1]]
+
+    def next_sibling(self, row_id: int) -> ChecklistItem | None:
+        if row_id not in self.by_id:
+            return None
+        siblings = self.siblings(row_id)
+        position = self._position[row_id] + 1
+        if position == len(siblings):
+            return None
+        return self.by_id[siblings[position]]
 
-        found = False
-        for item in items:
-            if item.parent_id == target.parent_id:
-                if found:
-                    return item
-                if item.id == row_id:
-                    found = True
-        return None
+    def depth(self, row_id: int) -> int:
+        """Nesting level of a row, 0 for roots."""
+        if row_id not in self._depth:
+            parent_id = self.parent_id(row_id)
+            self._depth[row_id] = (
+                0 if parent_id is None else self.depth(parent_id) + 1
+            )
+        return self._depth[row_id]
 
+    def subtree(self, row_id: int) -> Iterator[ChecklistItem]:
+        """Yield a row and its descendants in display order."""
+        stack = [row_id]
+        while stack:
+            current = stack.pop()
+            yield self.by_id[current]
+            stack.extend(reversed(self.children.get(current, [])))
+
+    def tree(self) -> list[ChecklistItem]:
+        """Attach children to their parents and return the roots."""
+        for item in self.items:
+            child_ids = self.children.get(item.id)
+            item.children = (
+                [self.by_id[child_id] for child_id in child_ids]
+                if child_ids
+                else ()
+            )
+        return [self.by_id[row_id] for row_id in self.children.get(None, [])]
+
+
+class TreeBuilder:
     @staticmethod
-    def find_parent(
-        items: list[ChecklistItem], row_id: int
-    ) -> ChecklistItem | None:
-        """Find parent of target using dict lookup."""
-        items_by_id = {item.id: item for item in items}
-        target = items_by_id.get(row_id)
-        if not target or not target.parent_id:
-            return None
-        return items_by_id.get(target.parent_id)
+    def build(items: Iterable[ChecklistItem]) -> list[ChecklistItem]:
+        """Build tree from flat list in single pass."""
+        return TreeIndex(items).tree()
+
+    @staticmethod
+    def flatten(tree: list[ChecklistItem]) -> list[ChecklistItem]:
+        """Flatten tree back into display order."""
+        items = []
+        stack = list(reversed(tree))
+        while stack:
+            item = stack.pop()
+            items.append(item)
+            stack.extend(reversed(item.children))
+        return items
+
+    @staticmethod
+    def subtree_end(items: list[ChecklistItem], index: int) -> int:
+        """Index just past the rows nested under items[index]."""
+        ids = {items[index].id}
+        end = index + 1
+        while end < len(items) and items[end].parent_id in ids:
+            ids.add(items[end].id)
+            end += 1
+        return end
+
+    @classmethod
+    def move(
+        cls,
+        items: list[ChecklistItem],
+        row_id: int,
+        parent_id: int | None = None,
+        sibling_id: int | None = None,
+        above: bool = False,
+    ) -> list[ChecklistItem]:
+        """Relocate a row with its subtree the way Smartsheet would.
+
+        Mirrors the location specifiers sent by the gateway: next to
+        ``sibling_id`` (above it, or below its subtree), as the first
+        child of ``parent_id``, or at the top of the sheet when neither
+        is given. Returns a new flat list in display order.
+        """
+        index = next(i for i, item in enumerate(items) if item.id == row_id)
+        end = cls.subtree_end(items, index)
+        block = items[index:end]
+        rest = items[:index] + items[end:]
+
+        if sibling_id is not None:
+            position = next(
+                i for i, item in enumerate(rest) if item.id == sibling_id
+            )
+            parent_id = rest[position].parent_id
+            if not above:
+                position = cls.subtree_end(rest, position)
+        elif parent_id is not None:
+            position = 1 + next(
+                i for i, item in enumerate(rest) if item.id == parent_id
+            )
+        else:
+            position = 0
+
+        block[0] = replace(block[0], parent_id=parent_id, children=())
+        rest[position:position] = block
+        return rest
+
+
+class TreeDiff:
+    FIELDS = ("name", "status", "assignee", "notes", "parent_id")
+
+    @classmethod
+    def compute(
+        cls,
+        before: list[ChecklistItem],
+        after: list[ChecklistItem],
+        version: int | None = None,
+    ) -> ChecklistDelta:
+        """Diff two flat row lists into changed, removed and reordered."""
+        before_by_id = {item.id: item for item in before}
+        after_ids = {item.id for item in after}
+
+        changed = [
+            item
+            for item in after
+            if item.id not in before_by_id
+            or any(
+                getattr(item, name) != getattr(before_by_id[item.id], name)
+                for name in cls.FIELDS
+            )
+        ]
+        removed = [item.id for item in before if item.id not in after_ids]
+
+        before_order = TreeIndex(before).children
+        after_order = TreeIndex(after).children
+        order = [
+            ChildOrder(parent_id=parent_id, children=children)
+            for parent_id, children in after_order.items()
+            if before_order.get(parent_id) != children
+        ]
+        order.extend(
+            ChildOrder(parent_id=parent_id, children=())
+            for parent_id in before_order
+            if parent_id not in after_order and parent_id in after_ids
+        )
+
+        return ChecklistDelta(
+            version=version, changed=changed, removed=removed, order=order
+        )
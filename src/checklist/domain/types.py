@@ -1,7 +1,8 @@
+from collections.abc import Sequence
 from dataclasses import dataclass, field
 
 
-@dataclass
+@dataclass(slots=True)
 class ChecklistItem:
     id: int
     name: str
@@ -10,12 +11,28 @@ class ChecklistItem:
     notes: str
     parent_id: int | None = None
     indent: int = 0
-    children: list["ChecklistItem"] = field(default_factory=list)
+    # Shared empty tuple until the row is placed in a tree, so flat row
+    # lists don't carry an empty list per row.
+    children: Sequence["ChecklistItem"] = ()
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ColumnMap:
     name: int
     status: int
     assignee: int
     notes: int
+
+
+@dataclass
+class ChildOrder:
+    parent_id: int | None
+    children: list[int]
+
+
+@dataclass
+class ChecklistDelta:
+    version: int | None
+    changed: list[ChecklistItem] = field(default_factory=list)
+    removed: list[int] = field(default_factory=list)
+    order: list[ChildOrder] = field(default_factory=list)
@@ -0,0 +1,506 @@
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, replace
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+from checklist.domain.services import TreeBuilder
+from checklist.domain.types import ChecklistItem, ColumnMap
+
+logger = logging.getLogger(__name__)
+
+# Cache backends whose entries only the current process can see.
+PROCESS_LOCAL_CACHES = (LocMemCache, DummyCache)
+
+
+@dataclass
+class CachedSheet:
+    version: int
+    items: list[ChecklistItem]
+    # SheetChanges stamp seen before the rows were read, if any.
+    stamp: str | None = None
+
+
+def _copy(items: list[ChecklistItem]) -> list[ChecklistItem]:
+    return [replace(item, children=()) for item in items]
+
+
+def _fits(
+    items: list[ChecklistItem], position: int, parent_id: int | None
+) -> bool:
+    """Check that a row with parent_id can sit at position."""
+    by_id = {item.id: item for item in items}
+    if parent_id is not None and parent_id not in by_id:
+        return False
+
+    lineage = {None}
+    current = parent_id
+    while current is not None and current not in lineage:
+        lineage.add(current)
+        current = by_id[current].parent_id if current in by_id else None
+
+    if position < len(items) and items[position].parent_id not in lineage:
+        return False
+
+    if parent_id is None:
+        return True
+    if position == 0:
+        return False
+    previous = items[position - 1]
+    while previous is not None:
+        if previous.id == parent_id:
+            return True
+        previous = by_id.get(previous.parent_id)
+    return False
+
+
+def _place(
+    items: list[ChecklistItem], item: ChecklistItem, row_number: int | None
+) -> bool:
+    """Move or insert item, with its subtree, at 1-based row_number."""
+    if not row_number:
+        return False
+
+    index = next((i for i, row in enumerate(items) if row.id == item.id), None)
+    if index is None:
+        block = [item]
+    else:
+        end = TreeBuilder.subtree_end(items, index)
+        block = [item, *items[index + 1 : end]]
+        del items[index:end]
+
+    position = row_number - 1
+    if position > len(items) or not _fits(items, position, item.parent_id):
+        return False
+    items[position:position] = block
+    return True
+
+
+def _remove(items: list[ChecklistItem], row_ids: list[int]) -> bool:
+    for row_id in row_ids:
+        index = next(
+            (i for i, row in enumerate(items) if row.id == row_id), None
+        )
+        if index is not None:
+            del items[index : TreeBuilder.subtree_end(items, index)]
+    return True
+
+
+class RowCache:
+    """Process-wide flat row cache keyed by Smartsheet sheet id.
+
+    Rows are kept in display order, the way ``Sheets.get_sheet`` returns
+    them. A write response only patches an entry when it carries the
+    next sheet version; anything else means the sheet moved on without
+    us, so the entry is dropped and the next read goes upstream.
+    """
+
+    def __init__(self, max_sheets: int = 256):
+        self.max_sheets = max_sheets
+        self._sheets: OrderedDict[int, CachedSheet] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(
+        self, sheet_id: int, version: int | None = None
+    ) -> list[ChecklistItem] | None:
+        with self._lock:
+            entry = self._sheets.get(sheet_id)
+            if entry is None:
+                return None
+            if version is not None and entry.version != version:
+                return None
+            self._sheets.move_to_end(sheet_id)
+            return _copy(entry.items)
+
+    def version(self, sheet_id: int) -> int | None:
+        with self._lock:
+            entry = self._sheets.get(sheet_id)
+            return entry.version if entry is not None else None
+
+    def stamp(self, sheet_id: int) -> str | None:
+        with self._lock:
+            entry = self._sheets.get(sheet_id)
+            return entry.stamp if entry is not None else None
+
+    def store(
+        self,
+        sheet_id: int,
+        version: int,
+        items: list[ChecklistItem],
+        stamp: str | None = None,
+    ) -> None:
+        with self._lock:
+            entry = self._sheets.get(sheet_id)
+            if entry is not None and entry.version > version:
+                return
+            self._sheets[sheet_id] = CachedSheet(version, _copy(items), stamp)
+            self._sheets.move_to_end(sheet_id)
+            while len(self._sheets) > self.max_sheets:
+                self._sheets.popitem(last=False)
+
+    def confirm(self, sheet_id: int, version: int, stamp: str | None) -> None:
+        """Record that the entry was still current when stamp was read."""
+        with self._lock:
+            entry = self._sheets.get(sheet_id)
+            if entry is not None and entry.version == version:
+                entry.stamp = stamp
+
+    def invalidate(self, sheet_id: int) -> None:
+        with self._lock:
+            self._sheets.pop(sheet_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sheets.clear()
+
+    def place_rows(
+        self,
+        sheet_id: int,
+        version: int | None,
+        rows: list[tuple[ChecklistItem, int | None]],
+    ) -> bool:
+        """Apply added/updated rows at their returned row numbers."""
+        return self._patch(
+            sheet_id,
+            version,
+            lambda items: all(
+                _place(items, replace(item, children=()), row_number)
+                for item, row_number in rows
+            ),
+        )
+
+    def remove_rows(
+        self, sheet_id: int, version: int | None, row_ids: list[int]
+    ) -> bool:
+        """Drop deleted rows together with their children."""
+        return self._patch(
+            sheet_id, version, lambda items: _remove(items, row_ids)
+        )
+
+    def _patch(self, sheet_id, version, apply) -> bool:
+        with self._lock:
+            entry = self._sheets.get(sheet_id)
+            if entry is None:
+                return False
+            if version is not None and entry.version >= version:
+                # Already fetched after this write landed upstream.
+                return entry.version == version
+            if version is None or entry.version + 1 != version:
+                logger.debug(
+                    "Dropping cached rows for sheet %s: version %s -> %s",
+                    sheet_id,
+                    entry.version,
+                    version,
+                )
+                del self._sheets[sheet_id]
+                return False
+
+            items = list(entry.items)
+            if not apply(items):
+                logger.debug(
+                    "Dropping cached rows for sheet %s: patch did not fit",
+                    sheet_id,
+                )
+                del self._sheets[sheet_id]
+                return False
+
+            entry.version = version
+            entry.items = items
+            self._sheets.move_to_end(sheet_id)
+            return True
+
+
+class ColumnMapCache:
+    """Column ids per Smartsheet sheet, shared by all gateways.
+
+    Maps live in process memory and, when ``alias`` names a Django
+    cache, also there, so other workers skip the sheet download that
+    discovering column ids would otherwise cost.
+    """
+
+    key_prefix = "smartsheet:columns"
+
+    def __init__(self, alias: str | None = None):
+        self.alias = alias
+        self._maps: dict[int, ColumnMap] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, sheet_id: int) -> str:
+        return f"{self.key_prefix}:{sheet_id}"
+
+    def get(self, sheet_id: int) -> ColumnMap | None:
+        with self._lock:
+            column_map = self._maps.get(sheet_id)
+        if column_map is not None or self.alias is None:
+            return column_map
+
+        data = caches[self.alias].get(self._key(sheet_id))
+        if data is None:
+            return None
+        column_map = ColumnMap(**data)
+        with self._lock:
+            self._maps[sheet_id] = column_map
+        return column_map
+
+    def store(self, sheet_id: int, column_map: ColumnMap) -> None:
+        with self._lock:
+            if self._maps.get(sheet_id) == column_map:
+                return
+            self._maps[sheet_id] = column_map
+        if self.alias is not None:
+            caches[self.alias].set(
+                self._key(sheet_id), asdict(column_map), timeout=None
+            )
+
+    def invalidate(self, sheet_id: int) -> None:
+        with self._lock:
+            self._maps.pop(sheet_id, None)
+        if self.alias is not None:
+            caches[self.alias].delete(self._key(sheet_id))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._maps.clear()
+
+
+class SheetChanges:
+    """Change stamps for sheets watched by a Smartsheet webhook.
+
+    Every webhook callback gives the sheet a fresh random stamp in the
+    cache named by ``alias``. Rows cached under the stamp that is still
+    current cannot have changed upstream, so they are served without
+    asking Smartsheet for the sheet version. That only holds when every
+    worker sees the stamp the callback set, so stamps are ignored while
+    the alias is a per-process backend such as LocMemCache. A sheet
+    without a stamp, or any stamp while webhooks are disabled, tells
+    nothing and reads fall back to the version check.
+    """
+
+    key_prefix = "smartsheet:changes"
+
+    def __init__(self, alias: str = "default"):
+        self.alias = alias
+        self._warned = False
+
+    @property
+    def enabled(self) -> bool:
+        if not settings.SMARTSHEET_WEBHOOK_URL:
+            return False
+        if isinstance(caches[self.alias], PROCESS_LOCAL_CACHES):
+            if not self._warned:
+                self._warned = True
+                logger.warning(
+                    "Cache %r is not shared between workers; webhook "
+                    "callbacks will not let reads skip the version check",
+                    self.alias,
+                )
+            return False
+        return True
+
+    def _key(self, sheet_id: int) -> str:
+        return f"{self.key_prefix}:{sheet_id}"
+
+    def stamp(self, sheet_id: int) -> str | None:
+        if not self.enabled:
+            return None
+        return caches[self.alias].get(self._key(sheet_id))
+
+    def bump(self, sheet_id: int) -> None:
+        caches[self.alias].set(
+            self._key(sheet_id), uuid.uuid4().hex, timeout=None
+        )
+
+    def forget(self, sheet_id: int) -> None:
+        caches[self.alias].delete(self._key(sheet_id))
+
+
+class SheetEvents:
+    """Numbered change events of each sheet, for pushing to clients.
+
+    Events are numbered per sheet by a counter in the cache named by
+    ``alias`` and kept there for SMARTSHEET_EVENTS_TTL seconds, so every
+    worker sharing the cache can serve them and a client reconnecting
+    with the last id it saw gets what it missed. Listeners in the
+    publishing process are woken at once; listeners elsewhere see the
+    event on their next poll.
+    """
+
+    key_prefix = "smartsheet:events"
+
+    # Clients further behind than this are told to reload instead.
+    max_backlog = 100
+
+    def __init__(self, alias: str = "default"):
+        self.alias = alias
+        self._published = threading.Condition()
+
+    def _key(self, sheet_id: int, suffix) -> str:
+        return f"{self.key_prefix}:{sheet_id}:{suffix}"
+
+    def last_id(self, sheet_id: int) -> int:
+        return caches[self.alias].get(self._key(sheet_id, "last")) or 0
+
+    def publish(self, sheet_id: int, data: dict) -> int:
+        cache = caches[self.alias]
+        counter = self._key(sheet_id, "last")
+        cache.add(counter, 0, timeout=None)
+        try:
+            event_id = cache.incr(counter)
+        except ValueError:
+            # Evicted since the add. Start over; listeners ahead of the
+            # new counter are told to reload.
+            cache.set(counter, event_id := 1, timeout=None)
+        cache.set(
+            self._key(sheet_id, event_id),
+            data,
+            timeout=settings.SMARTSHEET_EVENTS_TTL,
+        )
+        with self._published:
+            self._published.notify_all()
+        return event_id
+
+    def since(
+        self, sheet_id: int, event_id: int
+    ) -> list[tuple[int, dict | None]]:
+        """Events published after event_id, oldest first.
+
+        If some of them are no longer kept, a single ``None`` event
+        with the latest id stands in for all of them.
+        """
+        last = self.last_id(sheet_id)
+        if event_id == last:
+            return []
+        if event_id > last or last - event_id > self.max_backlog:
+            return [(last, None)]
+
+        keys = {
+            self._key(sheet_id, number): number
+            for number in range(event_id + 1, last + 1)
+        }
+        found = caches[self.alias].get_many(keys)
+        if len(found) < len(keys):
+            return [(last, None)]
+        return [(keys[key], found[key]) for key in keys]
+
+    def wait(self, timeout: float) -> None:
+        """Block until an event is published in this process or timeout."""
+        with self._published:
+            self._published.wait(timeout)
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    """Let concurrent callers with the same key share one call.
+
+    The first caller runs the function; callers arriving while it is in
+    flight wait for it and get the same result or exception.
+    """
+
+    def __init__(self):
+        self._flights: dict = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func) -> tuple[object, bool]:
+        """Return func's result and whether it came from another caller."""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            flight.result = func()
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result, False
+
+
+class _Batch:
+    def __init__(self):
+        self.updates: dict[int, dict] = {}
+        self.done = threading.Event()
+        self.result = None
+        self.error: BaseException | None = None
+
+
+class EditCoalescer:
+    """Merge row updates with the same key that arrive close together.
+
+    The first caller opens a batch and waits ``window`` seconds; fields
+    sent by callers arriving meanwhile are merged into it per row, later
+    values winning. The first caller then sends the merged updates once
+    and every caller gets the same result or exception.
+    """
+
+    def __init__(self):
+        self._batches: dict = {}
+        self._lock = threading.Lock()
+
+    def submit(
+        self, key, row_id: int, fields: dict, send, window: float
+    ) -> tuple[object, bool]:
+        """Return send's result and whether another caller sent it."""
+        with self._lock:
+            batch = self._batches.get(key)
+            leader = batch is None
+            if leader:
+                batch = self._batches[key] = _Batch()
+            batch.updates.setdefault(row_id, {}).update(fields)
+
+        if not leader:
+            batch.done.wait()
+            if batch.error is not None:
+                raise batch.error
+            return batch.result, True
+
+        time.sleep(window)
+        with self._lock:
+            # Callers arriving from now on start the next batch.
+            del self._batches[key]
+        try:
+            batch.result = send(batch.updates)
+        except BaseException as exc:
+            batch.error = exc
+            raise
+        finally:
+            batch.done.set()
+        return batch.result, False
+
+
+row_cache = RowCache(
+    max_sheets=getattr(settings, "SMARTSHEET_ROW_CACHE_SIZE", 256)
+)
+column_map_cache = ColumnMapCache(
+    alias=getattr(settings, "SMARTSHEET_COLUMN_MAP_CACHE", None)
+)
+sheet_changes = SheetChanges(
+    alias=getattr(settings, "SMARTSHEET_WEBHOOK_CACHE", "default")
+)
+sheet_events = SheetEvents(
+    alias=getattr(settings, "SMARTSHEET_EVENTS_CACHE", "default")
+)
+sheet_reads = SingleFlight()
+row_edits = EditCoalescer()
@@ -1,20 +1,166 @@
+import hashlib
 import logging
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Iterator
+from dataclasses import dataclass, replace
 from functools import lru_cache
+from http.cookiejar import DefaultCookiePolicy
+from itertools import batched, groupby
 
+from django.conf import settings
+
+import requests
 import smartsheet
 from checklist.domain.interfaces import SheetProviderInterface
 from checklist.domain.types import ChecklistItem, ColumnMap
+from checklist.infrastructure.cache import (
+    column_map_cache,
+    row_cache,
+    row_edits,
+    sheet_changes,
+    sheet_reads,
+)
+from checklist.infrastructure.metrics import instrument_session, traced
+from checklist.infrastructure.ratelimit import (
+    JitteredBackoff,
+    RateLimitedSession,
+    bucket,
+)
+from smartsheet.session import pinned_session
 
 logger = logging.getLogger(__name__)
 
 
-@lru_cache(maxsize=128)
+@lru_cache(maxsize=1)
+def get_smartsheet_session() -> requests.Session:
+    """HTTP session shared by every Smartsheet client in the process.
+
+    The SDK sets the Authorization header on each request, so clients
+    for different tokens can safely reuse one keep-alive pool. The pool
+    blocks instead of opening throwaway connections once it is full,
+    and cookies are never stored so nothing leaks between users. Every
+    request, retries included, is paced by the per-token bucket and
+    recorded in the upstream metrics.
+    """
+    size = settings.SMARTSHEET_MAX_CONNECTIONS
+    pinned = pinned_session(pool_maxsize=size)
+    adapter = pinned.get_adapter("https://")
+    adapter.init_poolmanager(1, size, block=True)
+
+    session = RateLimitedSession(bucket)
+    session.hooks = pinned.hooks
+    session.mount("https://", adapter)
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    return instrument_session(session)
+
+
+def use_session(
+    client: smartsheet.Smartsheet, session: requests.Session
+) -> None:
+    """Send every request of ``client`` through ``session``.
+
+    The SDK takes no session of its own, but sends and prepares all
+    requests through its private ``_session`` attribute, so that is
+    replaced here and nowhere else. SmartsheetClientTests fails if an
+    SDK release stops doing so.
+    """
+    if not hasattr(client, "_session"):
+        raise RuntimeError(
+            "smartsheet.Smartsheet no longer has a _session to replace"
+        )
+    client._session = session
+
+
+@dataclass
+class ClientPoolStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+
+class ClientPool:
+    """Smartsheet clients reused across requests, one per token.
+
+    Clients are keyed by a hash of the token, so raw tokens are not
+    kept as keys, and dropped once ``max_size`` is exceeded or after
+    ``ttl`` seconds without use. Dropping a client is cheap: all of
+    them send through the one shared session and its connection pool.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.stats = ClientPoolStats()
+        # token hash -> (client, last used)
+        self._clients: OrderedDict[str, tuple] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> smartsheet.Smartsheet:
+        key = self._key(token)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._clients.get(key)
+            if entry is not None and now - entry[1] <= self.ttl:
+                self.stats.hits += 1
+                self._clients[key] = (entry[0], now)
+                self._clients.move_to_end(key)
+                return entry[0]
+            self.stats.misses += 1
+            if entry is not None:
+                self.stats.evictions += 1
+
+        client = self._create(token)
+        with self._lock:
+            self._clients[key] = (client, now)
+            self._clients.move_to_end(key)
+            while len(self._clients) > self.max_size:
+                self._clients.popitem(last=False)
+                self.stats.evictions += 1
+        return client
+
+    def _create(self, token: str) -> smartsheet.Smartsheet:
+        client = smartsheet.Smartsheet(
+            token,
+            # The session the SDK builds is replaced by the shared one,
+            # so keep its throwaway pool as small as possible.
+            max_connections=1,
+            user_agent="smartsheet-integration",
+            max_retry_time=JitteredBackoff(max_retry_time=30),
+        )
+        use_session(client, get_smartsheet_session())
+        client.errors_as_exceptions(True)
+        return client
+
+    def clear(self) -> None:
+        with self._lock:
+            self._clients.clear()
+
+
+client_pool = ClientPool(
+    max_size=settings.SMARTSHEET_CLIENT_POOL_SIZE,
+    ttl=settings.SMARTSHEET_CLIENT_TTL,
+)
+
+
 def get_smartsheet_client(token: str) -> smartsheet.Smartsheet:
-    """For session caching purposes"""
-    client = smartsheet.Smartsheet(token)
-    client.errors_as_exceptions(True)
-    return client
+    return client_pool.get(token)
+
 
+# Smartsheet error code for "The columnId {0} is invalid."
+INVALID_COLUMN_ERROR = 1036
+
+# Rows per add/update request, and row ids per delete request, which go
+# in the query string.
+MAX_ROWS_PER_REQUEST = 500
+MAX_DELETE_IDS_PER_REQUEST = 100
+
+CELL_FIELDS = ("name", "status", "assignee", "notes")
 
 SHEET_COLUMNS = [
     {"title": "Task Name", "type": "TEXT_NUMBER", "primary": True},
@@ -28,13 +174,28 @@ SHEET_COLUMNS = [
 ]
 
 
+def _cell_fields(data: dict) -> dict:
+    return {name: data[name] for name in CELL_FIELDS if name in data}
+
+
+class SheetChangedError(Exception):
+    """The sheet version moved on between pages of one read."""
+
+
 class SmartsheetGateway(SheetProviderInterface):
     def __init__(self, token: str, sheet_id: int):
         self.client = get_smartsheet_client(token)
         self.sheet_id = sheet_id
+        # Rows per get_sheet page; 0 downloads the sheet in one request.
+        self.page_size = settings.SMARTSHEET_PAGE_SIZE
         self._column_map: ColumnMap | None = None
+        # Sheet version this gateway last saw upstream, from a fetch or
+        # from a write response. Reads only trust the row cache when it
+        # holds exactly this version.
+        self._version: int | None = None
 
     @classmethod
+    @traced
     def create_sheet(cls, token: str, name: str) -> int:
         client = get_smartsheet_client(token)
 
@@ -58,11 +219,57 @@ class SmartsheetGateway(SheetProviderInterface):
         )
         return response.result.id
 
+    @classmethod
+    @traced
+    def create_webhook(
+        cls, token: str, sheet_id: int, callback_url: str
+    ) -> tuple[int, str]:
+        """Subscribe callback_url to every change on the sheet.
+
+        Enabling the webhook makes Smartsheet send the verification
+        challenge to callback_url, so the receiver must already be up.
+        Returns the webhook id and the secret callbacks are signed with.
+        """
+        client = get_smartsheet_client(token)
+        webhook = smartsheet.models.Webhook(
+            {
+                "name": f"checklist-{sheet_id}",
+                "callbackUrl": callback_url,
+                "scope": "sheet",
+                "scopeObjectId": sheet_id,
+                "events": ["*.*"],
+                "version": 1,
+            }
+        )
+        created = client.Webhooks.create_webhook(webhook).result
+        client.Webhooks.update_webhook(
+            created.id, smartsheet.models.Webhook({"enabled": True})
+        )
+        sheet_changes.bump(sheet_id)
+        logger.info(
+            "Created Smartsheet webhook %s for sheet %s", created.id, sheet_id
+        )
+        return created.id, created.shared_secret
+
+    @classmethod
+    @traced
+    def delete_webhook(cls, token: str, webhook_id: int) -> None:
+        client = get_smartsheet_client(token)
+        client.Webhooks.delete_webhook(webhook_id)
+        logger.info("Deleted Smartsheet webhook %s", webhook_id)
+
     def _get_column_map(self) -> ColumnMap:
         if self._column_map:
             return self._column_map
 
-        sheet = self.client.Sheets.get_sheet(self.sheet_id)
+        self._column_map = column_map_cache.get(self.sheet_id)
+        if self._column_map:
+            return self._column_map
+
+        self._fetch_sheet()
+        return self._column_map
+
+    def _set_column_map(self, sheet) -> None:
         col_map = {}
         for col in sheet.columns:
             col_map[col.title] = col.id
@@ -73,7 +280,35 @@ class SmartsheetGateway(SheetProviderInterface):
             assignee=col_map.get("Assignee", 0),
             notes=col_map.get("Notes", 0),
         )
-        return self._column_map
+        column_map_cache.store(self.sheet_id, self._column_map)
+
+    def _cells(self, fields: dict) -> list[dict]:
+        col_map = self._get_column_map()
+        return [
+            {"column_id": getattr(col_map, name), "value": value}
+            for name, value in fields.items()
+        ]
+
+    def _send_cells(self, send, rows: list[tuple]):
+        """Send (row, fields) pairs with fields keyed by column id.
+
+        A column map shared across requests can outlive the columns it
+        points at; when Smartsheet rejects a column id the map is
+        dropped, read again and the write retried once.
+        """
+        for row, fields in rows:
+            row.cells = self._cells(fields)
+        try:
+            return send(self.sheet_id, [row for row, _ in rows])
+        except smartsheet.exceptions.ApiError as exc:
+            if getattr(exc.error.result, "code", None) != INVALID_COLUMN_ERROR:
+                raise
+            logger.info("Column ids for sheet %s are stale", self.sheet_id)
+            column_map_cache.invalidate(self.sheet_id)
+            self._column_map = None
+            for row, fields in rows:
+                row.cells = self._cells(fields)
+            return send(self.sheet_id, [row for row, _ in rows])
 
     def _row_to_item(self, row) -> ChecklistItem:
         col_map = self._get_column_map()
@@ -89,14 +324,191 @@ class SmartsheetGateway(SheetProviderInterface):
             indent=row.indent or 0,
         )
 
-    def get_rows(self) -> list[ChecklistItem]:
+    def _get_sheet(self, **params):
+        """Download (a page of) the sheet, limited to the mapped columns."""
+        column_map = self._column_map or column_map_cache.get(self.sheet_id)
+        if column_map is None:
+            return self.client.Sheets.get_sheet(self.sheet_id, **params)
+
+        try:
+            return self.client.Sheets.get_sheet(
+                self.sheet_id,
+                column_ids=[
+                    column_map.name,
+                    column_map.status,
+                    column_map.assignee,
+                    column_map.notes,
+                ],
+                **params,
+            )
+        except smartsheet.exceptions.ApiError as exc:
+            if getattr(exc.error.result, "code", None) != INVALID_COLUMN_ERROR:
+                raise
+            logger.info("Column ids for sheet %s are stale", self.sheet_id)
+            column_map_cache.invalidate(self.sheet_id)
+            self._column_map = None
+            return self.client.Sheets.get_sheet(self.sheet_id, **params)
+
+    def _stream_sheet(self) -> Iterator[ChecklistItem]:
+        """Download the sheet page by page, yielding rows as they come.
+
+        Only one page of SDK row objects is alive at a time. The rows
+        reach the row cache once the last page has been read.
+        """
         logger.debug("Fetching rows from sheet %s", self.sheet_id)
-        sheet = self.client.Sheets.get_sheet(self.sheet_id)
+        stamp = sheet_changes.stamp(self.sheet_id)
+        items = []
+        version = None
+        page = 1
+        while True:
+            params = {"exclude": "nonexistentCells"}
+            if self.page_size:
+                params.update(page_size=self.page_size, page=page)
+            sheet = self._get_sheet(**params)
+
+            if version is None:
+                version = sheet.version
+                self._set_column_map(sheet)
+            elif sheet.version != version:
+                raise SheetChangedError(
+                    f"Sheet {self.sheet_id} changed while paging"
+                )
+
+            for row in sheet.rows:
+                item = self._row_to_item(row)
+                items.append(item)
+                yield item
+
+            if not self.page_size or page * self.page_size >= (
+                sheet.total_row_count or 0
+            ):
+                break
+            page += 1
+
         logger.debug(
-            "Fetched %d rows from sheet %s", len(sheet.rows), self.sheet_id
+            "Fetched %d rows from sheet %s", len(items), self.sheet_id
         )
-        return [self._row_to_item(row) for row in sheet.rows]
+        row_cache.store(self.sheet_id, version, items, stamp)
+        self._version = version
+
+    def _download(self) -> tuple[int, list[ChecklistItem]]:
+        try:
+            items = list(self._stream_sheet())
+        except SheetChangedError:
+            logger.info(
+                "Sheet %s changed while paging, retrying", self.sheet_id
+            )
+            items = list(self._stream_sheet())
+        return self._version, items
+
+    def _fetch_sheet(self) -> list[ChecklistItem]:
+        # Requests reading the same sheet at the same time share one
+        # download; each gets its own copy of the rows.
+        (version, items), shared = sheet_reads.do(
+            self.sheet_id, self._download
+        )
+        if not shared:
+            return items
+
+        logger.debug("Joined in-flight read of sheet %s", self.sheet_id)
+        self._version = version
+        return [replace(item, children=()) for item in items]
+
+    def _cache_rows(self, response) -> list[ChecklistItem]:
+        """Patch rows returned by a write into the row cache."""
+        items = [self._row_to_item(row) for row in response.result]
+        rows = [
+            (item, row.row_number)
+            for item, row in zip(items, response.result, strict=True)
+        ]
+        row_cache.place_rows(self.sheet_id, response.version, rows)
+        self._written(response.version)
+        return items
+
+    def _written(self, version: int) -> None:
+        """Note a write that took the sheet to ``version``.
+
+        Only this process's row cache was patched; a new change stamp
+        sends other workers' next read to the version check.
+        """
+        self._version = version
+        sheet_changes.bump(self.sheet_id)
+
+    @property
+    def version(self) -> int | None:
+        return self._version
+
+    def get_cached_rows(self, version: int) -> list[ChecklistItem] | None:
+        return row_cache.get(self.sheet_id, version=version)
+
+    def _cached_rows(self) -> list[ChecklistItem] | None:
+        cached_version = row_cache.version(self.sheet_id)
+        if self._version is None and cached_version is not None:
+            # Rows cached by an earlier request are only as good as the
+            # sheet version they were read at. No webhook callback since
+            # they were read means they are current; otherwise asking
+            # for the version is far cheaper than downloading the sheet.
+            stamp = sheet_changes.stamp(self.sheet_id)
+            if stamp is not None and stamp == row_cache.stamp(self.sheet_id):
+                self._version = cached_version
+            else:
+                response = self.client.Sheets.get_sheet_version(self.sheet_id)
+                self._version = response.version
+                row_cache.confirm(self.sheet_id, self._version, stamp)
+
+        if self._version is None:
+            return None
+        items = row_cache.get(self.sheet_id, version=self._version)
+        if items is not None:
+            logger.debug(
+                "Serving %d cached rows for sheet %s (version %s)",
+                len(items),
+                self.sheet_id,
+                self._version,
+            )
+        return items
 
+    @traced
+    def get_rows(self) -> list[ChecklistItem]:
+        items = self._cached_rows()
+        if items is not None:
+            return items
+        return self._fetch_sheet()
+
+    @traced
+    def iter_rows(self) -> Iterator[ChecklistItem]:
+        items = self._cached_rows()
+        if items is not None:
+            return iter(items)
+        if not self.page_size:
+            # A single-request read has nothing to stream, so take the
+            # shared path and join any read already in flight.
+            return iter(self._fetch_sheet())
+        return self._stream_rows()
+
+    def _stream_rows(self) -> Iterator[ChecklistItem]:
+        """Stream the sheet, reading it again if it changes while paging.
+
+        Rows already yielded cannot be taken back, so after a restart
+        only rows that have not been sent yet are yielded, in their new
+        order. The result is as current as a read racing a write can be,
+        and it is never cut short.
+        """
+        sent = set()
+        try:
+            for item in self._stream_sheet():
+                sent.add(item.id)
+                yield item
+        except SheetChangedError:
+            logger.info(
+                "Sheet %s changed while paging, retrying", self.sheet_id
+            )
+            _, items = self._download()
+            for item in items:
+                if item.id not in sent:
+                    yield item
+
+    @traced
     def add_row(
         self,
         name: str,
@@ -105,58 +517,116 @@ class SmartsheetGateway(SheetProviderInterface):
         notes: str,
         parent_id: int | None = None,
     ) -> ChecklistItem:
-        col_map = self._get_column_map()
-
-        row = smartsheet.models.Row()
-        row.to_bottom = True
-        if parent_id:
-            row.parent_id = parent_id
-
-        row.cells = [
-            {"column_id": col_map.name, "value": name},
-            {"column_id": col_map.status, "value": status},
-            {"column_id": col_map.assignee, "value": assignee},
-            {"column_id": col_map.notes, "value": notes},
-        ]
-
-        response = self.client.Sheets.add_rows(self.sheet_id, [row])
-        logger.info("Added row to sheet %s: %s", self.sheet_id, name)
-        return self._row_to_item(response.result[0])
-
+        return self.add_rows(
+            [
+                {
+                    "name": name,
+                    "status": status,
+                    "assignee": assignee,
+                    "notes": notes,
+                    "parent_id": parent_id,
+                }
+            ]
+        )[0]
+
+    @traced
+    def add_rows(self, rows: list[dict]) -> list[ChecklistItem]:
+        # Rows sent in one request must share a location, so runs of
+        # rows under the same parent go together.
+        items = []
+        for parent_id, group in groupby(
+            rows, key=lambda row: row.get("parent_id")
+        ):
+            for chunk in batched(group, MAX_ROWS_PER_REQUEST):
+                new_rows = []
+                for data in chunk:
+                    row = smartsheet.models.Row()
+                    row.to_bottom = True
+                    if parent_id:
+                        row.parent_id = parent_id
+                    new_rows.append((row, _cell_fields(data)))
+
+                response = self._send_cells(
+                    self.client.Sheets.add_rows, new_rows
+                )
+                items.extend(self._cache_rows(response))
+                logger.info(
+                    "Added %d row(s) to sheet %s", len(chunk), self.sheet_id
+                )
+        return items
+
+    @traced
     def update_row(self, row_id: int, **fields) -> ChecklistItem:
-        col_map = self._get_column_map()
-
-        row = smartsheet.models.Row()
-        row.id = row_id
-
-        cells = []
-        if "name" in fields:
-            cells.append({"column_id": col_map.name, "value": fields["name"]})
-        if "status" in fields:
-            cells.append(
-                {"column_id": col_map.status, "value": fields["status"]}
-            )
-        if "assignee" in fields:
-            cells.append(
-                {"column_id": col_map.assignee, "value": fields["assignee"]}
-            )
-        if "notes" in fields:
-            cells.append(
-                {"column_id": col_map.notes, "value": fields["notes"]}
-            )
-
-        if cells:
-            row.cells = cells
-            response = self.client.Sheets.update_rows(self.sheet_id, [row])
-            return self._row_to_item(response.result[0])
+        if settings.SMARTSHEET_EDIT_COALESCE_WINDOW and _cell_fields(fields):
+            return self._coalesced_update(row_id, _cell_fields(fields))
+        if _cell_fields(fields):
+            return self.update_rows({row_id: fields})[0]
 
         sheet = self.client.Sheets.get_sheet(self.sheet_id, row_ids=[row_id])
         return self._row_to_item(sheet.rows[0])
 
+    def _coalesced_update(self, row_id: int, fields: dict) -> ChecklistItem:
+        # Edits of the same sheet with the same token share one
+        # update_rows call; each caller gets its own row back.
+        def send(updates):
+            items = self.update_rows(updates)
+            return self._version, {item.id: item for item in items}
+
+        (version, items), shared = row_edits.submit(
+            (self.client, self.sheet_id),
+            row_id,
+            fields,
+            send,
+            settings.SMARTSHEET_EDIT_COALESCE_WINDOW,
+        )
+        if not shared:
+            return items[row_id]
+
+        logger.debug("Joined pending update of sheet %s", self.sheet_id)
+        self._version = version
+        return replace(items[row_id], children=())
+
+    @traced
+    def update_rows(self, updates: dict[int, dict]) -> list[ChecklistItem]:
+        updates = {
+            row_id: _cell_fields(fields)
+            for row_id, fields in updates.items()
+            if _cell_fields(fields)
+        }
+        items = []
+        for chunk in batched(updates.items(), MAX_ROWS_PER_REQUEST):
+            rows = []
+            for row_id, fields in chunk:
+                row = smartsheet.models.Row()
+                row.id = row_id
+                rows.append((row, fields))
+
+            response = self._send_cells(self.client.Sheets.update_rows, rows)
+            items.extend(self._cache_rows(response))
+        return items
+
+    @traced
     def delete_row(self, row_id: int) -> None:
-        self.client.Sheets.delete_rows(self.sheet_id, [row_id])
+        response = self.client.Sheets.delete_rows(self.sheet_id, [row_id])
         logger.info("Deleted row %s from sheet %s", row_id, self.sheet_id)
+        row_cache.remove_rows(self.sheet_id, response.version, [row_id])
+        self._written(response.version)
+
+    @traced
+    def delete_rows(self, row_ids: list[int]) -> None:
+        # Children of a deleted parent are already gone by the time their
+        # own id comes up, so missing rows are not an error here.
+        for chunk in batched(row_ids, MAX_DELETE_IDS_PER_REQUEST):
+            response = self.client.Sheets.delete_rows(
+                self.sheet_id, list(chunk), ignore_rows_not_found=True
+            )
+            logger.info(
+                "Deleted %d row(s) from sheet %s", len(chunk), self.sheet_id
+            )
+            row_cache.remove_rows(self.sheet_id, response.version, chunk)
+            self._written(response.version)
 
+    @traced
     def reorder_row(
         self, row_id: int, sibling_id: int, above: bool = True
     ) -> ChecklistItem:
@@ -167,8 +637,9 @@ class SmartsheetGateway(SheetProviderInterface):
             row.above = True
 
         response = self.client.Sheets.update_rows(self.sheet_id, [row])
-        return self._row_to_item(response.result[0])
+        return self._cache_rows(response)[0]
 
+    @traced
     def move_row(self, row_id: int, parent_id: int | None) -> ChecklistItem:
         row = smartsheet.models.Row()
         row.id = row_id
@@ -178,4 +649,4 @@ class SmartsheetGateway(SheetProviderInterface):
             row.to_top = True
 
         response = self.client.Sheets.update_rows(self.sheet_id, [row])
-        return self._row_to_item(response.result[0])
+        return self._cache_rows(response)[0]
@@ -0,0 +1,374 @@
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass, field, replace
+
+from django.conf import settings
+
+from checklist.domain.interfaces import SheetProviderInterface
+from checklist.domain.services import TreeBuilder
+from checklist.domain.types import ChecklistItem
+from checklist.infrastructure.gateways import CELL_FIELDS
+
+logger = logging.getLogger(__name__)
+
+# Smartsheet ids are opaque 16 digit numbers; starting there keeps
+# clients from mistaking them for row numbers.
+FIRST_ID = 10**15
+
+# Versions per sheet kept for get_cached_rows, so delta responses work.
+HISTORY = 8
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sheet (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    version INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS row (
+    sheet_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    id INTEGER NOT NULL,
+    parent_id INTEGER,
+    name TEXT NOT NULL,
+    status TEXT NOT NULL,
+    assignee TEXT NOT NULL,
+    notes TEXT NOT NULL,
+    PRIMARY KEY (sheet_id, position)
+);
+"""
+
+
+@dataclass
+class _MemorySheet:
+    name: str
+    version: int = 1
+    # Rows in display order. A write builds a new list instead of
+    # changing this one, so older versions can be kept as they were.
+    items: list[ChecklistItem] = field(default_factory=list)
+    history: OrderedDict[int, list[ChecklistItem]] = field(
+        default_factory=OrderedDict
+    )
+
+
+def _copy(items: list[ChecklistItem]) -> list[ChecklistItem]:
+    # Building a tree sets children on the rows it is given.
+    return [replace(item, children=()) for item in items]
+
+
+def _position(items: list[ChecklistItem], row_id: int) -> int:
+    for index, item in enumerate(items):
+        if item.id == row_id:
+            return index
+    raise ValueError(f"Row {row_id} not found")
+
+
+class MemorySheets:
+    """Sheets held in process memory, ordered and nested like Smartsheet.
+
+    Rows keep Smartsheet's placement rules: new rows go to the bottom of
+    their parent, moved rows take their subtree along, a row moved under
+    a parent becomes its first child, and every write bumps the sheet
+    version. Unknown sheets start out empty. With a path, sheets are
+    loaded from and written back to a SQLite file after every change.
+    """
+
+    def __init__(self, path: str = ""):
+        self.path = path
+        self._lock = threading.Lock()
+        self._sheets: dict[int, _MemorySheet] | None = None
+        self._next_id = FIRST_ID
+
+    def _load(self) -> dict[int, _MemorySheet]:
+        if self._sheets is not None:
+            return self._sheets
+
+        self._sheets = {}
+        if self.path:
+            with sqlite3.connect(self.path) as db:
+                db.executescript(SCHEMA)
+                for sheet_id, name, version in db.execute(
+                    "SELECT id, name, version FROM sheet"
+                ):
+                    self._sheets[sheet_id] = _MemorySheet(name, version)
+                for sheet_id, *values in db.execute(
+                    "SELECT sheet_id, id, parent_id, name, status, assignee, "
+                    "notes FROM row ORDER BY sheet_id, position"
+                ):
+                    row_id, parent_id, name, status, assignee, notes = values
+                    self._sheets[sheet_id].items.append(
+                        ChecklistItem(
+                            id=row_id,
+                            name=name,
+                            status=status,
+                            assignee=assignee,
+                            notes=notes,
+                            parent_id=parent_id,
+                        )
+                    )
+            ids = [
+                item.id
+                for sheet in self._sheets.values()
+                for item in sheet.items
+            ] + list(self._sheets)
+            self._next_id = max([FIRST_ID - 1, *ids]) + 1
+            logger.info(
+                "Loaded %d sheet(s) from %s", len(self._sheets), self.path
+            )
+        return self._sheets
+
+    def _save(self, sheet_id: int, sheet: _MemorySheet) -> None:
+        if not self.path:
+            return
+        with sqlite3.connect(self.path) as db:
+            db.execute(
+                "INSERT OR REPLACE INTO sheet (id, name, version) "
+                "VALUES (?, ?, ?)",
+                (sheet_id, sheet.name, sheet.version),
+            )
+            db.execute("DELETE FROM row WHERE sheet_id = ?", (sheet_id,))
+            db.executemany(
+                "INSERT INTO row VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        sheet_id,
+                        position,
+                        item.id,
+                        item.parent_id,
+                        item.name,
+                        item.status,
+                        item.assignee,
+                        item.notes,
+                    )
+                    for position, item in enumerate(sheet.items)
+                ],
+            )
+
+    def _new_id(self) -> int:
+        new_id = self._next_id
+        self._next_id += 1
+        return new_id
+
+    def _sheet(self, sheet_id: int) -> _MemorySheet:
+        sheets = self._load()
+        if sheet_id not in sheets:
+            sheets[sheet_id] = _MemorySheet(name=str(sheet_id))
+        return sheets[sheet_id]
+
+    def create_sheet(self, name: str) -> int:
+        with self._lock:
+            self._load()
+            sheet_id = self._new_id()
+            self._sheets[sheet_id] = sheet = _MemorySheet(name=name)
+            self._save(sheet_id, sheet)
+        return sheet_id
+
+    def rows(self, sheet_id: int) -> tuple[int, list[ChecklistItem]]:
+        with self._lock:
+            sheet = self._sheet(sheet_id)
+            version, items = sheet.version, sheet.items
+        return version, _copy(items)
+
+    def rows_at(
+        self, sheet_id: int, version: int
+    ) -> list[ChecklistItem] | None:
+        with self._lock:
+            sheet = self._sheet(sheet_id)
+            items = (
+                sheet.items
+                if version == sheet.version
+                else sheet.history.get(version)
+            )
+        return None if items is None else _copy(items)
+
+    def write(
+        self,
+        sheet_id: int,
+        change: Callable[[list[ChecklistItem]], list[ChecklistItem]],
+    ) -> int:
+        """Replace the rows with change(rows) as one new sheet version.
+
+        ``change`` gets a copy of the rows and returns the new list;
+        whatever it raises leaves the sheet untouched.
+        """
+        with self._lock:
+            sheet = self._sheet(sheet_id)
+            items = change(list(sheet.items))
+            sheet.history[sheet.version] = sheet.items
+            while len(sheet.history) > HISTORY:
+                sheet.history.popitem(last=False)
+            sheet.items = items
+            sheet.version += 1
+            self._save(sheet_id, sheet)
+            return sheet.version
+
+    def new_id(self) -> int:
+        with self._lock:
+            self._load()
+            return self._new_id()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sheets = None
+            self._next_id = FIRST_ID
+
+
+class InMemorySheetProvider(SheetProviderInterface):
+    """Sheet provider backed by MemorySheets instead of Smartsheet.
+
+    For load tests and offline demos: the same use cases run against it
+    without any network calls. Rows come back as the gateway returns
+    them, with ``indent`` left at 0.
+    """
+
+    def __init__(self, sheet_id: int, store: MemorySheets | None = None):
+        self.sheet_id = sheet_id
+        self.store = store or memory_sheets
+        self._version: int | None = None
+
+    @property
+    def version(self) -> int | None:
+        return self._version
+
+    def get_cached_rows(self, version: int) -> list[ChecklistItem] | None:
+        return self.store.rows_at(self.sheet_id, version)
+
+    def get_rows(self) -> list[ChecklistItem]:
+        self._version, items = self.store.rows(self.sheet_id)
+        return items
+
+    def _write(self, change) -> list[ChecklistItem]:
+        """Apply change, returning copies of the rows it reports."""
+        changed: list[ChecklistItem] = []
+
+        def apply(items):
+            items, rows = change(items)
+            changed.extend(rows)
+            return items
+
+        self._version = self.store.write(self.sheet_id, apply)
+        return _copy(changed)
+
+    def add_row(
+        self,
+        name: str,
+        status: str,
+        assignee: str,
+        notes: str,
+        parent_id: int | None = None,
+    ) -> ChecklistItem:
+        return self.add_rows(
+            [
+                {
+                    "name": name,
+                    "status": status,
+                    "assignee": assignee,
+                    "notes": notes,
+                    "parent_id": parent_id,
+                }
+            ]
+        )[0]
+
+    def add_rows(self, rows: list[dict]) -> list[ChecklistItem]:
+        row_ids = [self.store.new_id() for _ in rows]
+
+        def change(items):
+            added = []
+            for row_id, data in zip(row_ids, rows, strict=True):
+                parent_id = data.get("parent_id") or None
+                if parent_id is None:
+                    position = len(items)
+                else:
+                    position = TreeBuilder.subtree_end(
+                        items, _position(items, parent_id)
+                    )
+                item = ChecklistItem(
+                    id=row_id,
+                    parent_id=parent_id,
+                    **{name: data.get(name, "") for name in CELL_FIELDS},
+                )
+                items.insert(position, item)
+                added.append(item)
+            return items, added
+
+        return self._write(change)
+
+    def update_row(self, row_id: int, **fields) -> ChecklistItem:
+        return self.update_rows({row_id: fields})[0]
+
+    def update_rows(self, updates: dict[int, dict]) -> list[ChecklistItem]:
+        def change(items):
+            updated = []
+            for row_id, fields in updates.items():
+                index = _position(items, row_id)
+                items[index] = replace(
+                    items[index],
+                    **{
+                        name: value
+                        for name, value in fields.items()
+                        if name in CELL_FIELDS
+                    },
+                )
+                updated.append(items[index])
+            return items, updated
+
+        return self._write(change)
+
+    def delete_row(self, row_id: int) -> None:
+        def change(items):
+            index = _position(items, row_id)
+            del items[index : TreeBuilder.subtree_end(items, index)]
+            return items, []
+
+        self._write(change)
+
+    def delete_rows(self, row_ids: list[int]) -> None:
+        # Like the gateway, rows already gone with a deleted parent are
+        # not an error.
+        def change(items):
+            for row_id in row_ids:
+                index = next(
+                    (i for i, item in enumerate(items) if item.id == row_id),
+                    None,
+                )
+                if index is not None:
+                    del items[index : TreeBuilder.subtree_end(items, index)]
+            return items, []
+
+        self._write(change)
+
+    def _move(self, row_id: int, target: int | None, **location):
+        def change(items):
+            index = _position(items, row_id)
+            block = {
+                item.id
+                for item in items[
+                    index : TreeBuilder.subtree_end(items, index)
+                ]
+            }
+            if target is not None:
+                _position(items, target)
+                if target in block:
+                    raise ValueError(
+                        f"Row {row_id} cannot be moved next to or under "
+                        "its own descendant"
+                    )
+            items = TreeBuilder.move(items, row_id, **location)
+            return items, [items[_position(items, row_id)]]
+
+        return self._write(change)[0]
+
+    def move_row(self, row_id: int, parent_id: int | None) -> ChecklistItem:
+        return self._move(row_id, parent_id, parent_id=parent_id)
+
+    def reorder_row(
+        self, row_id: int, sibling_id: int, above: bool = True
+    ) -> ChecklistItem:
+        return self._move(
+            row_id, sibling_id, sibling_id=sibling_id, above=above
+        )
+
+
+memory_sheets = MemorySheets(settings.SMARTSHEET_MEMORY_PATH)
@@ -0,0 +1,336 @@
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field, fields
+from functools import wraps
+from urllib.parse import urlsplit
+
+from django.conf import settings
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Statuses the SDK retries on; a repeat of the same request after one
+# of these is counted as a retry.
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+ID_SEGMENT = re.compile(r"/\d+")
+
+# Upper bounds, in seconds, of the latency histogram buckets.
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+@dataclass
+class UpstreamCall:
+    operation: str
+    status: int
+    seconds: float
+    bytes_sent: int
+    bytes_received: int
+    retry: bool = False
+
+
+@dataclass
+class UpstreamBudget:
+    """Smartsheet calls made while serving one request."""
+
+    calls: list[UpstreamCall] = field(default_factory=list)
+    # Seconds spent in each gateway method, outermost calls only.
+    methods: Counter = field(default_factory=Counter)
+
+    @property
+    def seconds(self) -> float:
+        return sum(call.seconds for call in self.calls)
+
+    @property
+    def retries(self) -> int:
+        return sum(call.retry for call in self.calls)
+
+    def summary(self) -> dict:
+        """Totals as flat structured-log fields."""
+        return {
+            "smartsheet_calls": len(self.calls),
+            "smartsheet_retries": self.retries,
+            "smartsheet_seconds": round(self.seconds, 4),
+            "smartsheet_bytes_sent": sum(
+                call.bytes_sent for call in self.calls
+            ),
+            "smartsheet_bytes_received": sum(
+                call.bytes_received for call in self.calls
+            ),
+            "smartsheet_operations": dict(
+                Counter(call.operation for call in self.calls)
+            ),
+        }
+
+    def server_timing(self) -> str:
+        entries = [
+            f'smartsheet;dur={self.seconds * 1000:.1f};desc="'
+            f'{len(self.calls)} calls, {self.retries} retries"'
+        ]
+        entries.extend(
+            f"gateway.{name};dur={seconds * 1000:.1f}"
+            for name, seconds in self.methods.items()
+        )
+        return ", ".join(entries)
+
+
+_budget: ContextVar[UpstreamBudget | None] = ContextVar(
+    "smartsheet_budget", default=None
+)
+_last_failure: ContextVar[tuple | None] = ContextVar(
+    "smartsheet_last_failure", default=None
+)
+_in_method: ContextVar[bool] = ContextVar(
+    "smartsheet_in_method", default=False
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace('"', r"\"")
+
+
+class UpstreamMetrics:
+    """Process-wide Smartsheet call totals, rendered for Prometheus.
+
+    Every worker process keeps its own totals, so scrape each worker or
+    sum them on the Prometheus side.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            self.requests: Counter = Counter()
+            self.seconds: Counter = Counter()
+            self.buckets: dict[str, list[int]] = {}
+            self.bytes: Counter = Counter()
+            self.retries: Counter = Counter()
+            self.method_calls: Counter = Counter()
+            self.method_seconds: Counter = Counter()
+
+    def observe(self, call: UpstreamCall) -> None:
+        with self._lock:
+            self.requests[call.operation, call.status] += 1
+            self.seconds[call.operation] += call.seconds
+            counts = self.buckets.setdefault(
+                call.operation, [0] * len(BUCKETS)
+            )
+            for index, bound in enumerate(BUCKETS):
+                if call.seconds <= bound:
+                    counts[index] += 1
+            self.bytes[call.operation, "sent"] += call.bytes_sent
+            self.bytes[call.operation, "received"] += call.bytes_received
+            if call.retry:
+                self.retries[call.operation] += 1
+
+    def observe_method(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.method_calls[name] += 1
+            self.method_seconds[name] += seconds
+
+    def render(self) -> str:
+        with self._lock:
+            lines = [
+                "# TYPE smartsheet_requests_total counter",
+                *(
+                    f'smartsheet_requests_total{{operation="{_escape(op)}",'
+                    f'status="{status}"}} {count}'
+                    for (op, status), count in sorted(self.requests.items())
+                ),
+                "# TYPE smartsheet_request_seconds histogram",
+            ]
+            for op, counts in sorted(self.buckets.items()):
+                label = f'operation="{_escape(op)}"'
+                total = sum(
+                    count
+                    for (name, _), count in self.requests.items()
+                    if name == op
+                )
+                lines.extend(
+                    f'smartsheet_request_seconds_bucket{{{label},le="{bound}"}}'
+                    f" {count}"
+                    for bound, count in zip(BUCKETS, counts, strict=True)
+                )
+                lines += [
+                    f'smartsheet_request_seconds_bucket{{{label},le="+Inf"}}'
+                    f" {total}",
+                    f"smartsheet_request_seconds_sum{{{label}}} "
+                    f"{self.seconds[op]:.6f}",
+                    f"smartsheet_request_seconds_count{{{label}}} {total}",
+                ]
+            lines.append("# TYPE smartsheet_request_bytes_total counter")
+            lines.extend(
+                f'smartsheet_request_bytes_total{{operation="{_escape(op)}",'
+                f'direction="{direction}"}} {count}'
+                for (op, direction), count in sorted(self.bytes.items())
+            )
+            lines.append("# TYPE smartsheet_retries_total counter")
+            lines.extend(
+                f'smartsheet_retries_total{{operation="{_escape(op)}"}} '
+                f"{count}"
+                for op, count in sorted(self.retries.items())
+            )
+            lines.append("# TYPE smartsheet_gateway_calls_total counter")
+            lines.extend(
+                f'smartsheet_gateway_calls_total{{method="{name}"}} {count}'
+                for name, count in sorted(self.method_calls.items())
+            )
+            lines.append("# TYPE smartsheet_gateway_seconds_total counter")
+            lines.extend(
+                f'smartsheet_gateway_seconds_total{{method="{name}"}} '
+                f"{seconds:.6f}"
+                for name, seconds in sorted(self.method_seconds.items())
+            )
+        return "\n".join(lines) + "\n"
+
+
+def render_stats(prefix: str, stats) -> str:
+    """Render the numeric fields of a stats dataclass as gauges."""
+    return "".join(
+        f"# TYPE {prefix}_{item.name} gauge\n"
+        f"{prefix}_{item.name} {getattr(stats, item.name)}\n"
+        for item in fields(stats)
+    )
+
+
+upstream_metrics = UpstreamMetrics()
+
+
+def operation_name(request: requests.PreparedRequest) -> str:
+    """Method and path with ids replaced, e.g. ``GET /sheets/{id}``."""
+    path = re.sub(r"^/\d+\.\d+", "", urlsplit(request.url).path)
+    return f"{request.method} {ID_SEGMENT.sub('/{id}', path)}"
+
+
+def record_response(response: requests.Response, *args, **kwargs):
+    """Response hook recording one HTTP request to Smartsheet.
+
+    ``elapsed`` stops at the response headers, so reading the body is
+    timed here and added to it. Streamed downloads are left unread and
+    counted by their Content-Length.
+    """
+    request = response.request
+    started = time.perf_counter()
+    if kwargs.get("stream"):
+        received = int(response.headers.get("Content-Length") or 0)
+    else:
+        received = len(response.content or b"")
+    seconds = response.elapsed.total_seconds() + (
+        time.perf_counter() - started
+    )
+    target = (request.method, request.url)
+
+    call = UpstreamCall(
+        operation=operation_name(request),
+        status=response.status_code,
+        seconds=seconds,
+        bytes_sent=len(request.body or b""),
+        bytes_received=received,
+        retry=_last_failure.get() == target,
+    )
+    _last_failure.set(
+        target if response.status_code in RETRY_STATUSES else None
+    )
+    upstream_metrics.observe(call)
+    budget = _budget.get()
+    if budget is not None:
+        budget.calls.append(call)
+    logger.debug(
+        "Smartsheet %s: %s in %.1f ms",
+        call.operation,
+        call.status,
+        call.seconds * 1000,
+        extra={
+            "smartsheet_operation": call.operation,
+            "smartsheet_status": call.status,
+            "smartsheet_seconds": round(call.seconds, 4),
+            "smartsheet_bytes_sent": call.bytes_sent,
+            "smartsheet_bytes_received": call.bytes_received,
+            "smartsheet_retry": call.retry,
+        },
+    )
+    return response
+
+
+def instrument_session(session: requests.Session) -> requests.Session:
+    # The SDK's pinned session sets a single hook, not a list.
+    hooks = session.hooks.get("response") or []
+    if callable(hooks):
+        hooks = [hooks]
+    if record_response not in hooks:
+        session.hooks["response"] = [*hooks, record_response]
+    return session
+
+
+def traced(method):
+    """Time a gateway method into the metrics and the current budget.
+
+    Only the outermost traced call counts, so add_row calling add_rows
+    is reported once, as add_row.
+    """
+
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        if _in_method.get():
+            return method(*args, **kwargs)
+        token = _in_method.set(True)
+        started = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - started
+            _in_method.reset(token)
+            upstream_metrics.observe_method(method.__name__, seconds)
+            budget = _budget.get()
+            if budget is not None:
+                budget.methods[method.__name__] += seconds
+
+    return wrapper
+
+
+class UpstreamBudgetMiddleware:
+    """Report the Smartsheet calls each request made.
+
+    Requests that called Smartsheet get a log line with the totals as
+    structured fields and, with SMARTSHEET_SERVER_TIMING on, a
+    ``Server-Timing`` header for the browser's network panel.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        budget = UpstreamBudget()
+        token = _budget.set(budget)
+        try:
+            response = self.get_response(request)
+        finally:
+            _budget.reset(token)
+
+        if budget.calls or budget.methods:
+            logger.info(
+                "%s %s made %d Smartsheet call(s) in %.1f ms",
+                request.method,
+                request.path,
+                len(budget.calls),
+                budget.seconds * 1000,
+                extra=budget.summary(),
+            )
+            if settings.SMARTSHEET_SERVER_TIMING:
+                response.headers["Server-Timing"] = ", ".join(
+                    filter(
+                        None,
+                        [
+                            response.headers.get("Server-Timing"),
+                            budget.server_timing(),
+                        ],
+                    )
+                )
+        return response
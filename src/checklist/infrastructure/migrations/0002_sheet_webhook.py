@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:21
+
+import core.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('checklist', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sheet',
+            name='webhook_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='sheet',
+            name='webhook_secret',
+            field=core.fields.EncryptedCharField(blank=True, max_length=255),
+        ),
+    ]
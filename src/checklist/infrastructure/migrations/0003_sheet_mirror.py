@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('checklist', '0002_sheet_webhook'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sheet',
+            name='mirror_version',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='sheet',
+            name='mirrored_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='sheet',
+            name='revision',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='SheetRow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('row_id', models.BigIntegerField()),
+                ('parent_id', models.BigIntegerField(blank=True, null=True)),
+                ('position', models.PositiveIntegerField()),
+                ('indent', models.PositiveSmallIntegerField(default=0)),
+                ('name', models.TextField(blank=True)),
+                ('status', models.CharField(blank=True, max_length=255)),
+                ('assignee', models.CharField(blank=True, max_length=255)),
+                ('notes', models.TextField(blank=True)),
+                ('version', models.BigIntegerField()),
+                ('sheet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rows', to='checklist.sheet')),
+            ],
+            options={
+                'ordering': ['sheet', 'position'],
+                'unique_together': {('sheet', 'position')},
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('checklist', '0003_sheet_mirror'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingWrite',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('op', models.CharField(choices=[('update', 'Update'), ('delete', 'Delete')], max_length=16)),
+                ('row_id', models.BigIntegerField()),
+                ('data', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('failed', 'Failed')], default='pending', max_length=16)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sheet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pending_writes', to='checklist.sheet')),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['sheet', 'status'], name='checklist_p_sheet_i_63c291_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,168 @@
+import logging
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+import smartsheet
+from checklist.domain.models import Sheet, SheetRow
+from checklist.domain.types import ChecklistItem
+from checklist.infrastructure.gateways import SmartsheetGateway
+
+logger = logging.getLogger(__name__)
+
+
+def load_rows(
+    sheet: Sheet, max_age: float | None = None
+) -> list[ChecklistItem] | None:
+    """Mirrored rows of the sheet, if mirrored at most max_age ago.
+
+    With max_age None the rows are returned however old they are.
+    """
+    if sheet.mirror_version is None:
+        return None
+    if max_age is not None and (
+        sheet.mirrored_at is None
+        or timezone.now() - sheet.mirrored_at > timedelta(seconds=max_age)
+    ):
+        return None
+
+    return [
+        ChecklistItem(
+            id=row_id,
+            name=name,
+            status=status,
+            assignee=assignee,
+            notes=notes,
+            parent_id=parent_id,
+            indent=indent,
+        )
+        for (
+            row_id,
+            parent_id,
+            indent,
+            name,
+            status,
+            assignee,
+            notes,
+        ) in SheetRow.objects.filter(sheet=sheet)
+        .order_by("position")
+        .values_list(
+            "row_id",
+            "parent_id",
+            "indent",
+            "name",
+            "status",
+            "assignee",
+            "notes",
+        )
+    ]
+
+
+def store_rows(sheet: Sheet, version: int, items: list[ChecklistItem]) -> bool:
+    """Replace the mirrored rows unless the sheet changed since it was read.
+
+    ``sheet.revision`` has to be the value read before the rows were
+    fetched; returns False when a newer change already expired them.
+    """
+    with transaction.atomic():
+        updated = Sheet.objects.filter(
+            pk=sheet.pk, revision=sheet.revision
+        ).update(mirror_version=version, mirrored_at=timezone.now())
+        if not updated:
+            return False
+
+        if version != sheet.mirror_version:
+            SheetRow.objects.filter(sheet=sheet).delete()
+            SheetRow.objects.bulk_create(
+                [
+                    SheetRow(
+                        sheet=sheet,
+                        row_id=item.id,
+                        parent_id=item.parent_id,
+                        position=position,
+                        indent=item.indent,
+                        name=str(item.name),
+                        status=str(item.status),
+                        assignee=str(item.assignee),
+                        notes=str(item.notes),
+                        version=version,
+                    )
+                    for position, item in enumerate(items)
+                ],
+                batch_size=1000,
+            )
+    return True
+
+
+def expire(sheet: Sheet) -> None:
+    """Stop serving the mirror as current until the next sync."""
+    Sheet.objects.filter(pk=sheet.pk).update(
+        mirrored_at=None, revision=F("revision") + 1
+    )
+
+
+def sync_sheet(sheet: Sheet) -> bool:
+    """Bring the mirror up to the sheet's current version.
+
+    Rows are read through the gateway, so an unchanged sheet whose rows
+    are still in the row cache costs a single version check.
+    """
+    gateway = SmartsheetGateway(
+        token=sheet.user.smartsheet_token, sheet_id=sheet.smartsheet_id
+    )
+    items = gateway.get_rows()
+    if not store_rows(sheet, gateway.version, items):
+        logger.info("Sheet %s changed while syncing", sheet.smartsheet_id)
+        return False
+    logger.debug(
+        "Mirrored %d rows of sheet %s (version %s)",
+        len(items),
+        sheet.smartsheet_id,
+        gateway.version,
+    )
+    return True
+
+
+class MirroredGateway(SmartsheetGateway):
+    """Gateway that reads from the row mirror when it is recent enough.
+
+    Rows mirrored within ``max_age`` seconds are served without calling
+    Smartsheet; 0 only uses the mirror while Smartsheet is down for
+    maintenance, whatever its age. Writes go straight upstream.
+    """
+
+    def __init__(self, token: str, sheet: Sheet, max_age: float = 0):
+        super().__init__(token=token, sheet_id=sheet.smartsheet_id)
+        self.sheet = sheet
+        self.max_age = max_age
+
+    def _mirrored_rows(self, max_age):
+        items = load_rows(self.sheet, max_age)
+        if items is not None:
+            self._version = self.sheet.mirror_version
+        return items
+
+    def get_rows(self) -> list[ChecklistItem]:
+        if self.max_age:
+            items = self._mirrored_rows(self.max_age)
+            if items is not None:
+                return items
+
+        try:
+            return super().get_rows()
+        except smartsheet.exceptions.SystemMaintenanceError:
+            items = self._mirrored_rows(None)
+            if items is None:
+                raise
+            logger.warning(
+                "Smartsheet under maintenance, serving mirrored sheet %s",
+                self.sheet_id,
+            )
+            return items
+
+    def iter_rows(self):
+        # Mirrored rows are loaded in one query, so there is no paged
+        # read to stream from.
+        return iter(self.get_rows())
@@ -0,0 +1,193 @@
+import hashlib
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import caches
+
+import requests
+import smartsheet
+from smartsheet.smartsheet import AbstractUserCalcBackoff
+
+logger = logging.getLogger(__name__)
+
+# Smartsheet error code for "Rate limit exceeded."
+RATE_LIMIT_ERROR = 4003
+
+
+@dataclass
+class RateLimitStats:
+    calls: int = 0
+    queued_calls: int = 0
+    queued_seconds: float = 0.0
+    max_queued_seconds: float = 0.0
+    throttled: int = 0
+
+
+class TokenBucket:
+    """Per-token request budget shared through a Django cache.
+
+    Each call takes a token; when the bucket is empty the token is
+    borrowed from the future and the caller sleeps until it refills,
+    so waiting callers are served in arrival order without polling.
+    State lives in the cache named by ``alias``, so every worker
+    process using a shared backend draws from the same budget.
+    """
+
+    key_prefix = "smartsheet:bucket"
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: int,
+        max_wait: float,
+        alias: str = "default",
+    ):
+        self.rate = rate
+        self.capacity = capacity
+        self.max_wait = max_wait
+        self.alias = alias
+        self.stats = RateLimitStats()
+        self._stats_lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _locked(self, key: str, update):
+        """Run update(tokens, now) -> (tokens, result) under a cache lock."""
+        lock = f"{self.key_prefix}:{key}:lock"
+        while not self.cache.add(lock, 1, timeout=5):
+            time.sleep(0.005)
+        try:
+            now = time.time()
+            tokens, updated = self.cache.get(
+                f"{self.key_prefix}:{key}", (self.capacity, now)
+            )
+            tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+            tokens, result = update(tokens, now)
+            self.cache.set(
+                f"{self.key_prefix}:{key}", (tokens, now), timeout=3600
+            )
+            return result
+        finally:
+            self.cache.delete(lock)
+
+    def acquire(self, key: str) -> float:
+        """Take one token, sleeping until it is available.
+
+        Returns the seconds spent queued. Raises RateLimitExceededError
+        instead of queueing longer than ``max_wait``.
+        """
+
+        def take(tokens, now):
+            wait = max(0.0, (1 - tokens) / self.rate)
+            if wait > self.max_wait:
+                return tokens, None
+            return tokens - 1, wait
+
+        wait = self._locked(key, take)
+        if wait is None:
+            message = "Smartsheet request budget exhausted"
+            # Shaped like Smartsheet's own 429, so handlers reading
+            # exc.error.result work the same for both.
+            error = smartsheet.models.Error(
+                {
+                    "result": {
+                        "code": RATE_LIMIT_ERROR,
+                        "statusCode": requests.codes.too_many_requests,
+                        "message": message,
+                        "shouldRetry": True,
+                    }
+                }
+            )
+            raise smartsheet.exceptions.RateLimitExceededError(error, message)
+
+        if wait:
+            time.sleep(wait)
+        self._record(wait)
+        return wait
+
+    def penalize(self, key: str, seconds: float) -> None:
+        """Hold every caller back for at least ``seconds``."""
+        with self._stats_lock:
+            self.stats.throttled += 1
+        self._locked(
+            key,
+            lambda tokens, now: (min(tokens, -seconds * self.rate), None),
+        )
+
+    def _record(self, wait: float) -> None:
+        with self._stats_lock:
+            self.stats.calls += 1
+            if wait:
+                self.stats.queued_calls += 1
+                self.stats.queued_seconds += wait
+                self.stats.max_queued_seconds = max(
+                    self.stats.max_queued_seconds, wait
+                )
+        if wait > 1:
+            logger.warning("Smartsheet call queued for %.1fs", wait)
+
+
+class JitteredBackoff(AbstractUserCalcBackoff):
+    """Full-jitter exponential backoff for the SDK's retry loop.
+
+    Retry-After is honoured by the bucket, which holds the retried
+    request back, so the backoff only spreads retries apart.
+    """
+
+    def __init__(self, max_retry_time: float, base: float = 0.5):
+        self.max_retry_time = max_retry_time
+        self.base = base
+
+    def calc_backoff(
+        self, previous_attempts, total_elapsed_time, error_result
+    ):
+        backoff = random.uniform(0, self.base * 2**previous_attempts)
+        if total_elapsed_time + backoff > self.max_retry_time:
+            return -1
+        return backoff
+
+
+def token_key(request: requests.PreparedRequest) -> str:
+    authorization = request.headers.get("Authorization", "")
+    return hashlib.sha256(authorization.encode()).hexdigest()[:16]
+
+
+def retry_after(response: requests.Response) -> float:
+    try:
+        return float(response.headers.get("Retry-After", 60))
+    except ValueError:
+        return 60.0
+
+
+class RateLimitedSession(requests.Session):
+    """Session that paces every request through the token bucket."""
+
+    def __init__(self, bucket: TokenBucket):
+        super().__init__()
+        self.bucket = bucket
+
+    def send(self, request, **kwargs):
+        key = token_key(request)
+        self.bucket.acquire(key)
+        response = super().send(request, **kwargs)
+        if response.status_code == requests.codes.too_many_requests:
+            seconds = retry_after(response)
+            logger.warning(
+                "Smartsheet rate limit hit, backing off %.0fs", seconds
+            )
+            self.bucket.penalize(key, seconds)
+        return response
+
+
+bucket = TokenBucket(
+    rate=settings.SMARTSHEET_RATE_LIMIT / 60,
+    capacity=settings.SMARTSHEET_RATE_LIMIT_BURST,
+    max_wait=settings.SMARTSHEET_RATE_LIMIT_MAX_WAIT,
+    alias=settings.SMARTSHEET_RATE_LIMIT_CACHE,
+)
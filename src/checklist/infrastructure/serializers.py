@@ -1,3 +1,7 @@
+import json
+from collections.abc import Iterable, Iterator
+
+from checklist.domain.types import ChecklistItem
 from rest_framework import serializers
 
 
@@ -27,6 +31,45 @@ class UpdateItemSerializer(serializers.Serializer):
     notes = serializers.CharField(required=False, allow_blank=True)
 
 
+class ItemOperationSerializer(serializers.Serializer):
+    DATA_SERIALIZERS = {
+        "create": CreateItemSerializer,
+        "update": UpdateItemSerializer,
+    }
+
+    op = serializers.ChoiceField(
+        choices=[
+            "create",
+            "update",
+            "delete",
+            "indent",
+            "outdent",
+            "move_up",
+            "move_down",
+        ]
+    )
+    row_id = serializers.IntegerField(required=False)
+    data = serializers.DictField(required=False, default=dict)
+
+    def validate(self, attrs):
+        if attrs["op"] != "create" and "row_id" not in attrs:
+            raise serializers.ValidationError(
+                {"row_id": "This field is required."}
+            )
+
+        serializer_class = self.DATA_SERIALIZERS.get(attrs["op"])
+        if serializer_class:
+            serializer = serializer_class(data=attrs["data"])
+            if not serializer.is_valid():
+                raise serializers.ValidationError({"data": serializer.errors})
+            attrs["data"] = serializer.validated_data
+        return attrs
+
+
+class BulkItemsSerializer(serializers.Serializer):
+    operations = ItemOperationSerializer(many=True, allow_empty=False)
+
+
 class ChecklistItemSerializer(serializers.Serializer):
     id = serializers.IntegerField()
     name = serializers.CharField()
@@ -40,10 +83,126 @@ class ChecklistItemSerializer(serializers.Serializer):
         return ChecklistItemSerializer(obj.children, many=True).data
 
 
+def _node(item: ChecklistItem) -> dict:
+    return {
+        "id": int(item.id),
+        "name": str(item.name),
+        "status": str(item.status),
+        "assignee": str(item.assignee),
+        "notes": str(item.notes),
+        "parent_id": None if item.parent_id is None else int(item.parent_id),
+    }
+
+
+# Same output as DRF's JSONRenderer, built once rather than per row.
+_dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+
+class ChecklistTreeSerializer:
+    """Fast path for ``ChecklistItemSerializer(tree, many=True)``.
+
+    Walks the tree with an explicit stack and builds plain dicts, so a
+    large sheet doesn't create a DRF serializer per node.
+    """
+
+    def __init__(self, tree: list[ChecklistItem]):
+        self.tree = tree
+
+    @property
+    def data(self) -> list[dict]:
+        roots = []
+        stack = [(item, roots) for item in reversed(self.tree)]
+        while stack:
+            item, siblings = stack.pop()
+            children = []
+            node = _node(item)
+            node["children"] = children
+            siblings.append(node)
+            stack.extend(
+                (child, children) for child in reversed(item.children)
+            )
+        return roots
+
+
+class ChecklistStreamSerializer:
+    """Serialize rows in display order as they are read.
+
+    ``json()`` yields the same document as ``ChecklistTreeSerializer``
+    without holding the tree: rows arrive parent first with subtrees
+    contiguous, so a node's children list is closed as soon as a row
+    outside it comes along. ``ndjson()`` yields one flat node per line.
+    Output is yielded in chunks of ``chunk_size`` rows.
+    """
+
+    def __init__(self, rows: Iterable[ChecklistItem], chunk_size: int = 500):
+        self.rows = rows
+        self.chunk_size = chunk_size
+
+    def json(self) -> Iterator[str]:
+        parts = ["["]
+        open_ids: list[int] = []
+        first = True
+        for count, item in enumerate(self.rows, 1):
+            while open_ids and open_ids[-1] != item.parent_id:
+                open_ids.pop()
+                parts.append("]}")
+                first = False
+            if not first:
+                parts.append(",")
+            parts.append(_dumps(_node(item))[:-1] + ',"children":[')
+            open_ids.append(item.id)
+            first = True
+            if count % self.chunk_size == 0:
+                yield "".join(parts)
+                parts = []
+        parts.append("]}" * len(open_ids) + "]")
+        yield "".join(parts)
+
+    def ndjson(self) -> Iterator[str]:
+        parts = []
+        for count, item in enumerate(self.rows, 1):
+            parts.append(_dumps(_node(item)) + "\n")
+            if count % self.chunk_size == 0:
+                yield "".join(parts)
+                parts = []
+        if parts:
+            yield "".join(parts)
+
+
+class ChecklistNodeSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    status = serializers.CharField()
+    assignee = serializers.CharField()
+    notes = serializers.CharField()
+    parent_id = serializers.IntegerField(allow_null=True)
+
+
+class ChildOrderSerializer(serializers.Serializer):
+    parent_id = serializers.IntegerField(allow_null=True)
+    children = serializers.ListField(child=serializers.IntegerField())
+
+
+class ChecklistDeltaSerializer(serializers.Serializer):
+    version = serializers.IntegerField(allow_null=True)
+    changed = ChecklistNodeSerializer(many=True)
+    removed = serializers.ListField(child=serializers.IntegerField())
+    order = ChildOrderSerializer(many=True)
+
+
 class SheetSerializer(serializers.Serializer):
     id = serializers.UUIDField(source="uuid")
     name = serializers.CharField()
 
 
+class PendingWriteSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    op = serializers.CharField()
+    row_id = serializers.IntegerField()
+    data = serializers.DictField()
+    error = serializers.CharField()
+    created_at = serializers.DateTimeField()
+
+
 class CreateSheetSerializer(serializers.Serializer):
     name = serializers.CharField(max_length=255)
@@ -21,6 +21,11 @@ urlpatterns = [
         views.ItemCreateView.as_view(),
         name="item-create",
     ),
+    path(
+        "sheets/<uuid:sheet_uuid>/items/bulk/",
+        views.ItemBulkView.as_view(),
+        name="item-bulk",
+    ),
     path(
         "sheets/<uuid:sheet_uuid>/items/<int:row_id>/",
         views.ItemDetailView.as_view(),
@@ -46,4 +51,20 @@ urlpatterns = [
         views.ItemMoveDownView.as_view(),
         name="item-move-down",
     ),
+    path(
+        "sheets/<uuid:sheet_uuid>/conflicts/",
+        views.SheetConflictsView.as_view(),
+        name="sheet-conflicts",
+    ),
+    path(
+        "sheets/<uuid:sheet_uuid>/events/",
+        views.SheetEventsView.as_view(),
+        name="sheet-events",
+    ),
+    path(
+        "webhooks/smartsheet/",
+        views.SmartsheetWebhookView.as_view(),
+        name="smartsheet-webhook",
+    ),
+    path("metrics/", views.MetricsView.as_view(), name="metrics"),
 ]
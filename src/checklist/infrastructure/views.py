@@ -1,29 +1,69 @@
+import hashlib
+import hmac
+import json
+import logging
+import time
+from itertools import chain
+
+from django.conf import settings
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.views import View
+
+import smartsheet
 from checklist.application.use_cases import (
     AddItem,
+    ApplyItemOperations,
     CreateItemInput,
     DeleteItem,
     GetChecklist,
     IndentItem,
+    ItemOperation,
     MoveItemDown,
     MoveItemUp,
     OutdentItem,
     UpdateItem,
     UpdateItemInput,
 )
-from checklist.domain.models import Sheet
-from checklist.infrastructure.gateways import SmartsheetGateway
+from checklist.domain.models import PendingWrite, Sheet
+from checklist.domain.services import TreeBuilder, TreeDiff
+from checklist.infrastructure import mirror
+from checklist.infrastructure.cache import sheet_changes, sheet_events
+from checklist.infrastructure.gateways import (
+    SheetChangedError,
+    SmartsheetGateway,
+    client_pool,
+)
+from checklist.infrastructure.memory import (
+    InMemorySheetProvider,
+    memory_sheets,
+)
+from checklist.infrastructure.metrics import render_stats, upstream_metrics
+from checklist.infrastructure.ratelimit import bucket
 from checklist.infrastructure.serializers import (
-    ChecklistItemSerializer,
+    BulkItemsSerializer,
+    ChecklistDeltaSerializer,
+    ChecklistStreamSerializer,
+    ChecklistTreeSerializer,
     CreateItemSerializer,
     CreateSheetSerializer,
+    PendingWriteSerializer,
     SheetSerializer,
     UpdateItemSerializer,
 )
+from checklist.infrastructure.writebehind import WriteBehindProvider
+from core.profiling import span
 from rest_framework import status
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import (
+    SAFE_METHODS,
+    AllowAny,
+    IsAuthenticated,
+)
+from rest_framework.renderers import BaseRenderer, JSONRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+logger = logging.getLogger(__name__)
+
 
 class SheetListView(APIView):
     permission_classes = [IsAuthenticated]
@@ -34,7 +74,8 @@ class SheetListView(APIView):
         return Response(serializer.data)
 
     def post(self, request):
-        if not request.user.smartsheet_token:
+        offline = settings.SMARTSHEET_PROVIDER == "memory"
+        if not offline and not request.user.smartsheet_token:
             return Response(
                 {"error": "Smartsheet token not configured"},
                 status=status.HTTP_400_BAD_REQUEST,
@@ -43,21 +84,46 @@ class SheetListView(APIView):
         serializer = CreateSheetSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
-        smartsheet_id = SmartsheetGateway.create_sheet(
-            token=request.user.smartsheet_token,
-            name=serializer.validated_data["name"],
-        )
+        if offline:
+            smartsheet_id = memory_sheets.create_sheet(
+                serializer.validated_data["name"]
+            )
+        else:
+            smartsheet_id = SmartsheetGateway.create_sheet(
+                token=request.user.smartsheet_token,
+                name=serializer.validated_data["name"],
+            )
 
         sheet = Sheet.objects.create(
             user=request.user,
             smartsheet_id=smartsheet_id,
             name=serializer.validated_data["name"],
         )
+        if settings.SMARTSHEET_WEBHOOK_URL and not offline:
+            self.watch_sheet(request, sheet)
 
         return Response(
             SheetSerializer(sheet).data, status=status.HTTP_201_CREATED
         )
 
+    def watch_sheet(self, request, sheet):
+        # The sheet is usable without a webhook, reads just keep
+        # checking the sheet version, so a failure here is not fatal.
+        try:
+            webhook_id, secret = SmartsheetGateway.create_webhook(
+                token=request.user.smartsheet_token,
+                sheet_id=sheet.smartsheet_id,
+                callback_url=settings.SMARTSHEET_WEBHOOK_URL,
+            )
+        except smartsheet.exceptions.SmartsheetException:
+            logger.exception(
+                "Could not create webhook for sheet %s", sheet.smartsheet_id
+            )
+            return
+        sheet.webhook_id = webhook_id
+        sheet.webhook_secret = secret
+        sheet.save(update_fields=["webhook_id", "webhook_secret"])
+
 
 class SheetDetailView(APIView):
     permission_classes = [IsAuthenticated]
@@ -67,136 +133,433 @@ class SheetDetailView(APIView):
 
     def delete(self, request, sheet_uuid):
         sheet = self.get_sheet(request, sheet_uuid)
+        if sheet.webhook_id:
+            try:
+                SmartsheetGateway.delete_webhook(
+                    token=request.user.smartsheet_token,
+                    webhook_id=sheet.webhook_id,
+                )
+            except smartsheet.exceptions.SmartsheetException:
+                logger.exception(
+                    "Could not delete webhook %s", sheet.webhook_id
+                )
+            sheet_changes.forget(sheet.smartsheet_id)
         sheet.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class ChecklistView(APIView):
+class ChecklistAPIView(APIView):
+    """Base for views that answer with the checklist tree.
+
+    Clients opt into delta responses with ``?since=<version>``: if the
+    rows at that version are still cached, only changed, removed and
+    reordered nodes are returned, otherwise the full tree together with
+    the current version. Writes are also published to SheetEventsView.
+    """
+
     permission_classes = [IsAuthenticated]
+    sheet = None
+
+    def perform_authentication(self, request):
+        with span("auth"):
+            super().perform_authentication(request)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, SheetChangedError):
+            logger.warning("Smartsheet sheet kept changing while being read")
+            return Response(
+                {
+                    "error": "The sheet changed while it was read. Please retry."
+                },
+                status=status.HTTP_409_CONFLICT,
+            )
+        return super().handle_exception(exc)
+
+    def get_sheet(self, request, sheet_uuid):
+        with span("sheet"):
+            self.sheet = Sheet.objects.get(user=request.user, uuid=sheet_uuid)
+        return self.sheet
 
     def get_gateway(self, request, sheet_uuid):
-        sheet = Sheet.objects.get(user=request.user, uuid=sheet_uuid)
+        sheet = self.get_sheet(request, sheet_uuid)
+        if settings.SMARTSHEET_PROVIDER == "memory":
+            return InMemorySheetProvider(sheet.smartsheet_id)
+        gateway = self.create_gateway(request, sheet)
+        if settings.SMARTSHEET_WRITE_BEHIND:
+            return WriteBehindProvider(gateway, sheet)
+        return gateway
+
+    def create_gateway(self, request, sheet):
         return SmartsheetGateway(
             token=request.user.smartsheet_token,
             sheet_id=sheet.smartsheet_id,
         )
 
-    def get(self, request, sheet_uuid):
-        gateway = self.get_gateway(request, sheet_uuid)
-        tree = GetChecklist(gateway).execute()
-        serializer = ChecklistItemSerializer(tree, many=True)
-        return Response(serializer.data)
+    def finalize_response(self, request, response, *args, **kwargs):
+        # Even a failed write may have changed some rows upstream.
+        if self.sheet is not None and request.method not in SAFE_METHODS:
+            mirror.expire(self.sheet)
+        return super().finalize_response(request, response, *args, **kwargs)
+
+    def get_base_rows(self, request, gateway):
+        since = request.query_params.get("since", "")
+        if not since.isdigit():
+            return None
+        return gateway.get_cached_rows(int(since))
+
+    def tree_response(
+        self,
+        request,
+        gateway,
+        tree,
+        base_rows=None,
+        status_code=status.HTTP_200_OK,
+    ):
+        with span("serialize"):
+            if "since" not in request.query_params:
+                data = ChecklistTreeSerializer(tree).data
+            elif base_rows is None:
+                data = {
+                    "version": gateway.version,
+                    "items": ChecklistTreeSerializer(tree).data,
+                }
+            else:
+                delta = TreeDiff.compute(
+                    base_rows, TreeBuilder.flatten(tree), gateway.version
+                )
+                data = ChecklistDeltaSerializer(delta).data
+        if request.method not in SAFE_METHODS:
+            self.publish_change(request, gateway, data, base_rows)
+        return Response(data, status=status_code)
+
+    def publish_change(self, request, gateway, data, base_rows):
+        """Push the write to clients following the sheet's events.
+
+        The delta sent back to the writer is shared as is; clients at
+        the version it starts from apply it, others reload with
+        ``?since``. Queued writes leave the version as it was, so a
+        delta is published whenever it changes anything. Without a
+        delta only the new version is sent.
+        """
+        if base_rows is None:
+            event = {"since": None, "version": gateway.version}
+        elif data["changed"] or data["removed"] or data["order"]:
+            event = {"since": int(request.query_params["since"]), **data}
+        else:
+            return
+        sheet_events.publish(self.sheet.smartsheet_id, event)
+
+
+class ChecklistView(ChecklistAPIView):
+    """Checklist tree of a sheet.
+
+    ``?stream=json`` sends the same tree while the rows are still being
+    read, ``?stream=ndjson`` one flat node per line in display order.
+    """
+
+    def create_gateway(self, request, sheet):
+        return mirror.MirroredGateway(
+            token=request.user.smartsheet_token,
+            sheet=sheet,
+            max_age=settings.SMARTSHEET_MIRROR_MAX_AGE,
+        )
 
+    STREAM_TYPES = {
+        "json": "application/json",
+        "ndjson": "application/x-ndjson",
+    }
 
-class ItemCreateView(APIView):
-    permission_classes = [IsAuthenticated]
-
-    def get_gateway(self, request, sheet_uuid):
-        sheet = Sheet.objects.get(user=request.user, uuid=sheet_uuid)
-        return SmartsheetGateway(
-            token=request.user.smartsheet_token,
-            sheet_id=sheet.smartsheet_id,
+    def get(self, request, sheet_uuid):
+        gateway = self.get_gateway(request, sheet_uuid)
+        stream = request.query_params.get("stream")
+        if stream in self.STREAM_TYPES and "since" not in request.query_params:
+            return self.stream_response(gateway, stream)
+
+        base_rows = self.get_base_rows(request, gateway)
+        # Includes reading the rows; with SMARTSHEET_SERVER_TIMING the
+        # gateway entries show how much of that was Smartsheet.
+        with span("tree"):
+            tree = GetChecklist(gateway).execute()
+        return self.tree_response(request, gateway, tree, base_rows)
+
+    def stream_response(self, gateway, stream):
+        """Send rows as they are read, as a tree or as NDJSON lines."""
+        rows = GetChecklist(gateway).rows()
+        # Read up to the first row before answering, so a failing
+        # upstream call still gets a proper error response.
+        first = next(rows, None)
+        if first is not None:
+            rows = chain([first], rows)
+
+        serializer = ChecklistStreamSerializer(rows)
+        return StreamingHttpResponse(
+            getattr(serializer, stream)(),
+            content_type=self.STREAM_TYPES[stream],
         )
 
+
+class ItemCreateView(ChecklistAPIView):
     def post(self, request, sheet_uuid):
         gateway = self.get_gateway(request, sheet_uuid)
         serializer = CreateItemSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
+        base_rows = self.get_base_rows(request, gateway)
         tree = AddItem(gateway).execute(
             CreateItemInput(**serializer.validated_data)
         )
-        return Response(
-            ChecklistItemSerializer(tree, many=True).data,
-            status=status.HTTP_201_CREATED,
+        return self.tree_response(
+            request,
+            gateway,
+            tree,
+            base_rows,
+            status_code=status.HTTP_201_CREATED,
         )
 
 
-class ItemDetailView(APIView):
-    permission_classes = [IsAuthenticated]
-
-    def get_gateway(self, request, sheet_uuid):
-        sheet = Sheet.objects.get(user=request.user, uuid=sheet_uuid)
-        return SmartsheetGateway(
-            token=request.user.smartsheet_token,
-            sheet_id=sheet.smartsheet_id,
-        )
-
+class ItemDetailView(ChecklistAPIView):
     def put(self, request, sheet_uuid, row_id):
         gateway = self.get_gateway(request, sheet_uuid)
         serializer = UpdateItemSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
+        base_rows = self.get_base_rows(request, gateway)
         tree = UpdateItem(gateway).execute(
             row_id, UpdateItemInput(**serializer.validated_data)
         )
-        return Response(ChecklistItemSerializer(tree, many=True).data)
+        return self.tree_response(request, gateway, tree, base_rows)
 
     def delete(self, request, sheet_uuid, row_id):
         gateway = self.get_gateway(request, sheet_uuid)
+        base_rows = self.get_base_rows(request, gateway)
         tree = DeleteItem(gateway).execute(row_id)
-        return Response(ChecklistItemSerializer(tree, many=True).data)
+        return self.tree_response(request, gateway, tree, base_rows)
 
 
-class ItemIndentView(APIView):
-    permission_classes = [IsAuthenticated]
+class ItemIndentView(ChecklistAPIView):
+    def post(self, request, sheet_uuid, row_id):
+        gateway = self.get_gateway(request, sheet_uuid)
+        base_rows = self.get_base_rows(request, gateway)
+        tree = IndentItem(gateway).execute(row_id)
+        return self.tree_response(request, gateway, tree, base_rows)
 
-    def get_gateway(self, request, sheet_uuid):
-        sheet = Sheet.objects.get(user=request.user, uuid=sheet_uuid)
-        return SmartsheetGateway(
-            token=request.user.smartsheet_token,
-            sheet_id=sheet.smartsheet_id,
-        )
 
+class ItemOutdentView(ChecklistAPIView):
     def post(self, request, sheet_uuid, row_id):
         gateway = self.get_gateway(request, sheet_uuid)
-        tree = IndentItem(gateway).execute(row_id)
-        return Response(ChecklistItemSerializer(tree, many=True).data)
+        base_rows = self.get_base_rows(request, gateway)
+        tree = OutdentItem(gateway).execute(row_id)
+        return self.tree_response(request, gateway, tree, base_rows)
 
 
-class ItemOutdentView(APIView):
-    permission_classes = [IsAuthenticated]
+class ItemMoveUpView(ChecklistAPIView):
+    def post(self, request, sheet_uuid, row_id):
+        gateway = self.get_gateway(request, sheet_uuid)
+        base_rows = self.get_base_rows(request, gateway)
+        tree = MoveItemUp(gateway).execute(row_id)
+        return self.tree_response(request, gateway, tree, base_rows)
 
-    def get_gateway(self, request, sheet_uuid):
-        sheet = Sheet.objects.get(user=request.user, uuid=sheet_uuid)
-        return SmartsheetGateway(
-            token=request.user.smartsheet_token,
-            sheet_id=sheet.smartsheet_id,
-        )
 
+class ItemMoveDownView(ChecklistAPIView):
     def post(self, request, sheet_uuid, row_id):
         gateway = self.get_gateway(request, sheet_uuid)
-        tree = OutdentItem(gateway).execute(row_id)
-        return Response(ChecklistItemSerializer(tree, many=True).data)
+        base_rows = self.get_base_rows(request, gateway)
+        tree = MoveItemDown(gateway).execute(row_id)
+        return self.tree_response(request, gateway, tree, base_rows)
+
+
+class ItemBulkView(ChecklistAPIView):
+    INPUTS = {"create": CreateItemInput, "update": UpdateItemInput}
+
+    def post(self, request, sheet_uuid):
+        gateway = self.get_gateway(request, sheet_uuid)
+        serializer = BulkItemsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        operations = []
+        for operation in serializer.validated_data["operations"]:
+            input_class = self.INPUTS.get(operation["op"])
+            operations.append(
+                ItemOperation(
+                    op=operation["op"],
+                    row_id=operation.get("row_id"),
+                    data=input_class(**operation["data"])
+                    if input_class
+                    else None,
+                )
+            )
+
+        base_rows = self.get_base_rows(request, gateway)
+        tree = ApplyItemOperations(gateway).execute(operations)
+        return self.tree_response(request, gateway, tree, base_rows)
 
 
-class ItemMoveUpView(APIView):
+class SheetConflictsView(APIView):
+    """Queued writes that Smartsheet rejected when they were flushed."""
+
     permission_classes = [IsAuthenticated]
 
-    def get_gateway(self, request, sheet_uuid):
-        sheet = Sheet.objects.get(user=request.user, uuid=sheet_uuid)
-        return SmartsheetGateway(
-            token=request.user.smartsheet_token,
-            sheet_id=sheet.smartsheet_id,
+    def get_conflicts(self, request, sheet_uuid):
+        return PendingWrite.objects.filter(
+            sheet__user=request.user,
+            sheet__uuid=sheet_uuid,
+            status=PendingWrite.Status.FAILED,
         )
 
-    def post(self, request, sheet_uuid, row_id):
-        gateway = self.get_gateway(request, sheet_uuid)
-        tree = MoveItemUp(gateway).execute(row_id)
-        return Response(ChecklistItemSerializer(tree, many=True).data)
+    def get(self, request, sheet_uuid):
+        conflicts = self.get_conflicts(request, sheet_uuid)
+        return Response(PendingWriteSerializer(conflicts, many=True).data)
 
+    def delete(self, request, sheet_uuid):
+        self.get_conflicts(request, sheet_uuid).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
-class ItemMoveDownView(APIView):
-    permission_classes = [IsAuthenticated]
 
-    def get_gateway(self, request, sheet_uuid):
-        sheet = Sheet.objects.get(user=request.user, uuid=sheet_uuid)
-        return SmartsheetGateway(
-            token=request.user.smartsheet_token,
-            sheet_id=sheet.smartsheet_id,
+class SmartsheetWebhookView(APIView):
+    """Receiver for Smartsheet webhook requests.
+
+    Verification requests carry a challenge that has to be echoed back.
+    Callbacks are signed with the webhook's shared secret and only say
+    that the sheet changed, so they give the sheet a new change stamp
+    and expire its row mirror; the next read checks the sheet version
+    before using cached rows. Clients following the sheet's events are
+    told to reload.
+    """
+
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def post(self, request):
+        body = request.body
+        challenge = request.data.get("challenge")
+        if challenge:
+            return Response(
+                {"smartsheetHookResponse": challenge},
+                headers={"Smartsheet-Hook-Response": challenge},
+            )
+
+        sheet = Sheet.objects.filter(
+            webhook_id=request.data.get("webhookId")
+        ).first()
+        if sheet is None:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+
+        signature = hmac.new(
+            sheet.webhook_secret.encode(), body, hashlib.sha256
+        ).hexdigest()
+        if not hmac.compare_digest(
+            signature, request.headers.get("Smartsheet-Hmac-SHA256", "")
+        ):
+            return Response(status=status.HTTP_403_FORBIDDEN)
+
+        sheet_changes.bump(sheet.smartsheet_id)
+        mirror.expire(sheet)
+        sheet_events.publish(
+            sheet.smartsheet_id, {"since": None, "version": None}
         )
+        logger.debug(
+            "Sheet %s changed upstream (%d events)",
+            sheet.smartsheet_id,
+            len(request.data.get("events", [])),
+        )
+        return Response(status=status.HTTP_200_OK)
 
-    def post(self, request, sheet_uuid, row_id):
-        gateway = self.get_gateway(request, sheet_uuid)
-        tree = MoveItemDown(gateway).execute(row_id)
-        return Response(ChecklistItemSerializer(tree, many=True).data)
+
+class EventStreamRenderer(BaseRenderer):
+    """Lets clients ask for ``text/event-stream``; errors stay JSON."""
+
+    media_type = "text/event-stream"
+    format = "event-stream"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data).encode()
+
+
+class SheetEventsView(ChecklistAPIView):
+    """Changes to a sheet as server-sent events.
+
+    Each ``change`` event carries the sheet version a write started
+    from as ``since`` and the ``version`` it produced, plus the delta
+    (``changed``, ``removed``, ``order``) when it is known. Clients at
+    ``since`` apply the delta; any other client whose version differs
+    reloads with ``?since``. ``since`` and ``version`` are null for
+    changes made in Smartsheet itself. A ``reload`` event means events
+    were missed. Reconnecting with ``Last-Event-ID`` resumes where the
+    previous stream ended.
+
+    Each open stream holds a worker thread until it ends, after
+    SMARTSHEET_EVENTS_STREAM_SECONDS, so size the worker pool for the
+    number of open checklist pages.
+    """
+
+    renderer_classes = [EventStreamRenderer, JSONRenderer]
+
+    # Seconds between checks for events published by other processes,
+    # and between keep-alive comments on an idle stream.
+    POLL_INTERVAL = 1.0
+    KEEPALIVE_INTERVAL = 15.0
+
+    def get(self, request, sheet_uuid):
+        sheet = self.get_sheet(request, sheet_uuid)
+        last_id = request.headers.get("Last-Event-ID", "")
+        if last_id.isdigit():
+            event_id = int(last_id)
+        else:
+            event_id = sheet_events.last_id(sheet.smartsheet_id)
+
+        response = StreamingHttpResponse(
+            self.stream(sheet.smartsheet_id, event_id),
+            content_type="text/event-stream",
+        )
+        response.headers["Cache-Control"] = "no-cache"
+        # Keep nginx from buffering the stream.
+        response.headers["X-Accel-Buffering"] = "no"
+        return response
+
+    def stream(self, sheet_id, event_id):
+        cursor = event_id
+        last_sent = time.monotonic()
+        deadline = last_sent + settings.SMARTSHEET_EVENTS_STREAM_SECONDS
+        yield f"id: {cursor}\nretry: 1000\n\n"
+        while True:
+            for number, data in sheet_events.since(sheet_id, cursor):
+                name = "reload" if data is None else "change"
+                cursor = number
+                yield (
+                    f"id: {number}\nevent: {name}\n"
+                    f"data: {json.dumps(data or {})}\n\n"
+                )
+                last_sent = time.monotonic()
+
+            now = time.monotonic()
+            if now >= deadline:
+                return
+            if now - last_sent >= self.KEEPALIVE_INTERVAL:
+                yield ": keep-alive\n\n"
+                last_sent = now
+            sheet_events.wait(min(self.POLL_INTERVAL, deadline - now))
+
+
+class MetricsView(View):
+    """Smartsheet call totals of this process, for Prometheus to scrape.
+
+    Not found unless SMARTSHEET_METRICS is on; with a
+    SMARTSHEET_METRICS_TOKEN, requests must carry it as a bearer token.
+    """
+
+    def get(self, request):
+        if not settings.SMARTSHEET_METRICS:
+            raise Http404
+        token = settings.SMARTSHEET_METRICS_TOKEN
+        if token and not hmac.compare_digest(
+            request.headers.get("Authorization", ""), f"Bearer {token}"
+        ):
+            return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+        body = (
+            upstream_metrics.render()
+            + render_stats("smartsheet_rate_limit", bucket.stats)
+            + render_stats("smartsheet_client_pool", client_pool.stats)
+        )
+        return HttpResponse(
+            body, content_type="text/plain; version=0.0.4; charset=utf-8"
+        )
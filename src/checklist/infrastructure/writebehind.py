@@ -0,0 +1,251 @@
+import logging
+from collections.abc import Iterable, Iterator
+from dataclasses import replace
+
+from django.db import transaction
+
+import smartsheet
+from checklist.domain.interfaces import SheetProviderInterface
+from checklist.domain.models import PendingWrite, Sheet
+from checklist.domain.types import ChecklistItem
+from checklist.infrastructure import mirror
+from checklist.infrastructure.cache import sheet_changes, sheet_events
+from checklist.infrastructure.gateways import CELL_FIELDS, SmartsheetGateway
+
+logger = logging.getLogger(__name__)
+
+# Failures worth retrying on the next flush rather than reporting as a
+# conflict; the queued writes are idempotent.
+TRANSIENT_ERRORS = (
+    smartsheet.exceptions.RateLimitExceededError,
+    smartsheet.exceptions.SystemMaintenanceError,
+    smartsheet.exceptions.ServerTimeoutExceededError,
+    smartsheet.exceptions.UnexpectedErrorShouldRetryError,
+)
+
+
+def _overlay(
+    items: Iterable[ChecklistItem], writes: list[PendingWrite]
+) -> Iterator[ChecklistItem]:
+    """Yield rows as they will be once the queued writes are flushed."""
+    fields: dict[int, dict] = {}
+    deleted: set[int] = set()
+    for write in writes:
+        if write.op == PendingWrite.Op.DELETE:
+            deleted.add(write.row_id)
+        else:
+            fields.setdefault(write.row_id, {}).update(write.data)
+
+    for item in items:
+        if item.id in deleted or item.parent_id in deleted:
+            # Rows come parent first, so descendants are caught too.
+            deleted.add(item.id)
+            continue
+        if item.id in fields:
+            yield replace(item, **fields[item.id])
+        else:
+            yield item
+
+
+def _coalesce(
+    writes: list[PendingWrite],
+) -> tuple[dict[int, dict], list[int], dict[int, list[PendingWrite]]]:
+    """Collapse queued writes into one update per row and the deletes.
+
+    Returns the updates, the deleted row ids and, per row, the queued
+    writes that the upstream call for that row settles.
+    """
+    updates: dict[int, dict] = {}
+    deletes: list[int] = []
+    owners: dict[int, list[PendingWrite]] = {}
+    for write in writes:
+        owners.setdefault(write.row_id, []).append(write)
+        if write.op == PendingWrite.Op.DELETE:
+            updates.pop(write.row_id, None)
+            if write.row_id not in deletes:
+                deletes.append(write.row_id)
+        elif write.row_id not in deletes:
+            updates.setdefault(write.row_id, {}).update(write.data)
+    return updates, deletes, owners
+
+
+def _send(send, rows: dict, errors: dict[int, str]) -> None:
+    """Send ``rows`` in one call, or row by row if Smartsheet rejects it.
+
+    One bad row fails the whole request, so the rows are then sent one
+    at a time to find which; their errors are added to ``errors``.
+    """
+    if not rows:
+        return
+    try:
+        send(rows)
+    except TRANSIENT_ERRORS:
+        raise
+    except smartsheet.exceptions.ApiError:
+        for row_id, value in rows.items():
+            try:
+                send({row_id: value})
+            except TRANSIENT_ERRORS:
+                raise
+            except smartsheet.exceptions.ApiError as exc:
+                errors[row_id] = getattr(exc, "message", None) or str(exc)
+
+
+def flush_sheet(sheet: Sheet) -> int:
+    """Send the sheet's queued writes upstream in as few calls as possible.
+
+    Writes Smartsheet rejects are kept as failed, with the error, for
+    the client to pick up. Transient errors propagate and leave the
+    queue untouched for the next attempt. Returns the writes settled.
+    """
+    writes = list(
+        sheet.pending_writes.filter(status=PendingWrite.Status.PENDING)
+    )
+    if not writes:
+        return 0
+
+    updates, deletes, owners = _coalesce(writes)
+    gateway = SmartsheetGateway(
+        token=sheet.user.smartsheet_token, sheet_id=sheet.smartsheet_id
+    )
+    errors: dict[int, str] = {}
+    _send(gateway.update_rows, updates, errors)
+    _send(
+        lambda rows: gateway.delete_rows(list(rows)),
+        dict.fromkeys(deletes),
+        errors,
+    )
+
+    with transaction.atomic():
+        for row_id, message in errors.items():
+            logger.warning(
+                "Queued write to row %s of sheet %s failed: %s",
+                row_id,
+                sheet.smartsheet_id,
+                message,
+            )
+            PendingWrite.objects.filter(
+                pk__in=[write.pk for write in owners.pop(row_id)]
+            ).update(status=PendingWrite.Status.FAILED, error=message)
+        PendingWrite.objects.filter(
+            pk__in=[
+                write.pk
+                for row_writes in owners.values()
+                for write in row_writes
+            ]
+        ).delete()
+    # Workers trusting their cached rows under the old change stamp
+    # would otherwise keep serving them without the flushed edits,
+    # which the overlay no longer adds.
+    sheet_changes.bump(sheet.smartsheet_id)
+    mirror.expire(sheet)
+    # The queued edits clients were shown are now upstream, or reverted
+    # if they failed; either way followers reload.
+    sheet_events.publish(
+        sheet.smartsheet_id, {"since": None, "version": gateway.version}
+    )
+    logger.info(
+        "Flushed %d queued write(s) to sheet %s in %d row update(s) and "
+        "%d delete(s)",
+        len(writes),
+        sheet.smartsheet_id,
+        len(updates),
+        len(deletes),
+    )
+    return len(writes)
+
+
+class WriteBehindProvider(SheetProviderInterface):
+    """Queue cell updates and deletes instead of sending them upstream.
+
+    Queued writes are checked against the current rows, stored in the
+    database and shown in every read through this provider until the
+    ``flush_writes`` worker has sent them. Adding and moving rows needs
+    ids and positions from Smartsheet, so those still go straight
+    through to the wrapped provider.
+    """
+
+    def __init__(self, provider: SheetProviderInterface, sheet: Sheet):
+        self.provider = provider
+        self.sheet = sheet
+
+    @property
+    def version(self) -> int | None:
+        return self.provider.version
+
+    def get_cached_rows(self, version: int) -> list[ChecklistItem] | None:
+        return self.provider.get_cached_rows(version)
+
+    def _pending(self) -> list[PendingWrite]:
+        return list(
+            self.sheet.pending_writes.filter(
+                status=PendingWrite.Status.PENDING
+            )
+        )
+
+    def get_rows(self) -> list[ChecklistItem]:
+        return list(_overlay(self.provider.get_rows(), self._pending()))
+
+    def iter_rows(self) -> Iterator[ChecklistItem]:
+        return _overlay(self.provider.iter_rows(), self._pending())
+
+    def _queue(self, op: str, changes: dict[int, dict]) -> dict:
+        rows = {item.id: item for item in self.get_rows()}
+        missing = sorted(set(changes) - set(rows))
+        if missing:
+            raise ValueError(f"Row {missing[0]} not found")
+
+        PendingWrite.objects.bulk_create(
+            PendingWrite(sheet=self.sheet, op=op, row_id=row_id, data=data)
+            for row_id, data in changes.items()
+            # An update without cell fields has nothing to send.
+            if data or op == PendingWrite.Op.DELETE
+        )
+        return rows
+
+    def add_row(
+        self,
+        name: str,
+        status: str,
+        assignee: str,
+        notes: str,
+        parent_id: int | None = None,
+    ) -> ChecklistItem:
+        return self.provider.add_row(
+            name, status, assignee, notes, parent_id=parent_id
+        )
+
+    def add_rows(self, rows: list[dict]) -> list[ChecklistItem]:
+        return self.provider.add_rows(rows)
+
+    def update_row(self, row_id: int, **fields) -> ChecklistItem:
+        return self.update_rows({row_id: fields})[0]
+
+    def update_rows(self, updates: dict[int, dict]) -> list[ChecklistItem]:
+        updates = {
+            row_id: {
+                name: value
+                for name, value in fields.items()
+                if name in CELL_FIELDS
+            }
+            for row_id, fields in updates.items()
+        }
+        rows = self._queue(PendingWrite.Op.UPDATE, updates)
+        return [
+            replace(rows[row_id], **fields)
+            for row_id, fields in updates.items()
+        ]
+
+    def delete_row(self, row_id: int) -> None:
+        self._queue(PendingWrite.Op.DELETE, {row_id: {}})
+
+    def delete_rows(self, row_ids: list[int]) -> None:
+        self._queue(PendingWrite.Op.DELETE, {row_id: {} for row_id in row_ids})
+
+    def move_row(self, row_id: int, parent_id: int | None) -> ChecklistItem:
+        return self.provider.move_row(row_id, parent_id)
+
+    def reorder_row(
+        self, row_id: int, sibling_id: int, above: bool = True
+    ) -> ChecklistItem:
+        return self.provider.reorder_row(row_id, sibling_id, above=above)
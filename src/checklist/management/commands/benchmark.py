@@ -0,0 +1,330 @@
+import logging
+import time
+import tracemalloc
+from collections import Counter
+from collections.abc import Callable
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+import smartsheet
+from accounts.models import User
+from checklist.application.use_cases import (
+    AddItem,
+    CreateItemInput,
+    GetChecklist,
+    IndentItem,
+    MoveItemDown,
+    MoveItemUp,
+    OutdentItem,
+    UpdateItem,
+    UpdateItemInput,
+)
+from checklist.domain.services import TreeBuilder
+from checklist.infrastructure.cache import column_map_cache, row_cache
+from checklist.infrastructure.gateways import SHEET_COLUMNS, SmartsheetGateway
+from checklist.infrastructure.serializers import (
+    ChecklistItemSerializer,
+    ChecklistStreamSerializer,
+    ChecklistTreeSerializer,
+)
+from core.crypto import encrypt
+from rest_framework.renderers import JSONRenderer
+
+
+def make_sheet(rows: int, depth: int = 3) -> smartsheet.models.Sheet:
+    """Build an SDK sheet with nested rows, without touching the API."""
+    columns = [
+        {"id": 100 + index, "title": col["title"]}
+        for index, col in enumerate(SHEET_COLUMNS)
+    ]
+    data = []
+    parents: list[int] = []
+    for row_id in range(1, rows + 1):
+        level = row_id % (depth + 1)
+        parents = parents[:level]
+        row = {
+            "id": row_id,
+            "rowNumber": row_id,
+            "cells": [
+                {"columnId": 100, "value": f"Task {row_id}"},
+                {"columnId": 101, "value": "Not Started"},
+                {"columnId": 102, "value": "owner@example.com"},
+                {"columnId": 103, "value": ""},
+            ],
+        }
+        if parents:
+            row["parentId"] = parents[-1]
+        data.append(row)
+        parents.append(row_id)
+    return smartsheet.models.Sheet(
+        {"id": 1, "version": 1, "columns": columns, "rows": data}
+    )
+
+
+def fill_fake(fake, rows: int, depth: int = 3) -> int:
+    """Add a sheet with nested rows to a FakeSmartsheet, like make_sheet."""
+    sheet_id = fake.new_sheet()
+    columns = [col["id"] for col in fake.sheets[sheet_id]["columns"]]
+    parents: list[int] = []
+    for number in range(1, rows + 1):
+        level = number % (depth + 1)
+        parents = parents[:level]
+        row_id = next(fake._ids)
+        values = [f"Task {number}", "Not Started", "owner@example.com", ""]
+        fake.rows(sheet_id).append(
+            {
+                "id": row_id,
+                "parent_id": parents[-1] if parents else None,
+                "cells": dict(zip(columns, values, strict=True)),
+            }
+        )
+        parents.append(row_id)
+    return sheet_id
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def timed(func: Callable[[], object], repeat: int) -> list[float]:
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        seconds.append(time.perf_counter() - start)
+    return seconds
+
+
+class Command(BaseCommand):
+    help = "Measure CPU time and memory of checklist hot paths."
+
+    scenarios = ("items", "tree", "stream", "users", "api")
+
+    def add_arguments(self, parser):
+        parser.add_argument("scenario", choices=self.scenarios)
+        parser.add_argument("--rows", type=int, default=10_000)
+        parser.add_argument("--depth", type=int, default=3)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument(
+            "--latency",
+            type=float,
+            default=0,
+            help="Milliseconds the fake Smartsheet waits per request (api).",
+        )
+
+    def handle(self, *args, **options):
+        if options["scenario"] == "api":
+            # Runs against its own fake sheet, not an SDK model.
+            self.bench_api(options)
+            return
+        sheet = make_sheet(options["rows"], options["depth"])
+        getattr(self, f"bench_{options['scenario']}")(sheet, options)
+
+    def report(self, label: str, seconds: list[float], memory: int = 0):
+        seconds = sorted(seconds)
+        line = (
+            f"{label}: best {seconds[0] * 1000:.1f} ms, "
+            f"median {seconds[len(seconds) // 2] * 1000:.1f} ms"
+        )
+        if memory:
+            line += f", {memory / 1024:.0f} KiB"
+        self.stdout.write(line)
+
+    def bench_items(self, sheet, options):
+        """Convert SDK rows with _row_to_item and measure the result."""
+        gateway = SmartsheetGateway(token="benchmark", sheet_id=sheet.id)
+        gateway._set_column_map(sheet)
+
+        seconds = timed(
+            lambda: [gateway._row_to_item(row) for row in sheet.rows],
+            options["repeat"],
+        )
+
+        tracemalloc.start()
+        items = [gateway._row_to_item(row) for row in sheet.rows]
+        memory, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        self.report(f"_row_to_item x{len(items)}", seconds, memory)
+
+    def bench_tree(self, sheet, options):
+        """Serialize the built tree with the DRF and fast-path serializers."""
+        gateway = SmartsheetGateway(token="benchmark", sheet_id=sheet.id)
+        gateway._set_column_map(sheet)
+        tree = TreeBuilder.build(
+            [gateway._row_to_item(row) for row in sheet.rows]
+        )
+
+        for label, serialize in [
+            (
+                "ChecklistItemSerializer",
+                lambda: ChecklistItemSerializer(tree, many=True).data,
+            ),
+            (
+                "ChecklistTreeSerializer",
+                lambda: ChecklistTreeSerializer(tree).data,
+            ),
+        ]:
+            seconds = timed(serialize, options["repeat"])
+            self.report(f"{label} x{len(sheet.rows)}", seconds)
+
+    def bench_stream(self, sheet, options):
+        """Peak memory of rendering the tree whole versus streaming it."""
+        gateway = SmartsheetGateway(token="benchmark", sheet_id=sheet.id)
+        gateway._set_column_map(sheet)
+        items = [gateway._row_to_item(row) for row in sheet.rows]
+
+        def rendered():
+            tree = TreeBuilder.build(items)
+            return JSONRenderer().render(ChecklistTreeSerializer(tree).data)
+
+        def streamed():
+            for chunk in ChecklistStreamSerializer(iter(items)).json():
+                chunk.encode()
+
+        for label, render in [("rendered", rendered), ("streamed", streamed)]:
+            seconds = timed(render, options["repeat"])
+            tracemalloc.start()
+            render()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self.report(f"{label} x{len(items)}", seconds, peak)
+
+    def bench_users(self, sheet, options):
+        """Load users from row values, with and without reading the token.
+
+        Rows go through the field converters and Model.from_db the way
+        a queryset does, so the numbers leave out only the database.
+        """
+        fields = User._meta.concrete_fields
+        template = User(
+            email="bench@example.com", name="Bench", smartsheet_token=""
+        )
+        values = [getattr(template, field.attname) for field in fields]
+        token = [field.attname for field in fields].index("smartsheet_token")
+        values[token] = encrypt("benchmark-token-" + "x" * 20)
+        names = [field.attname for field in fields]
+
+        def load():
+            users = []
+            for _ in range(len(sheet.rows)):
+                row = list(values)
+                for index, field in enumerate(fields):
+                    if hasattr(field, "from_db_value"):
+                        row[index] = field.from_db_value(
+                            row[index], None, connection
+                        )
+                users.append(User.from_db("default", names, row))
+            return users
+
+        seconds = timed(load, options["repeat"])
+        self.report(f"load x{len(sheet.rows)}", seconds)
+        seconds = timed(
+            lambda: [user.smartsheet_token for user in load()],
+            options["repeat"],
+        )
+        self.report(f"load + read token x{len(sheet.rows)}", seconds)
+
+    def bench_api(self, options):
+        """Drive the use cases through the gateway over HTTP.
+
+        The gateway talks to a FakeSmartsheetServer with the real SDK,
+        so every row goes through request building and JSON parsing.
+        Each operation gets a fresh gateway, as a request would, and
+        reports its upstream calls, bytes sent and received, wall time
+        percentiles and the CPU time spent in this thread.
+        """
+        # The fakes live with the tests, which a deployment may leave
+        # out; only this scenario needs them.
+        from checklist.tests.fake_server import FakeSmartsheetServer
+
+        # The SDK logs every request at INFO.
+        logging.getLogger("smartsheet").setLevel(logging.WARNING)
+        logging.getLogger("checklist").setLevel(logging.WARNING)
+        server = FakeSmartsheetServer(latency=options["latency"] / 1000)
+        fake = server.fake
+        sheet_id = fill_fake(fake, options["rows"], options["depth"])
+        client = server.client()
+
+        def gateway():
+            gateway = SmartsheetGateway(token="benchmark", sheet_id=sheet_id)
+            gateway.client = client
+            return gateway
+
+        def top_level():
+            rows = fake.rows(sheet_id)
+            ids = [row["id"] for row in rows if row["parent_id"] is None]
+            return ids[len(ids) // 2]
+
+        def nested():
+            rows = fake.rows(sheet_id)
+            top = {row["id"] for row in rows if row["parent_id"] is None}
+            ids = [row["id"] for row in rows if row["parent_id"] in top]
+            return ids[len(ids) // 2]
+
+        def read_cold():
+            row_cache.clear()
+            column_map_cache.clear()
+            GetChecklist(gateway()).execute()
+
+        statuses = iter(["Complete", "Not Started"] * options["repeat"])
+        operations = [
+            ("read (cold)", read_cold),
+            ("read (cached)", lambda: GetChecklist(gateway()).execute()),
+            (
+                "add",
+                lambda: AddItem(gateway()).execute(
+                    CreateItemInput(name="Benchmark", parent_id=top_level())
+                ),
+            ),
+            (
+                "update",
+                lambda: UpdateItem(gateway()).execute(
+                    top_level(), UpdateItemInput(status=next(statuses))
+                ),
+            ),
+            ("indent", lambda: IndentItem(gateway()).execute(top_level())),
+            ("outdent", lambda: OutdentItem(gateway()).execute(nested())),
+            (
+                "move down",
+                lambda: MoveItemDown(gateway()).execute(top_level()),
+            ),
+            ("move up", lambda: MoveItemUp(gateway()).execute(top_level())),
+        ]
+
+        with server:
+            # Warm up connections and caches outside the measurements.
+            GetChecklist(gateway()).execute()
+            self.stdout.write(
+                f"{len(fake.rows(sheet_id))} rows, depth {options['depth']}, "
+                f"{options['latency']:g} ms latency, "
+                f"{options['repeat']} runs"
+            )
+            for label, operation in operations:
+                seconds, cpu = [], []
+                calls, sent, received = Counter(), 0, 0
+                for _ in range(options["repeat"]):
+                    server.reset()
+                    start, start_cpu = time.perf_counter(), time.thread_time()
+                    operation()
+                    seconds.append(time.perf_counter() - start)
+                    cpu.append(time.thread_time() - start_cpu)
+                    calls.update(server.calls)
+                    sent += sum(server.bytes_in.values())
+                    received += sum(server.bytes_out.values())
+
+                runs = options["repeat"]
+                upstream = ", ".join(
+                    f"{name} {count / runs:g}"
+                    for name, count in sorted(calls.items())
+                )
+                self.stdout.write(
+                    f"{label}: p50 {percentile(seconds, 0.5) * 1000:.1f} ms, "
+                    f"p95 {percentile(seconds, 0.95) * 1000:.1f} ms, "
+                    f"cpu {sorted(cpu)[len(cpu) // 2] * 1000:.1f} ms, "
+                    f"{sent / runs / 1024:.1f} KiB up, "
+                    f"{received / runs / 1024:.1f} KiB down, "
+                    f"calls: {upstream or 'none'}"
+                )
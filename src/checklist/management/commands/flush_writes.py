@@ -0,0 +1,58 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+import smartsheet
+from checklist.domain.models import PendingWrite, Sheet
+from checklist.infrastructure.writebehind import flush_sheet
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Send queued item writes to Smartsheet. Run a single instance, "
+        "writes are not claimed per worker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=settings.SMARTSHEET_WRITE_BEHIND_INTERVAL,
+            help="Seconds between flush rounds.",
+        )
+        parser.add_argument(
+            "--once", action="store_true", help="Run a single round."
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            flushed = self.flush_all()
+            if flushed or options["once"]:
+                self.stdout.write(f"Flushed {flushed} write(s)")
+            if options["once"]:
+                return
+            time.sleep(
+                max(0.0, options["interval"] - (time.monotonic() - started))
+            )
+
+    def flush_all(self) -> int:
+        flushed = 0
+        sheets = Sheet.objects.select_related("user").filter(
+            pk__in=PendingWrite.objects.filter(
+                status=PendingWrite.Status.PENDING
+            ).values("sheet")
+        )
+        for sheet in sheets:
+            try:
+                flushed += flush_sheet(sheet)
+            except smartsheet.exceptions.SmartsheetException:
+                # The writes stay queued and are retried next round.
+                logger.exception(
+                    "Could not flush writes to sheet %s", sheet.smartsheet_id
+                )
+        return flushed
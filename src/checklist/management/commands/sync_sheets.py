@@ -0,0 +1,52 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+import smartsheet
+from checklist.domain.models import Sheet
+from checklist.infrastructure.mirror import sync_sheet
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Keep the local row mirror of every sheet in sync."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=settings.SMARTSHEET_MIRROR_INTERVAL,
+            help="Seconds between sync rounds.",
+        )
+        parser.add_argument(
+            "--once", action="store_true", help="Run a single round."
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            synced = self.sync_all()
+            self.stdout.write(f"Synced {synced} sheet(s)")
+            if options["once"]:
+                return
+            time.sleep(
+                max(0.0, options["interval"] - (time.monotonic() - started))
+            )
+
+    def sync_all(self) -> int:
+        synced = 0
+        sheets = Sheet.objects.select_related("user").exclude(
+            user__smartsheet_token=""
+        )
+        for sheet in sheets.iterator():
+            try:
+                synced += sync_sheet(sheet)
+            except smartsheet.exceptions.SmartsheetException:
+                # Keep whatever is mirrored and try again next round.
+                logger.exception(
+                    "Could not sync sheet %s", sheet.smartsheet_id
+                )
+        return synced
@@ -0,0 +1,177 @@
+import json
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import smartsheet
+from checklist.infrastructure.metrics import instrument_session
+from checklist.tests.fakes import FakeSmartsheet
+
+
+def _error(code: int, message: str) -> bytes:
+    return json.dumps({"errorCode": code, "message": message}).encode()
+
+
+def _ids(value: str | None) -> list[int] | None:
+    return [int(part) for part in value.split(",")] if value else None
+
+
+class FakeSmartsheetServer:
+    """Serve a FakeSmartsheet over HTTP on localhost.
+
+    Lets the real SDK client, with its request building, JSON parsing
+    and error mapping, talk to the fake. Every request is delayed by
+    ``latency`` seconds and counted per operation together with the
+    bytes sent each way.
+    """
+
+    routes = [
+        ("GET", re.compile(r"/sheets/(\d+)/version"), "get_sheet_version"),
+        ("GET", re.compile(r"/sheets/(\d+)"), "get_sheet"),
+        ("POST", re.compile(r"/sheets/(\d+)/rows"), "add_rows"),
+        ("PUT", re.compile(r"/sheets/(\d+)/rows"), "update_rows"),
+        ("DELETE", re.compile(r"/sheets/(\d+)/rows"), "delete_rows"),
+    ]
+
+    def __init__(self, fake: FakeSmartsheet | None = None, latency=0.0):
+        self.fake = fake or FakeSmartsheet()
+        self.latency = latency
+        self.calls = Counter()
+        self.bytes_in = Counter()
+        self.bytes_out = Counter()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self._server.daemon_threads = True
+        self._server.owner = self
+        self._thread = None
+
+    @property
+    def api_base(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/2.0"
+
+    def __enter__(self):
+        self._thread = threading.Thread(
+            target=self._server.serve_forever,
+            kwargs={"poll_interval": 0.05},
+            daemon=True,
+        )
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def client(self, token: str = "token") -> smartsheet.Smartsheet:
+        client = smartsheet.Smartsheet(
+            token, api_base=self.api_base, user_agent="benchmark"
+        )
+        client.errors_as_exceptions(True)
+        instrument_session(client._session)
+        return client
+
+    def reset(self) -> None:
+        with self._lock:
+            self.calls.clear()
+            self.bytes_in.clear()
+            self.bytes_out.clear()
+
+    def handle(self, method: str, url: str, body: bytes) -> tuple[int, bytes]:
+        """Answer one request; returns the status and the JSON body."""
+        parts = urlsplit(url)
+        path = parts.path.removeprefix("/2.0")
+        query = {
+            key: values[-1] for key, values in parse_qs(parts.query).items()
+        }
+        for route_method, pattern, name in self.routes:
+            match = pattern.fullmatch(path)
+            if route_method == method and match:
+                break
+        else:
+            return 404, _error(1006, "Not Found")
+
+        with self._lock:
+            self.calls[name] += 1
+            self.bytes_in[name] += len(body)
+        if self.latency:
+            time.sleep(self.latency)
+
+        sheet_id = int(match.group(1))
+        data = json.loads(body) if body else None
+        # The fake is not thread-safe; requests are served one at a
+        # time, as Smartsheet does for writes to one sheet.
+        with self._lock:
+            try:
+                result = getattr(self, f"_{name}")(sheet_id, query, data)
+            except smartsheet.exceptions.ApiError as exc:
+                error = exc.error.result
+                status = error.status_code
+                response = _error(error.code, error.message)
+            except KeyError:
+                status, response = 404, _error(1006, "Not Found")
+            else:
+                payload = result.to_dict()
+                # Results carry their rows twice, as data and result.
+                payload.pop("data", None)
+                status, response = 200, json.dumps(payload).encode()
+            self.bytes_out[name] += len(response)
+        return status, response
+
+    def _get_sheet(self, sheet_id, query, data):
+        page_size = query.get("pageSize")
+        return self.fake.Sheets.get_sheet(
+            sheet_id,
+            row_ids=_ids(query.get("rowIds")),
+            column_ids=_ids(query.get("columnIds")),
+            page_size=int(page_size) if page_size else None,
+            page=int(query.get("page", 1)),
+        )
+
+    def _get_sheet_version(self, sheet_id, query, data):
+        return self.fake.Sheets.get_sheet_version(sheet_id)
+
+    def _add_rows(self, sheet_id, query, data):
+        return self.fake.Sheets.add_rows(
+            sheet_id, [smartsheet.models.Row(row) for row in data]
+        )
+
+    def _update_rows(self, sheet_id, query, data):
+        return self.fake.Sheets.update_rows(
+            sheet_id, [smartsheet.models.Row(row) for row in data]
+        )
+
+    def _delete_rows(self, sheet_id, query, data):
+        return self.fake.Sheets.delete_rows(
+            sheet_id,
+            _ids(query.get("ids")) or [],
+            ignore_rows_not_found=(
+                query.get("ignoreRowsNotFound", "").lower() == "true"
+            ),
+        )
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without this every
+    # keep-alive request stalls on a delayed ACK.
+    disable_nagle_algorithm = True
+
+    def _respond(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        status, data = self.server.owner.handle(self.command, self.path, body)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json;charset=UTF-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_POST = do_PUT = do_DELETE = _respond
+
+    def log_message(self, format, *args):
+        pass
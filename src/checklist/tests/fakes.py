@@ -0,0 +1,446 @@
+import hashlib
+import hmac
+import json
+import secrets
+import tempfile
+from collections import Counter
+from itertools import count
+from unittest import mock
+
+from django.conf import settings
+from django.test import override_settings
+from django.urls import reverse
+
+import smartsheet
+from accounts.models import User
+from checklist.domain.models import Sheet
+from checklist.infrastructure.cache import (
+    column_map_cache,
+    row_cache,
+    sheet_changes,
+)
+from checklist.infrastructure.gateways import SHEET_COLUMNS
+
+
+class FakeSmartsheet:
+    """In-memory stand-in for the Smartsheet SDK client.
+
+    Models the parts of the API the gateway relies on: rows in display
+    order, parent/sibling location specifiers, children moving with
+    their parent, and a sheet version bumped on every write.
+    """
+
+    def __init__(self):
+        self.sheets: dict[int, dict] = {}
+        self.calls = Counter()
+        self._ids = count(1000)
+        self.Sheets = _Sheets(self)
+        self.Home = _Home(self)
+        self.Webhooks = _Webhooks(self)
+        self.webhooks: dict[int, dict] = {}
+        # Stands in for Smartsheet's webhook requests: called with the
+        # JSON body and headers, returns the receiver's response.
+        self.deliver = None
+
+    def errors_as_exceptions(self, value=True):
+        pass
+
+    def new_sheet(self, name: str = "Checklist") -> int:
+        sheet_id = next(self._ids)
+        self.sheets[sheet_id] = {
+            "name": name,
+            "version": 1,
+            "columns": [
+                {"id": next(self._ids), "title": col["title"]}
+                for col in SHEET_COLUMNS
+            ],
+            "rows": [],
+        }
+        return sheet_id
+
+    def column_id(self, sheet_id: int, title: str) -> int:
+        columns = self.sheets[sheet_id]["columns"]
+        return next(col["id"] for col in columns if col["title"] == title)
+
+    def add(self, sheet_id: int, name: str, parent_id: int | None = None):
+        """Add a row behind the app's back, as another client would."""
+        row = smartsheet.models.Row()
+        row.to_bottom = True
+        if parent_id:
+            row.parent_id = parent_id
+        row.cells = [
+            {"column_id": self.column_id(sheet_id, "Task Name"), "value": name}
+        ]
+        return self.Sheets.add_rows(sheet_id, [row]).result[0].id
+
+    def notify(self, sheet_id: int, events: int = 1) -> list:
+        """Post a signed callback for every enabled webhook on the sheet."""
+        responses = []
+        for webhook_id, webhook in self.webhooks.items():
+            if webhook["scopeObjectId"] != sheet_id or not webhook["enabled"]:
+                continue
+            body = json.dumps(
+                {
+                    "webhookId": webhook_id,
+                    "scope": "sheet",
+                    "scopeObjectId": sheet_id,
+                    "events": [{"objectType": "row", "eventType": "updated"}]
+                    * events,
+                }
+            ).encode()
+            signature = hmac.new(
+                webhook["sharedSecret"].encode(), body, hashlib.sha256
+            ).hexdigest()
+            responses.append(
+                self.deliver(body, {"Smartsheet-Hmac-SHA256": signature})
+            )
+        return responses
+
+    def rows(self, sheet_id: int) -> list[dict]:
+        return self.sheets[sheet_id]["rows"]
+
+    def bump(self, sheet_id: int) -> int:
+        self.sheets[sheet_id]["version"] += 1
+        return self.sheets[sheet_id]["version"]
+
+    def row_json(self, sheet_id: int, index: int) -> dict:
+        rows = self.rows(sheet_id)
+        row = rows[index]
+        sibling = next(
+            (
+                rows[other]
+                for other in range(index - 1, -1, -1)
+                if rows[other]["parent_id"] == row["parent_id"]
+            ),
+            None,
+        )
+        return _row_json(row, index, sibling)
+
+
+def _row_json(row: dict, index: int, sibling: dict | None) -> dict:
+    data = {
+        "id": row["id"],
+        "rowNumber": index + 1,
+        "cells": [
+            {"columnId": column_id, "value": value}
+            for column_id, value in row["cells"].items()
+        ],
+    }
+    if row["parent_id"]:
+        data["parentId"] = row["parent_id"]
+    if sibling:
+        data["siblingId"] = sibling["id"]
+    return data
+
+
+def _index(rows, row_id):
+    return next(i for i, row in enumerate(rows) if row["id"] == row_id)
+
+
+def _subtree_end(rows, index):
+    ids = {rows[index]["id"]}
+    end = index + 1
+    while end < len(rows) and rows[end]["parent_id"] in ids:
+        ids.add(rows[end]["id"])
+        end += 1
+    return end
+
+
+def _api_error(code, message, status_code=400):
+    error = smartsheet.models.Error(
+        {
+            "result": {
+                "code": code,
+                "message": message,
+                "statusCode": status_code,
+            }
+        }
+    )
+    return smartsheet.exceptions.ApiError(error, error.result.message)
+
+
+def _invalid_column(column_id):
+    return _api_error(1036, f"The columnId {column_id} is invalid.")
+
+
+class _Sheets:
+    def __init__(self, fake: FakeSmartsheet):
+        self.fake = fake
+
+    def get_sheet(
+        self,
+        sheet_id,
+        row_ids=None,
+        column_ids=None,
+        page_size=None,
+        page=None,
+        **kwargs,
+    ):
+        self.fake.calls["get_sheet"] += 1
+        sheet = self.fake.sheets[sheet_id]
+        rows = []
+        # Last row seen under each parent, so siblings take one pass.
+        last_child: dict[int | None, dict] = {}
+        for index, row in enumerate(sheet["rows"]):
+            if row_ids is None or row["id"] in row_ids:
+                rows.append(
+                    _row_json(row, index, last_child.get(row["parent_id"]))
+                )
+            last_child[row["parent_id"]] = row
+        total = len(rows)
+        if page_size:
+            start = (page - 1) * page_size
+            rows = rows[start : start + page_size]
+
+        columns = sheet["columns"]
+        if column_ids is not None:
+            known = {col["id"] for col in columns}
+            if not set(column_ids) <= known:
+                raise _invalid_column(min(set(column_ids) - known))
+            columns = [col for col in columns if col["id"] in column_ids]
+            for row in rows:
+                row["cells"] = [
+                    cell
+                    for cell in row["cells"]
+                    if cell["columnId"] in column_ids
+                ]
+
+        return smartsheet.models.Sheet(
+            {
+                "id": sheet_id,
+                "name": sheet["name"],
+                "version": sheet["version"],
+                "totalRowCount": total,
+                "columns": columns,
+                "rows": rows,
+            }
+        )
+
+    def get_sheet_version(self, sheet_id):
+        self.fake.calls["get_sheet_version"] += 1
+        return smartsheet.models.Version(
+            {"version": self.fake.sheets[sheet_id]["version"]}
+        )
+
+    def add_rows(self, sheet_id, list_of_rows):
+        self.fake.calls["add_rows"] += 1
+        placed = []
+        for row in list_of_rows:
+            new = {"id": next(self.fake._ids), "parent_id": None, "cells": {}}
+            self._apply_cells(sheet_id, new, row)
+            self._locate(sheet_id, [new], row)
+            placed.append(new["id"])
+        return self._result(sheet_id, placed)
+
+    def update_rows(self, sheet_id, list_of_rows):
+        self.fake.calls["update_rows"] += 1
+        rows = self.fake.rows(sheet_id)
+        missing = {row.id for row in list_of_rows} - {
+            row["id"] for row in rows
+        }
+        if missing:
+            raise _api_error(1006, "Not Found", status_code=404)
+        for row in list_of_rows:
+            index = _index(rows, row.id)
+            self._apply_cells(sheet_id, rows[index], row)
+            if self._has_location(row):
+                end = _subtree_end(rows, index)
+                block = rows[index:end]
+                del rows[index:end]
+                self._locate(sheet_id, block, row)
+        return self._result(sheet_id, [row.id for row in list_of_rows])
+
+    def delete_rows(self, sheet_id, ids, ignore_rows_not_found=False):
+        self.fake.calls["delete_rows"] += 1
+        rows = self.fake.rows(sheet_id)
+        missing = set(ids) - {row["id"] for row in rows}
+        if missing and not ignore_rows_not_found:
+            raise _api_error(1006, "Not Found", status_code=404)
+        for row_id in ids:
+            if not any(row["id"] == row_id for row in rows):
+                # Missing from the start, or gone with its parent.
+                continue
+            index = _index(rows, row_id)
+            del rows[index : _subtree_end(rows, index)]
+        return smartsheet.models.Result(
+            {"result": list(ids), "version": self.fake.bump(sheet_id)}
+        )
+
+    def _apply_cells(self, sheet_id, target, row):
+        columns = {col["id"] for col in self.fake.sheets[sheet_id]["columns"]}
+        for cell in row.cells or []:
+            if cell.column_id not in columns:
+                raise _invalid_column(cell.column_id)
+            target["cells"][cell.column_id] = cell.value
+
+    @staticmethod
+    def _has_location(row):
+        return bool(
+            row.parent_id or row.sibling_id or row.to_top or row.to_bottom
+        )
+
+    def _locate(self, sheet_id, block, row):
+        rows = self.fake.rows(sheet_id)
+        head = block[0]
+        if row.sibling_id:
+            sibling = _index(rows, row.sibling_id)
+            head["parent_id"] = rows[sibling]["parent_id"]
+            position = sibling if row.above else _subtree_end(rows, sibling)
+        elif row.parent_id:
+            parent = _index(rows, row.parent_id)
+            head["parent_id"] = row.parent_id
+            position = (
+                _subtree_end(rows, parent) if row.to_bottom else parent + 1
+            )
+        else:
+            head["parent_id"] = None
+            position = 0 if row.to_top else len(rows)
+        rows[position:position] = block
+
+    def _result(self, sheet_id, row_ids):
+        version = self.fake.bump(sheet_id)
+        rows = self.fake.rows(sheet_id)
+        return smartsheet.models.Result(
+            {
+                "result": [
+                    self.fake.row_json(sheet_id, _index(rows, row_id))
+                    for row_id in row_ids
+                ],
+                "version": version,
+            },
+            dynamic_result_type="Row",
+        )
+
+
+class _Home:
+    def __init__(self, fake: FakeSmartsheet):
+        self.fake = fake
+
+    def create_sheet(self, sheet):
+        self.fake.calls["create_sheet"] += 1
+        sheet_id = self.fake.new_sheet(sheet.name)
+        return smartsheet.models.Result(
+            {"result": {"id": sheet_id, "name": sheet.name}},
+            dynamic_result_type="Sheet",
+        )
+
+
+class _Webhooks:
+    def __init__(self, fake: FakeSmartsheet):
+        self.fake = fake
+
+    def create_webhook(self, webhook):
+        self.fake.calls["create_webhook"] += 1
+        webhook_id = next(self.fake._ids)
+        self.fake.webhooks[webhook_id] = {
+            "id": webhook_id,
+            "scopeObjectId": webhook.scope_object_id,
+            "callbackUrl": webhook.callback_url,
+            "sharedSecret": secrets.token_hex(16),
+            "enabled": False,
+        }
+        return smartsheet.models.Result(
+            {"result": self.fake.webhooks[webhook_id]},
+            dynamic_result_type="Webhook",
+        )
+
+    def update_webhook(self, webhook_id, webhook):
+        self.fake.calls["update_webhook"] += 1
+        data = self.fake.webhooks[webhook_id]
+        if webhook.enabled and not data["enabled"]:
+            # Smartsheet only enables a webhook whose callback URL
+            # echoes the verification challenge.
+            challenge = secrets.token_hex(8)
+            response = self.fake.deliver(
+                json.dumps(
+                    {"webhookId": webhook_id, "challenge": challenge}
+                ).encode(),
+                {},
+            )
+            data["enabled"] = (
+                response.headers.get("Smartsheet-Hook-Response") == challenge
+            )
+        return smartsheet.models.Result(
+            {"result": data}, dynamic_result_type="Webhook"
+        )
+
+    def delete_webhook(self, webhook_id):
+        self.fake.calls["delete_webhook"] += 1
+        del self.fake.webhooks[webhook_id]
+        return smartsheet.models.Result({"result": None})
+
+
+def share_sheet_changes(test) -> None:
+    """Keep change stamps in a cache all workers would share.
+
+    Stamps in the per-process test cache are ignored, so ``test`` gets
+    a file cache for them until it ends.
+    """
+    directory = tempfile.TemporaryDirectory()
+    test.addCleanup(directory.cleanup)
+    test.enterContext(
+        override_settings(
+            CACHES={
+                **settings.CACHES,
+                "shared": {
+                    "BACKEND": "django.core.cache.backends.filebased."
+                    "FileBasedCache",
+                    "LOCATION": directory.name,
+                },
+            }
+        )
+    )
+    test.enterContext(mock.patch.object(sheet_changes, "alias", "shared"))
+
+
+class FakeSmartsheetMixin:
+    """Test setup: the gateway talks to ``self.fake``, with an empty sheet.
+
+    Clears the row caches, points the gateway at ``self.fake`` (or at
+    whatever ``smartsheet_client`` returns) and creates fake sheet
+    ``self.smartsheet_id``. Tests add their rows after calling
+    ``super().setUp()``.
+    """
+
+    def setUp(self):
+        super().setUp()
+        row_cache.clear()
+        column_map_cache.clear()
+        self.fake = FakeSmartsheet()
+        self.enterContext(
+            mock.patch(
+                "checklist.infrastructure.gateways.get_smartsheet_client",
+                return_value=self.smartsheet_client(),
+            )
+        )
+        self.smartsheet_id = self.fake.new_sheet()
+
+    def smartsheet_client(self):
+        return self.fake
+
+
+class FakeSheetMixin(FakeSmartsheetMixin):
+    """API test setup: a signed-in owner of a sheet on the fake.
+
+    Adds ``self.user``, signed in, and their ``self.sheet`` backed by
+    fake sheet ``self.smartsheet_id``.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(
+            email="owner@example.com",
+            name="Owner",
+            password="pass",
+            smartsheet_token="token",
+        )
+        self.client.force_authenticate(user=self.user)
+        self.sheet = Sheet.objects.create(
+            user=self.user, smartsheet_id=self.smartsheet_id, name="Checklist"
+        )
+
+    def url(self, name, **kwargs):
+        return reverse(
+            f"checklist:{name}",
+            kwargs={"sheet_uuid": self.sheet.uuid, **kwargs},
+        )
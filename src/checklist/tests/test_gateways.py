@@ -0,0 +1,452 @@
+import threading
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+import requests
+import smartsheet
+from checklist.application.use_cases import (
+    GetChecklist,
+    IndentItem,
+    MoveItemDown,
+    OutdentItem,
+    UpdateItem,
+    UpdateItemInput,
+)
+from checklist.domain.types import ColumnMap
+from checklist.infrastructure.cache import (
+    RowCache,
+    column_map_cache,
+    row_cache,
+    sheet_changes,
+)
+from checklist.infrastructure.gateways import (
+    ClientPool,
+    SmartsheetGateway,
+    client_pool,
+    get_smartsheet_client,
+    get_smartsheet_session,
+    use_session,
+)
+from checklist.infrastructure.ratelimit import RATE_LIMIT_ERROR, TokenBucket
+from checklist.tests.fake_server import FakeSmartsheetServer
+from checklist.tests.fakes import FakeSmartsheetMixin, share_sheet_changes
+
+
+def flatten(tree, depth=0):
+    rows = []
+    for item in tree:
+        rows.append((item.id, item.name, item.status, depth))
+        rows.extend(flatten(item.children, depth + 1))
+    return rows
+
+
+class RowCacheTests(FakeSmartsheetMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.a = self.fake.add(self.smartsheet_id, "A")
+        self.a1 = self.fake.add(self.smartsheet_id, "A1", parent_id=self.a)
+        self.b = self.fake.add(self.smartsheet_id, "B")
+        self.c = self.fake.add(self.smartsheet_id, "C")
+        self.fake.calls.clear()
+
+    def gateway(self):
+        return SmartsheetGateway(token="token", sheet_id=self.smartsheet_id)
+
+    def fresh_tree(self):
+        row_cache.clear()
+        return flatten(GetChecklist(self.gateway()).execute())
+
+    def test_update_after_read_skips_refetch(self):
+        GetChecklist(self.gateway()).execute()
+        self.fake.calls.clear()
+
+        tree = UpdateItem(self.gateway()).execute(
+            self.b, UpdateItemInput(status="Complete")
+        )
+
+        self.assertEqual(self.fake.calls["update_rows"], 1)
+        self.assertEqual(self.fake.calls["get_sheet"], 0)
+        self.assertEqual(flatten(tree), self.fresh_tree())
+
+    def test_structural_moves_match_fresh_fetch(self):
+        GetChecklist(self.gateway()).execute()
+
+        for use_case, row_id in [
+            (IndentItem, self.b),
+            (MoveItemDown, self.b),
+            (OutdentItem, self.b),
+            (IndentItem, self.c),
+        ]:
+            self.fake.calls.clear()
+            tree = use_case(self.gateway()).execute(row_id)
+            self.assertEqual(self.fake.calls["get_sheet"], 0)
+            self.assertEqual(self.fake.calls["get_sheet_version"], 1)
+            self.assertEqual(flatten(tree), self.fresh_tree())
+
+    def test_unchanged_sheet_served_after_version_check(self):
+        GetChecklist(self.gateway()).execute()
+        self.fake.calls.clear()
+
+        tree = GetChecklist(self.gateway()).execute()
+
+        self.assertEqual(self.fake.calls["get_sheet_version"], 1)
+        self.assertEqual(self.fake.calls["get_sheet"], 0)
+        self.assertEqual(flatten(tree), self.fresh_tree())
+
+    def test_changed_sheet_is_downloaded_again(self):
+        GetChecklist(self.gateway()).execute()
+        self.fake.add(self.smartsheet_id, "D")
+        self.fake.calls.clear()
+
+        tree = GetChecklist(self.gateway()).execute()
+
+        self.assertEqual(self.fake.calls["get_sheet"], 1)
+        self.assertEqual(flatten(tree)[-1][1], "D")
+
+    def test_paged_read_matches_single_read(self):
+        expected = self.gateway().get_rows()
+        row_cache.clear()
+        self.fake.calls.clear()
+
+        gateway = self.gateway()
+        gateway.page_size = 3
+        rows = gateway.get_rows()
+
+        self.assertEqual(rows, expected)
+        self.assertEqual(self.fake.calls["get_sheet"], 2)
+
+    def test_read_limited_to_mapped_columns(self):
+        self.gateway().get_rows()
+        row_cache.clear()
+
+        with mock.patch.object(
+            self.fake.Sheets, "get_sheet", wraps=self.fake.Sheets.get_sheet
+        ) as get_sheet:
+            self.gateway().get_rows()
+
+        column_ids = get_sheet.call_args.kwargs["column_ids"]
+        self.assertEqual(len(column_ids), 4)
+        self.assertEqual(
+            get_sheet.call_args.kwargs["exclude"], "nonexistentCells"
+        )
+
+    def change_after_first_page(self):
+        """Add row D to the sheet right after the first page is read."""
+        fetch = self.fake.Sheets.get_sheet
+
+        def get_sheet(sheet_id, **kwargs):
+            sheet = fetch(sheet_id, **kwargs)
+            if self.fake.calls["get_sheet"] == 1:
+                self.fake.add(self.smartsheet_id, "D")
+            return sheet
+
+        return mock.patch.object(self.fake.Sheets, "get_sheet", get_sheet)
+
+    def test_sheet_changing_between_pages_restarts_read(self):
+        gateway = self.gateway()
+        gateway.page_size = 2
+
+        with self.change_after_first_page():
+            rows = gateway.get_rows()
+
+        self.assertEqual([row.name for row in rows][-1], "D")
+        self.assertEqual(self.fake.calls["get_sheet"], 5)
+
+    def test_checklist_survives_sheet_changing_between_pages(self):
+        gateway = self.gateway()
+        gateway.page_size = 2
+
+        with self.change_after_first_page():
+            tree = GetChecklist(gateway).execute()
+
+        self.assertEqual(
+            [name for _, name, _, _ in flatten(tree)],
+            ["A", "A1", "B", "C", "D"],
+        )
+
+    def test_streamed_rows_survive_sheet_changing_between_pages(self):
+        gateway = self.gateway()
+        gateway.page_size = 2
+
+        with self.change_after_first_page():
+            rows = list(GetChecklist(gateway).rows())
+
+        self.assertEqual(
+            [row.name for row in rows], ["A", "A1", "B", "C", "D"]
+        )
+
+    def test_concurrent_reads_share_one_download(self):
+        fetch = self.fake.Sheets.get_sheet
+
+        def slow_get_sheet(sheet_id, **kwargs):
+            time.sleep(0.2)
+            return fetch(sheet_id, **kwargs)
+
+        results = []
+        with mock.patch.object(self.fake.Sheets, "get_sheet", slow_get_sheet):
+            threads = [
+                threading.Thread(
+                    target=lambda: results.append(self.gateway().get_rows())
+                )
+                for _ in range(5)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(self.fake.calls["get_sheet"], 1)
+        self.assertEqual(len(results), 5)
+        self.assertTrue(all(rows == results[0] for rows in results))
+        self.assertEqual(len({id(rows[0]) for rows in results}), len(results))
+
+    @override_settings(SMARTSHEET_EDIT_COALESCE_WINDOW=0.2)
+    def test_rapid_edits_share_one_update(self):
+        self.gateway().get_rows()
+        self.fake.calls.clear()
+        edits = [
+            (self.b, {"notes": "typing"}),
+            (self.b, {"notes": "typing more"}),
+            (self.b, {"status": "Complete"}),
+            (self.c, {"name": "C2"}),
+        ]
+        results = []
+
+        def edit(row_id, fields):
+            gateway = self.gateway()
+            results.append(
+                UpdateItem(gateway).execute(row_id, UpdateItemInput(**fields))
+            )
+
+        threads = []
+        for row_id, fields in edits:
+            threads.append(
+                threading.Thread(target=edit, args=(row_id, fields))
+            )
+            threads[-1].start()
+            time.sleep(0.01)
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.fake.calls["update_rows"], 1)
+        self.assertEqual(self.fake.calls["get_sheet"], 0)
+        self.assertEqual(len(results), 4)
+        b = next(item for item in results[0] if item.id == self.b)
+        self.assertEqual((b.notes, b.status), ("typing more", "Complete"))
+        self.assertEqual(flatten(results[0]), self.fresh_tree())
+
+    def test_delete_drops_children(self):
+        gateway = self.gateway()
+        gateway.get_rows()
+        gateway.delete_row(self.a)
+
+        rows = gateway.get_rows()
+
+        self.assertEqual([item.id for item in rows], [self.b, self.c])
+        self.assertEqual(self.fake.calls["get_sheet"], 1)
+
+    @override_settings(
+        SMARTSHEET_WEBHOOK_URL="https://app.example.com/api/webhooks/"
+    )
+    def test_write_elsewhere_is_seen_despite_change_stamp(self):
+        share_sheet_changes(self)
+        sheet_changes.bump(self.smartsheet_id)
+        self.gateway().get_rows()
+
+        # A worker with its own row cache edits the sheet.
+        with mock.patch(
+            "checklist.infrastructure.gateways.row_cache", RowCache()
+        ):
+            self.gateway().update_row(self.b, name="B2")
+        self.fake.calls.clear()
+
+        names = [item.name for item in self.gateway().get_rows()]
+
+        self.assertIn("B2", names)
+        self.assertEqual(self.fake.calls["get_sheet_version"], 1)
+
+    def test_external_change_invalidates_cache(self):
+        gateway = self.gateway()
+        gateway.get_rows()
+        self.fake.add(self.smartsheet_id, "D")
+        self.fake.calls.clear()
+
+        gateway.update_row(self.b, name="B2")
+        rows = gateway.get_rows()
+
+        self.assertEqual(self.fake.calls["get_sheet"], 1)
+        self.assertEqual(rows[-1].name, "D")
+        self.assertEqual(rows[2].name, "B2")
+
+
+class SmartsheetClientTests(SimpleTestCase):
+    def setUp(self):
+        client_pool.clear()
+        get_smartsheet_session.cache_clear()
+        self.addCleanup(client_pool.clear)
+        self.addCleanup(get_smartsheet_session.cache_clear)
+
+    def test_clients_share_one_bounded_pool(self):
+        first = get_smartsheet_client("first-token")
+        second = get_smartsheet_client("second-token")
+
+        self.assertIsNot(first, second)
+        self.assertIs(first._session, second._session)
+        poolmanager = first._session.get_adapter("https://").poolmanager
+        self.assertTrue(poolmanager.connection_pool_kw["block"])
+
+    def test_requests_go_through_the_given_session(self):
+        server = FakeSmartsheetServer()
+        self.enterContext(server)
+        sheet_id = server.fake.new_sheet()
+        client = smartsheet.Smartsheet("token", api_base=server.api_base)
+        client.errors_as_exceptions(True)
+        session = requests.Session()
+
+        use_session(client, session)
+        with mock.patch.object(session, "send", wraps=session.send) as send:
+            client.Sheets.get_sheet(sheet_id)
+
+        send.assert_called_once()
+
+    def test_pool_reuses_clients_within_bounds(self):
+        pool = ClientPool(max_size=2, ttl=60)
+
+        first = pool.get("first-token")
+        self.assertEqual(first._access_token, "first-token")
+        self.assertIs(pool.get("first-token"), first)
+        pool.get("second-token")
+        pool.get("third-token")
+
+        self.assertIsNot(pool.get("first-token"), first)
+        self.assertEqual(pool.stats.hits, 1)
+        self.assertEqual(pool.stats.misses, 4)
+        self.assertEqual(pool.stats.evictions, 2)
+        self.assertNotIn("first-token", "".join(pool._clients))
+
+    def test_idle_clients_expire(self):
+        pool = ClientPool(max_size=2, ttl=60)
+        first = pool.get("token")
+
+        with mock.patch(
+            "checklist.infrastructure.gateways.time.monotonic",
+            return_value=time.monotonic() + 61,
+        ):
+            self.assertIsNot(pool.get("token"), first)
+        self.assertEqual(pool.stats.evictions, 1)
+
+
+class ColumnMapCacheTests(FakeSmartsheetMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.a = self.fake.add(self.smartsheet_id, "A")
+        self.fake.calls.clear()
+
+    def gateway(self):
+        return SmartsheetGateway(token="token", sheet_id=self.smartsheet_id)
+
+    def test_column_map_shared_between_gateways(self):
+        self.gateway().get_rows()
+        row_cache.clear()
+        self.fake.calls.clear()
+
+        self.gateway().update_row(self.a, name="A2")
+        self.gateway().add_row("B", "Not Started", "", "")
+
+        self.assertEqual(self.fake.calls["get_sheet"], 0)
+
+    def test_stale_column_map_is_refreshed(self):
+        column_map_cache.store(self.smartsheet_id, ColumnMap(1, 2, 3, 4))
+
+        item = self.gateway().update_row(self.a, status="Complete")
+
+        self.assertEqual(item.status, "Complete")
+        self.assertEqual(self.fake.calls["update_rows"], 2)
+        self.assertEqual(self.fake.calls["get_sheet"], 1)
+        self.assertNotEqual(
+            column_map_cache.get(self.smartsheet_id), ColumnMap(1, 2, 3, 4)
+        )
+
+    def test_exhausted_budget_is_not_taken_for_stale_columns(self):
+        self.gateway().get_rows()
+        row_cache.clear()
+        budget = TokenBucket(rate=1, capacity=1, max_wait=0)
+        budget.acquire("empty-budget")
+
+        def send(*args, **kwargs):
+            budget.acquire("empty-budget")
+
+        with (
+            mock.patch.object(self.fake.Sheets, "add_rows", send),
+            mock.patch.object(self.fake.Sheets, "get_sheet", send),
+        ):
+            for call in [
+                lambda: self.gateway().add_row("B", "Not Started", "", ""),
+                lambda: self.gateway().get_rows(),
+            ]:
+                with self.assertRaises(
+                    smartsheet.exceptions.RateLimitExceededError
+                ) as raised:
+                    call()
+                self.assertEqual(
+                    raised.exception.error.result.code, RATE_LIMIT_ERROR
+                )
+
+
+class GatewayOverHttpTests(SimpleTestCase):
+    """Upstream calls per use case, through the SDK and a real socket."""
+
+    def setUp(self):
+        row_cache.clear()
+        column_map_cache.clear()
+        self.server = FakeSmartsheetServer()
+        self.enterContext(self.server)
+        self.fake = self.server.fake
+        self.sheet_id = self.fake.new_sheet()
+        self.a = self.fake.add(self.sheet_id, "A")
+        self.a1 = self.fake.add(self.sheet_id, "A1", parent_id=self.a)
+        self.b = self.fake.add(self.sheet_id, "B")
+        self.client = self.server.client()
+
+    def gateway(self):
+        gateway = SmartsheetGateway(token="token", sheet_id=self.sheet_id)
+        gateway.client = self.client
+        return gateway
+
+    def test_upstream_calls_per_operation(self):
+        tree = GetChecklist(self.gateway()).execute()
+        self.assertEqual(self.server.calls, {"get_sheet": 1})
+        self.assertEqual(
+            flatten(tree),
+            [
+                (self.a, "A", "", 0),
+                (self.a1, "A1", "", 1),
+                (self.b, "B", "", 0),
+            ],
+        )
+
+        self.server.reset()
+        GetChecklist(self.gateway()).execute()
+        self.assertEqual(self.server.calls, {"get_sheet_version": 1})
+
+        self.server.reset()
+        UpdateItem(self.gateway()).execute(
+            self.b, UpdateItemInput(status="Complete")
+        )
+        self.assertEqual(self.server.calls, {"update_rows": 1})
+
+        self.server.reset()
+        tree = IndentItem(self.gateway()).execute(self.b)
+        self.assertEqual(
+            self.server.calls, {"get_sheet_version": 1, "update_rows": 1}
+        )
+        self.assertEqual(flatten(tree)[1], (self.b, "B", "Complete", 1))
+        self.assertGreater(self.server.bytes_out["update_rows"], 0)
+
+    def test_api_errors_reach_the_gateway(self):
+        with self.assertRaises(smartsheet.exceptions.ApiError) as caught:
+            self.gateway().update_rows({12345: {"name": "X"}})
+
+        self.assertEqual(caught.exception.error.result.code, 1006)
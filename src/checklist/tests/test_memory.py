@@ -0,0 +1,181 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from accounts.models import User
+from checklist.application.use_cases import (
+    AddItem,
+    CreateItemInput,
+    DeleteItem,
+    GetChecklist,
+    IndentItem,
+    MoveItemDown,
+    MoveItemUp,
+    OutdentItem,
+    UpdateItem,
+    UpdateItemInput,
+)
+from checklist.infrastructure.cache import column_map_cache, row_cache
+from checklist.infrastructure.gateways import SmartsheetGateway
+from checklist.infrastructure.memory import (
+    InMemorySheetProvider,
+    MemorySheets,
+    memory_sheets,
+)
+from checklist.tests.fakes import FakeSmartsheet
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+
+def outline(tree, depth=0):
+    rows = []
+    for item in tree:
+        rows.append((item.name, item.status, depth))
+        rows.extend(outline(item.children, depth + 1))
+    return rows
+
+
+class InMemorySheetProviderTests(SimpleTestCase):
+    def setUp(self):
+        self.store = MemorySheets()
+        self.sheet_id = self.store.create_sheet("Checklist")
+
+    def provider(self):
+        return InMemorySheetProvider(self.sheet_id, store=self.store)
+
+    def test_matches_smartsheet_placement(self):
+        row_cache.clear()
+        column_map_cache.clear()
+        fake = FakeSmartsheet()
+        fake_sheet = fake.new_sheet()
+
+        def run(provider):
+            ids = {}
+            for name, parent in [
+                ("A", None),
+                ("A1", "A"),
+                ("A2", "A"),
+                ("B", None),
+                ("B1", "B"),
+                ("C", None),
+            ]:
+                AddItem(provider()).execute(
+                    CreateItemInput(name=name, parent_id=ids.get(parent))
+                )
+                ids[name] = next(
+                    item.id
+                    for item in provider().get_rows()
+                    if item.name == name
+                )
+            UpdateItem(provider()).execute(
+                ids["A2"], UpdateItemInput(status="Complete")
+            )
+            IndentItem(provider()).execute(ids["C"])
+            MoveItemUp(provider()).execute(ids["A2"])
+            MoveItemDown(provider()).execute(ids["A"])
+            OutdentItem(provider()).execute(ids["B1"])
+            DeleteItem(provider()).execute(ids["A1"])
+            return outline(GetChecklist(provider()).execute())
+
+        with mock.patch(
+            "checklist.infrastructure.gateways.get_smartsheet_client",
+            return_value=fake,
+        ):
+            expected = run(
+                lambda: SmartsheetGateway(token="token", sheet_id=fake_sheet)
+            )
+
+        self.assertEqual(run(self.provider), expected)
+        self.assertEqual(
+            expected,
+            [
+                ("B1", "Not Started", 0),
+                ("B", "Not Started", 0),
+                ("C", "Not Started", 1),
+                ("A", "Not Started", 0),
+                ("A2", "Complete", 1),
+            ],
+        )
+
+    def test_every_write_bumps_version_and_keeps_history(self):
+        provider = self.provider()
+        a = provider.add_row("A", "", "", "")
+        before = provider.version
+        provider.update_row(a.id, name="A2")
+
+        self.assertEqual(provider.version, before + 1)
+        self.assertEqual(provider.get_cached_rows(before)[0].name, "A")
+        self.assertEqual(provider.get_rows()[0].name, "A2")
+
+    def test_cannot_move_row_under_itself(self):
+        provider = self.provider()
+        a = provider.add_row("A", "", "", "")
+        a1 = provider.add_row("A1", "", "", "", parent_id=a.id)
+
+        with self.assertRaises(ValueError):
+            provider.move_row(a.id, parent_id=a1.id)
+        with self.assertRaises(ValueError):
+            provider.update_row(12345, name="X")
+        self.assertEqual(provider.get_rows()[1].parent_id, a.id)
+
+    def test_sqlite_file_survives_restart(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "sheets.sqlite3")
+
+        store = MemorySheets(path)
+        sheet_id = store.create_sheet("Offline")
+        provider = InMemorySheetProvider(sheet_id, store=store)
+        a = provider.add_row("A", "Complete", "me@example.com", "note")
+        provider.add_row("A1", "", "", "", parent_id=a.id)
+
+        reopened = MemorySheets(path)
+        version, items = reopened.rows(sheet_id)
+
+        self.assertEqual(version, provider.version)
+        self.assertEqual(
+            [(item.name, item.parent_id) for item in items],
+            [("A", None), ("A1", a.id)],
+        )
+        self.assertEqual(items[0].assignee, "me@example.com")
+        self.assertGreater(reopened.new_id(), items[1].id)
+
+
+@override_settings(DB_ENCRYPTION_KEY="k" * 32, SMARTSHEET_PROVIDER="memory")
+class OfflineModeTests(APITestCase):
+    def setUp(self):
+        memory_sheets.clear()
+        self.addCleanup(memory_sheets.clear)
+        self.user = User.objects.create_user(
+            email="demo@example.com", name="Demo", password="pass"
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_checklist_works_without_smartsheet(self):
+        with mock.patch(
+            "checklist.infrastructure.gateways.get_smartsheet_client"
+        ) as client:
+            response = self.client.post(
+                reverse("checklist:sheet-list"), {"name": "Demo"}
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            sheet_uuid = response.data["id"]
+
+            self.client.post(
+                reverse(
+                    "checklist:item-create", kwargs={"sheet_uuid": sheet_uuid}
+                ),
+                {"name": "Offline task", "status": "In Progress"},
+            )
+            response = self.client.get(
+                reverse(
+                    "checklist:item-list", kwargs={"sheet_uuid": sheet_uuid}
+                )
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]["name"], "Offline task")
+        client.assert_not_called()
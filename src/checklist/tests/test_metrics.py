@@ -0,0 +1,132 @@
+from datetime import timedelta
+
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+import requests
+from checklist.infrastructure.metrics import (
+    operation_name,
+    record_response,
+    upstream_metrics,
+)
+from checklist.tests.fake_server import FakeSmartsheetServer
+from checklist.tests.fakes import FakeSheetMixin
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+
+def response(method, url, status_code, content=b"{}"):
+    result = requests.Response()
+    result.request = requests.Request(method, url).prepare()
+    result.status_code = status_code
+    result._content = content
+    result.elapsed = timedelta(milliseconds=20)
+    return result
+
+
+class RecordResponseTests(SimpleTestCase):
+    def setUp(self):
+        upstream_metrics.clear()
+
+    def test_operation_names_hide_ids(self):
+        request = requests.Request(
+            "GET", "https://api.smartsheet.com/2.0/sheets/123/rows/45"
+        ).prepare()
+
+        self.assertEqual(operation_name(request), "GET /sheets/{id}/rows/{id}")
+
+    def test_repeat_after_retryable_error_counts_as_retry(self):
+        url = "https://api.smartsheet.com/2.0/sheets/1"
+        record_response(response("GET", url, 503))
+        record_response(response("GET", url, 200, b'{"id": 1}'))
+        record_response(response("GET", url, 200))
+
+        metrics = upstream_metrics.render()
+
+        self.assertIn(
+            'smartsheet_retries_total{operation="GET /sheets/{id}"} 1',
+            metrics,
+        )
+        self.assertIn(
+            'smartsheet_requests_total{operation="GET /sheets/{id}",'
+            'status="503"} 1',
+            metrics,
+        )
+        self.assertIn(
+            'smartsheet_request_bytes_total{operation="GET /sheets/{id}",'
+            'direction="received"} 13',
+            metrics,
+        )
+
+
+@override_settings(
+    DB_ENCRYPTION_KEY="k" * 32,
+    SMARTSHEET_SERVER_TIMING=True,
+    SMARTSHEET_METRICS=True,
+)
+class UpstreamBudgetTests(FakeSheetMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        upstream_metrics.clear()
+        self.fake.add(self.smartsheet_id, "A")
+
+    def smartsheet_client(self):
+        # Real SDK client against the fake, so its HTTP calls are counted.
+        server = FakeSmartsheetServer(self.fake)
+        self.enterContext(server)
+        return server.client()
+
+    def test_response_reports_upstream_calls(self):
+        with self.assertLogs(
+            "checklist.infrastructure.metrics", "INFO"
+        ) as logs:
+            response = self.client.get(self.url("item-list"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        timing = response.headers["Server-Timing"]
+        self.assertIn("smartsheet;dur=", timing)
+        self.assertIn('desc="1 calls, 0 retries"', timing)
+        self.assertIn("gateway.get_rows;dur=", timing)
+        record = logs.records[-1]
+        self.assertEqual(record.smartsheet_calls, 1)
+        self.assertEqual(record.smartsheet_operations, {"GET /sheets/{id}": 1})
+        self.assertGreater(record.smartsheet_bytes_received, 0)
+
+    def test_metrics_endpoint(self):
+        self.client.get(self.url("item-list"))
+        self.client.get(self.url("item-list"))
+
+        response = self.client.get(reverse("checklist:metrics"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        body = response.content.decode()
+        self.assertIn(
+            'smartsheet_requests_total{operation="GET /sheets/{id}",'
+            'status="200"} 1',
+            body,
+        )
+        self.assertIn(
+            'smartsheet_requests_total{operation="GET /sheets/{id}/version",'
+            'status="200"} 1',
+            body,
+        )
+        self.assertIn(
+            'smartsheet_gateway_calls_total{method="get_rows"} 2', body
+        )
+        self.assertIn("smartsheet_client_pool_hits", body)
+
+    @override_settings(SMARTSHEET_METRICS=False)
+    def test_metrics_endpoint_can_be_disabled(self):
+        response = self.client.get(reverse("checklist:metrics"))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(SMARTSHEET_METRICS_TOKEN="scrape")
+    def test_metrics_endpoint_can_require_a_token(self):
+        url = reverse("checklist:metrics")
+
+        self.assertEqual(
+            self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED
+        )
+        response = self.client.get(url, HTTP_AUTHORIZATION="Bearer scrape")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -0,0 +1,73 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import override_settings
+
+import smartsheet
+from checklist.domain.models import Sheet
+from checklist.infrastructure import mirror
+from checklist.infrastructure.cache import row_cache
+from checklist.tests.fakes import FakeSheetMixin
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+
+@override_settings(DB_ENCRYPTION_KEY="k" * 32, SMARTSHEET_MIRROR_MAX_AGE=60)
+class SheetMirrorTests(FakeSheetMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.a = self.fake.add(self.smartsheet_id, "A")
+        self.a1 = self.fake.add(self.smartsheet_id, "A1", parent_id=self.a)
+        self.b = self.fake.add(self.smartsheet_id, "B")
+
+    def sync(self):
+        call_command("sync_sheets", "--once", stdout=StringIO())
+        row_cache.clear()
+        self.fake.calls.clear()
+
+    def test_serves_recent_mirror_without_upstream_calls(self):
+        self.sync()
+
+        response = self.client.get(self.url("item-list"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item["name"] for item in response.data], ["A", "B"])
+        self.assertEqual(response.data[0]["children"][0]["name"], "A1")
+        self.assertEqual(sum(self.fake.calls.values()), 0)
+
+    def test_write_expires_mirror(self):
+        self.sync()
+
+        self.client.put(self.url("item-detail", row_id=self.b), {"name": "B2"})
+        response = self.client.get(self.url("item-list"))
+
+        self.assertEqual(response.data[1]["name"], "B2")
+
+    @override_settings(SMARTSHEET_MIRROR_MAX_AGE=0)
+    def test_falls_back_to_mirror_during_maintenance(self):
+        self.sync()
+        mirror.expire(self.sheet)
+        error = smartsheet.models.Error(
+            {"result": {"code": 4001, "statusCode": 503}}
+        )
+        maintenance = smartsheet.exceptions.SystemMaintenanceError(
+            error, "Down for maintenance"
+        )
+
+        with mock.patch.object(
+            self.fake.Sheets, "get_sheet", side_effect=maintenance
+        ):
+            response = self.client.get(self.url("item-list"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item["name"] for item in response.data], ["A", "B"])
+
+    def test_sync_does_not_overwrite_newer_change(self):
+        sheet = Sheet.objects.get(pk=self.sheet.pk)
+        mirror.expire(sheet)
+
+        stored = mirror.store_rows(sheet, 1, [])
+
+        self.assertFalse(stored)
+        self.assertIsNone(Sheet.objects.get(pk=sheet.pk).mirror_version)
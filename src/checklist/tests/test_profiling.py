@@ -0,0 +1,80 @@
+import os
+import tempfile
+
+from django.test import SimpleTestCase, override_settings
+
+from accounts.models import User
+from checklist.tests.fakes import FakeSheetMixin
+from core.profiling import RequestTimings, _timings, span
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+
+class SpanTests(SimpleTestCase):
+    def test_spans_with_the_same_name_add_up(self):
+        timings = RequestTimings()
+        token = _timings.set(timings)
+        self.addCleanup(_timings.reset, token)
+
+        @span("work")
+        def work():
+            return 1
+
+        with span("block"):
+            work()
+            work()
+
+        self.assertEqual(list(timings.spans), ["work", "block"])
+        self.assertEqual(timings.spans["work"][1], 2)
+        self.assertIn("work;dur=", timings.server_timing(0.01))
+        self.assertIn('desc="2x"', timings.server_timing(0.01))
+
+    def test_span_outside_a_request_only_runs_the_code(self):
+        with span("block"):
+            pass
+
+        self.assertEqual(span("work")(lambda: 2)(), 2)
+
+
+@override_settings(DB_ENCRYPTION_KEY="k" * 32)
+class ProfilingMiddlewareTests(FakeSheetMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.fake.add(self.smartsheet_id, "A")
+        # Reloaded so the token is decrypted when the gateway reads it.
+        self.client.force_authenticate(user=User.objects.get(pk=self.user.pk))
+
+    @override_settings(PROFILING_ENABLED=True, PROFILING_SLOW_MS=10_000)
+    def test_server_timing_lists_request_phases(self):
+        response = self.client.get(self.url("item-list"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        timing = response.headers["Server-Timing"]
+        for name in ["auth", "sheet", "decrypt", "tree", "serialize"]:
+            self.assertIn(f"{name};dur=", timing)
+        self.assertIn(", total;dur=", timing)
+
+    def test_disabled_by_default(self):
+        response = self.client.get(self.url("item-list"))
+
+        self.assertNotIn("auth;dur=", response.headers["Server-Timing"])
+
+    def test_slow_request_is_logged_and_profiled(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+
+        with (
+            override_settings(
+                PROFILING_ENABLED=True,
+                PROFILING_SLOW_MS=0,
+                PROFILING_SAMPLE_RATE=1,
+                PROFILING_DIR=directory.name,
+            ),
+            self.assertLogs("core.profiling", "WARNING") as logs,
+        ):
+            self.client.get(self.url("item-list"))
+
+        self.assertIn("Slow request GET", logs.output[0])
+        self.assertIn("tree;dur=", logs.output[0])
+        (dump,) = os.listdir(directory.name)
+        self.assertRegex(dump, r"-GET-api-.*ms\.prof$")
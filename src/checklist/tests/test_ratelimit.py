@@ -0,0 +1,66 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+import requests
+import smartsheet
+from checklist.infrastructure.ratelimit import (
+    RateLimitedSession,
+    TokenBucket,
+)
+
+
+class StubAdapter(requests.adapters.BaseAdapter):
+    def __init__(self, statuses):
+        super().__init__()
+        self.statuses = list(statuses)
+
+    def send(self, request, **kwargs):
+        response = requests.Response()
+        response.status_code = self.statuses.pop(0)
+        response.headers["Retry-After"] = "4"
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+@mock.patch("checklist.infrastructure.ratelimit.time.sleep")
+class TokenBucketTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.bucket = TokenBucket(rate=10, capacity=2, max_wait=1)
+
+    def test_burst_then_paced(self, sleep):
+        waits = [self.bucket.acquire("token") for _ in range(4)]
+
+        self.assertEqual(waits[:2], [0, 0])
+        self.assertAlmostEqual(waits[2], 0.1, places=2)
+        self.assertAlmostEqual(waits[3], 0.2, places=2)
+        self.assertEqual(self.bucket.stats.queued_calls, 2)
+
+    def test_tokens_are_separate(self, sleep):
+        self.bucket.acquire("first")
+        self.bucket.acquire("first")
+
+        self.assertEqual(self.bucket.acquire("second"), 0)
+
+    def test_gives_up_past_max_wait(self, sleep):
+        for _ in range(12):
+            self.bucket.acquire("token")
+
+        with self.assertRaises(smartsheet.exceptions.RateLimitExceededError):
+            self.bucket.acquire("token")
+
+    def test_retry_after_holds_back_next_call(self, sleep):
+        self.bucket.max_wait = 10
+        session = RateLimitedSession(self.bucket)
+        session.mount("https://", StubAdapter([429, 200]))
+
+        session.get("https://api.smartsheet.com/2.0/sheets")
+        session.get("https://api.smartsheet.com/2.0/sheets")
+
+        self.assertGreaterEqual(sleep.call_args.args[0], 4)
+        self.assertEqual(self.bucket.stats.throttled, 1)
@@ -0,0 +1,80 @@
+import json
+
+from django.test import SimpleTestCase
+
+from checklist.domain.services import TreeBuilder
+from checklist.infrastructure.serializers import (
+    ChecklistItemSerializer,
+    ChecklistStreamSerializer,
+    ChecklistTreeSerializer,
+)
+from checklist.tests.test_services import item
+
+
+class ChecklistTreeSerializerTests(SimpleTestCase):
+    def test_matches_item_serializer(self):
+        items = [item(row_id) for row_id in range(1, 6)]
+        items[1].parent_id = 1
+        items[2].parent_id = 2
+        items[3].parent_id = 1
+        items[4].name = 42.0
+        tree = TreeBuilder.build(items)
+
+        self.assertEqual(
+            ChecklistTreeSerializer(tree).data,
+            ChecklistItemSerializer(tree, many=True).data,
+        )
+
+    def test_deep_tree_does_not_recurse(self):
+        items = [item(1)]
+        items.extend(
+            item(row_id, parent_id=row_id - 1) for row_id in range(2, 5000)
+        )
+        data = ChecklistTreeSerializer(TreeBuilder.build(items)).data
+
+        depth = 0
+        while data[0]["children"]:
+            data = data[0]["children"]
+            depth += 1
+        self.assertEqual(depth, 4998)
+
+
+class ChecklistStreamSerializerTests(SimpleTestCase):
+    def setUp(self):
+        self.items = [item(row_id) for row_id in range(1, 8)]
+        self.items[1].parent_id = 1
+        self.items[2].parent_id = 2
+        self.items[3].parent_id = 1
+        self.items[5].parent_id = 99
+        self.items[6].parent_id = 6
+
+    def test_json_matches_tree_serializer(self):
+        for chunk_size in (1, 2, 500):
+            with self.subTest(chunk_size=chunk_size):
+                chunks = list(
+                    ChecklistStreamSerializer(
+                        iter(self.items), chunk_size=chunk_size
+                    ).json()
+                )
+
+                self.assertEqual(
+                    json.loads("".join(chunks)),
+                    ChecklistTreeSerializer(
+                        TreeBuilder.build(self.items)
+                    ).data,
+                )
+
+    def test_ndjson_has_one_row_per_line(self):
+        lines = "".join(
+            ChecklistStreamSerializer(iter(self.items)).ndjson()
+        ).splitlines()
+
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual([row["id"] for row in rows], list(range(1, 8)))
+        self.assertEqual(rows[2]["parent_id"], 2)
+
+    def test_empty_sheet(self):
+        stream = ChecklistStreamSerializer(iter([]))
+
+        self.assertEqual(json.loads("".join(stream.json())), [])
+        self.assertEqual("".join(stream.ndjson()), "")
@@ -0,0 +1,65 @@
+from django.test import SimpleTestCase
+
+from checklist.domain.services import TreeBuilder, TreeIndex
+from checklist.domain.types import ChecklistItem
+
+
+def item(row_id, parent_id=None):
+    return ChecklistItem(
+        id=row_id,
+        name=str(row_id),
+        status="Not Started",
+        assignee="",
+        notes="",
+        parent_id=parent_id,
+    )
+
+
+class TreeIndexTests(SimpleTestCase):
+    def setUp(self):
+        # 1
+        #   2
+        #     3
+        #   4
+        # 5
+        # 6 (parent not on the sheet)
+        self.items = [
+            item(1),
+            item(2, parent_id=1),
+            item(3, parent_id=2),
+            item(4, parent_id=1),
+            item(5),
+            item(6, parent_id=99),
+        ]
+        self.index = TreeIndex(self.items)
+
+    def test_siblings(self):
+        self.assertEqual(self.index.previous_sibling(4).id, 2)
+        self.assertIsNone(self.index.previous_sibling(2))
+        self.assertEqual(self.index.next_sibling(1).id, 5)
+        self.assertEqual(self.index.next_sibling(5).id, 6)
+        self.assertIsNone(self.index.next_sibling(4))
+        self.assertIsNone(self.index.next_sibling(42))
+
+    def test_parent_and_depth(self):
+        self.assertEqual(self.index.parent(3).id, 2)
+        self.assertIsNone(self.index.parent(1))
+        self.assertIsNone(self.index.parent(6))
+        self.assertEqual(
+            [self.index.depth(row_id) for row_id in range(1, 7)],
+            [0, 1, 2, 1, 0, 0],
+        )
+
+    def test_subtree(self):
+        self.assertEqual(
+            [row.id for row in self.index.subtree(1)], [1, 2, 3, 4]
+        )
+        self.assertEqual([row.id for row in self.index.subtree(5)], [5])
+
+    def test_build_matches_flatten(self):
+        tree = TreeBuilder.build(self.items)
+
+        self.assertEqual([root.id for root in tree], [1, 5, 6])
+        self.assertEqual(
+            [row.id for row in TreeBuilder.flatten(tree)], [1, 2, 3, 4, 5, 6]
+        )
@@ -0,0 +1,83 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from checklist.application.use_cases import (
+    GetChecklist,
+    IndentItem,
+    MoveItemDown,
+    MoveItemUp,
+    OutdentItem,
+)
+from checklist.infrastructure.cache import column_map_cache, row_cache
+from checklist.infrastructure.gateways import SmartsheetGateway
+from checklist.tests.fakes import FakeSmartsheet
+from checklist.tests.test_gateways import flatten
+
+
+class StructuralMoveTests(SimpleTestCase):
+    def setUp(self):
+        row_cache.clear()
+        column_map_cache.clear()
+        self.fake = FakeSmartsheet()
+        patcher = mock.patch(
+            "checklist.infrastructure.gateways.get_smartsheet_client",
+            return_value=self.fake,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        # Keep nothing cached so every read has to go upstream.
+        max_sheets = row_cache.max_sheets
+        row_cache.max_sheets = 0
+        self.addCleanup(setattr, row_cache, "max_sheets", max_sheets)
+
+        self.sheet_id = self.fake.new_sheet()
+        self.a = self.fake.add(self.sheet_id, "A")
+        self.a1 = self.fake.add(self.sheet_id, "A1", parent_id=self.a)
+        self.a2 = self.fake.add(self.sheet_id, "A2", parent_id=self.a)
+        self.b = self.fake.add(self.sheet_id, "B")
+        self.b1 = self.fake.add(self.sheet_id, "B1", parent_id=self.b)
+        self.c = self.fake.add(self.sheet_id, "C")
+        self.fake.calls.clear()
+
+    def gateway(self):
+        return SmartsheetGateway(token="token", sheet_id=self.sheet_id)
+
+    def fresh_tree(self):
+        return flatten(GetChecklist(self.gateway()).execute())
+
+    def test_moves_cost_one_read_and_one_write(self):
+        for use_case, row_id in [
+            (MoveItemUp, self.b),
+            (MoveItemDown, self.a1),
+            (IndentItem, self.c),
+            (IndentItem, self.a),
+            (OutdentItem, self.a2),
+            (OutdentItem, self.a),
+            (MoveItemDown, self.a),
+        ]:
+            self.fake.calls.clear()
+            tree = use_case(self.gateway()).execute(row_id)
+
+            self.assertEqual(self.fake.calls["get_sheet"], 1)
+            self.assertEqual(self.fake.calls["update_rows"], 1)
+            self.assertEqual(flatten(tree), self.fresh_tree())
+
+    def test_concurrent_write_falls_back_to_fresh_read(self):
+        fake, sheet_id = self.fake, self.sheet_id
+
+        class RacingGateway(SmartsheetGateway):
+            def get_rows(self):
+                items = super().get_rows()
+                if fake.calls["get_sheet"] == 1:
+                    fake.add(sheet_id, "D")
+                return items
+
+        tree = MoveItemUp(
+            RacingGateway(token="token", sheet_id=sheet_id)
+        ).execute(self.c)
+
+        self.assertEqual(self.fake.calls["get_sheet"], 2)
+        self.assertEqual(flatten(tree), self.fresh_tree())
+        self.assertEqual(flatten(tree)[-1][1], "D")
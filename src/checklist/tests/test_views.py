@@ -0,0 +1,500 @@
+import json
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+
+from accounts.models import User
+from checklist.domain.models import Sheet
+from checklist.infrastructure.cache import (
+    column_map_cache,
+    row_cache,
+    sheet_changes,
+)
+from checklist.tests.fakes import (
+    FakeSheetMixin,
+    FakeSmartsheet,
+    share_sheet_changes,
+)
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+
+@override_settings(DB_ENCRYPTION_KEY="k" * 32)
+class ChecklistDeltaTests(FakeSheetMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.a = self.fake.add(self.smartsheet_id, "A")
+        self.b = self.fake.add(self.smartsheet_id, "B")
+        self.c = self.fake.add(self.smartsheet_id, "C")
+
+    def test_full_tree_without_since(self):
+        response = self.client.get(self.url("item-list"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item["name"] for item in response.data], ["A", "B", "C"]
+        )
+
+    def test_unknown_version_falls_back_to_full_tree(self):
+        response = self.client.get(self.url("item-list") + "?since=")
+
+        self.assertEqual(len(response.data["items"]), 3)
+        self.assertIsNotNone(response.data["version"])
+
+    def test_update_returns_changed_row_only(self):
+        version = self.client.get(self.url("item-list") + "?since=").data[
+            "version"
+        ]
+
+        response = self.client.put(
+            self.url("item-detail", row_id=self.b) + f"?since={version}",
+            {"status": "Complete"},
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["version"], version + 1)
+        self.assertEqual(
+            [node["id"] for node in response.data["changed"]], [self.b]
+        )
+        self.assertEqual(response.data["changed"][0]["status"], "Complete")
+        self.assertEqual(response.data["removed"], [])
+        self.assertEqual(response.data["order"], [])
+
+    def test_indent_reports_new_sibling_order(self):
+        version = self.client.get(self.url("item-list") + "?since=").data[
+            "version"
+        ]
+
+        response = self.client.post(
+            self.url("item-indent", row_id=self.b) + f"?since={version}"
+        )
+
+        self.assertEqual(
+            [node["id"] for node in response.data["changed"]], [self.b]
+        )
+        self.assertCountEqual(
+            response.data["order"],
+            [
+                {"parent_id": None, "children": [self.a, self.c]},
+                {"parent_id": self.a, "children": [self.b]},
+            ],
+        )
+
+    def test_delete_reports_removed_row(self):
+        version = self.client.get(self.url("item-list") + "?since=").data[
+            "version"
+        ]
+
+        response = self.client.delete(
+            self.url("item-detail", row_id=self.c) + f"?since={version}"
+        )
+
+        self.assertEqual(response.data["removed"], [self.c])
+        self.assertEqual(response.data["changed"], [])
+
+
+@override_settings(DB_ENCRYPTION_KEY="k" * 32)
+class ChecklistStreamTests(FakeSheetMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.a = self.fake.add(self.smartsheet_id, "A")
+        self.a1 = self.fake.add(self.smartsheet_id, "A1", parent_id=self.a)
+        self.b = self.fake.add(self.smartsheet_id, "B")
+
+    def test_streamed_tree_matches_response(self):
+        expected = self.client.get(self.url("item-list")).json()
+
+        response = self.client.get(self.url("item-list") + "?stream=json")
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(
+            json.loads(b"".join(response.streaming_content)), expected
+        )
+
+    def test_ndjson_rows(self):
+        response = self.client.get(
+            self.url("item-list"),
+            {"stream": "ndjson"},
+            HTTP_ACCEPT="application/json",
+        )
+
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        rows = [
+            json.loads(line)
+            for line in b"".join(response.streaming_content).splitlines()
+        ]
+        self.assertEqual(
+            [(row["id"], row["parent_id"]) for row in rows],
+            [(self.a, None), (self.a1, self.a), (self.b, None)],
+        )
+
+    @override_settings(SMARTSHEET_PAGE_SIZE=2)
+    def test_sheet_that_keeps_changing_is_a_conflict(self):
+        fetch = self.fake.Sheets.get_sheet
+
+        def get_sheet(sheet_id, **kwargs):
+            sheet = fetch(sheet_id, **kwargs)
+            self.fake.add(self.smartsheet_id, "New")
+            return sheet
+
+        with mock.patch.object(self.fake.Sheets, "get_sheet", get_sheet):
+            response = self.client.get(self.url("item-list"))
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertIn("changed", response.data["error"])
+
+
+def read_events(response):
+    events = []
+    for block in b"".join(response.streaming_content).decode().split("\n\n"):
+        fields = dict(
+            line.split(": ", 1)
+            for line in block.splitlines()
+            if not line.startswith(":")
+        )
+        if "event" in fields:
+            events.append(
+                (
+                    int(fields["id"]),
+                    fields["event"],
+                    json.loads(fields["data"]),
+                )
+            )
+    return events
+
+
+@override_settings(
+    DB_ENCRYPTION_KEY="k" * 32, SMARTSHEET_EVENTS_STREAM_SECONDS=0
+)
+class SheetEventsViewTests(FakeSheetMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.a = self.fake.add(self.smartsheet_id, "A")
+        self.b = self.fake.add(self.smartsheet_id, "B")
+
+    def events(self, last_id="0"):
+        response = self.client.get(
+            self.url("sheet-events"),
+            HTTP_ACCEPT="text/event-stream",
+            HTTP_LAST_EVENT_ID=last_id,
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        return read_events(response)
+
+    def test_writes_are_pushed_as_deltas(self):
+        version = self.client.get(self.url("item-list") + "?since=").data[
+            "version"
+        ]
+        self.client.put(
+            self.url("item-detail", row_id=self.b) + f"?since={version}",
+            {"status": "Complete"},
+        )
+        self.client.post(self.url("item-indent", row_id=self.b))
+
+        (first, second) = self.events()
+
+        self.assertEqual(first[:2], (1, "change"))
+        self.assertEqual(first[2]["since"], version)
+        self.assertEqual(first[2]["version"], version + 1)
+        self.assertEqual(
+            [(node["id"], node["status"]) for node in first[2]["changed"]],
+            [(self.b, "Complete")],
+        )
+        self.assertEqual(
+            second, (2, "change", {"since": None, "version": version + 2})
+        )
+        self.assertEqual(self.events(last_id="1"), [second])
+
+    def test_reads_are_not_pushed(self):
+        self.client.get(self.url("item-list") + "?since=")
+
+        self.assertEqual(self.events(), [])
+
+    def test_missed_events_ask_for_reload(self):
+        self.client.put(self.url("item-detail", row_id=self.a), {"name": "A2"})
+        cache.clear()
+        self.client.put(self.url("item-detail", row_id=self.a), {"name": "A3"})
+
+        self.assertEqual(self.events(last_id="5"), [(1, "reload", {})])
+
+    def test_only_the_owner_can_follow_a_sheet(self):
+        other = User.objects.create_user(
+            email="other@example.com", name="Other", password="pass"
+        )
+        self.client.force_authenticate(user=other)
+
+        response = self.client.get(self.url("sheet-events"))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(DB_ENCRYPTION_KEY="k" * 32)
+class ItemBulkViewTests(FakeSheetMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.a = self.fake.add(self.smartsheet_id, "A")
+        self.b = self.fake.add(self.smartsheet_id, "B")
+        self.c = self.fake.add(self.smartsheet_id, "C")
+        self.fake.calls.clear()
+
+    def test_batches_consecutive_operations(self):
+        create = [
+            {
+                "op": "create",
+                "data": {
+                    "name": f"Step {n}",
+                    "status": "Not Started",
+                    "parent_id": self.a,
+                },
+            }
+            for n in range(3)
+        ]
+        response = self.client.post(
+            self.url("item-bulk"),
+            {
+                "operations": [
+                    *create,
+                    {"op": "update", "row_id": self.b, "data": {"name": "B2"}},
+                    {
+                        "op": "update",
+                        "row_id": self.b,
+                        "data": {"status": "Complete"},
+                    },
+                    {"op": "delete", "row_id": self.c},
+                    {"op": "move_up", "row_id": self.b},
+                ]
+            },
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item["name"] for item in response.data], ["B2", "A"])
+        self.assertEqual(response.data[0]["status"], "Complete")
+        self.assertEqual(
+            [item["name"] for item in response.data[1]["children"]],
+            ["Step 0", "Step 1", "Step 2"],
+        )
+        self.assertEqual(self.fake.calls["add_rows"], 1)
+        self.assertEqual(self.fake.calls["update_rows"], 2)
+        self.assertEqual(self.fake.calls["delete_rows"], 1)
+        self.assertEqual(self.fake.calls["get_sheet"], 1)
+
+    def test_large_batches_are_chunked(self):
+        with mock.patch(
+            "checklist.infrastructure.gateways.MAX_ROWS_PER_REQUEST", 2
+        ):
+            response = self.client.post(
+                self.url("item-bulk"),
+                {
+                    "operations": [
+                        {
+                            "op": "create",
+                            "data": {
+                                "name": f"Step {n}",
+                                "status": "Complete",
+                            },
+                        }
+                        for n in range(5)
+                    ]
+                },
+                format="json",
+            )
+
+        self.assertEqual(len(response.data), 8)
+        self.assertEqual(self.fake.calls["add_rows"], 3)
+
+    def test_rejects_invalid_operation_data(self):
+        response = self.client.post(
+            self.url("item-bulk"),
+            {"operations": [{"op": "update", "data": {"name": "X"}}]},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.fake.calls["update_rows"], 0)
+
+    def test_impossible_operation_fails_before_any_write(self):
+        response = self.client.post(
+            self.url("item-bulk"),
+            {
+                "operations": [
+                    {"op": "update", "row_id": self.b, "data": {"name": "B2"}},
+                    {"op": "move_down", "row_id": self.a},
+                    # B is on top once A has moved below it.
+                    {"op": "indent", "row_id": self.b},
+                ]
+            },
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.data["error"],
+            "Operation 2: Cannot indent: no sibling above",
+        )
+        self.assertEqual(self.fake.calls["update_rows"], 0)
+
+    def test_delete_of_unknown_row_fails(self):
+        response = self.client.post(
+            self.url("item-bulk"),
+            {
+                "operations": [
+                    {"op": "delete", "row_id": self.a},
+                    {"op": "delete", "row_id": self.a},
+                    {"op": "delete", "row_id": 999},
+                ]
+            },
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.data["error"], "Operation 2: Row 999 not found"
+        )
+        self.assertEqual(self.fake.calls["delete_rows"], 0)
+
+    def test_delete_of_row_gone_with_its_parent(self):
+        child = self.fake.add(self.smartsheet_id, "A1", parent_id=self.a)
+
+        response = self.client.post(
+            self.url("item-bulk"),
+            {
+                "operations": [
+                    {"op": "delete", "row_id": self.a},
+                    {"op": "delete", "row_id": child},
+                ]
+            },
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item["name"] for item in response.data], ["B", "C"])
+
+
+@override_settings(
+    DB_ENCRYPTION_KEY="k" * 32,
+    SMARTSHEET_WEBHOOK_URL="https://app.example.com/api/webhooks/smartsheet/",
+)
+class SmartsheetWebhookTests(APITestCase):
+    def setUp(self):
+        share_sheet_changes(self)
+        cache.clear()
+        row_cache.clear()
+        column_map_cache.clear()
+        self.fake = FakeSmartsheet()
+        self.fake.deliver = lambda body, headers: self.client.post(
+            reverse("checklist:smartsheet-webhook"),
+            body,
+            content_type="application/json",
+            headers=headers,
+        )
+        patcher = mock.patch(
+            "checklist.infrastructure.gateways.get_smartsheet_client",
+            return_value=self.fake,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.user = User.objects.create_user(
+            email="owner@example.com",
+            name="Owner",
+            password="pass",
+            smartsheet_token="token",
+        )
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.post(
+            reverse("checklist:sheet-list"), {"name": "Checklist"}
+        )
+        self.sheet = Sheet.objects.get(uuid=response.data["id"])
+        self.fake.add(self.sheet.smartsheet_id, "A")
+        self.items_url = reverse(
+            "checklist:item-list", kwargs={"sheet_uuid": self.sheet.uuid}
+        )
+
+    def test_sheet_creation_registers_webhook(self):
+        webhook = self.fake.webhooks[self.sheet.webhook_id]
+
+        self.assertTrue(webhook["enabled"])
+        self.assertEqual(webhook["scopeObjectId"], self.sheet.smartsheet_id)
+        self.assertEqual(self.sheet.webhook_secret, webhook["sharedSecret"])
+
+    def test_callback_invalidates_cached_rows(self):
+        self.client.get(self.items_url)
+        self.fake.calls.clear()
+
+        response = self.client.get(self.items_url)
+
+        self.assertEqual([item["name"] for item in response.data], ["A"])
+        self.assertEqual(self.fake.calls["get_sheet"], 0)
+        self.assertEqual(self.fake.calls["get_sheet_version"], 0)
+
+        self.fake.add(self.sheet.smartsheet_id, "B")
+        (callback,) = self.fake.notify(self.sheet.smartsheet_id)
+        self.assertEqual(callback.status_code, status.HTTP_200_OK)
+        self.fake.calls.clear()
+
+        response = self.client.get(self.items_url)
+
+        self.assertEqual([item["name"] for item in response.data], ["A", "B"])
+        self.assertEqual(self.fake.calls["get_sheet_version"], 1)
+        self.assertEqual(self.fake.calls["get_sheet"], 1)
+
+    def test_per_process_cache_keeps_version_check(self):
+        self.client.get(self.items_url)
+        self.fake.calls.clear()
+
+        with (
+            mock.patch.object(sheet_changes, "alias", "default"),
+            self.assertLogs("checklist.infrastructure.cache", "WARNING"),
+        ):
+            sheet_changes._warned = False
+            self.client.get(self.items_url)
+
+        self.assertEqual(self.fake.calls["get_sheet_version"], 1)
+
+    @override_settings(SMARTSHEET_EVENTS_STREAM_SECONDS=0)
+    def test_callback_tells_followers_to_reload(self):
+        self.fake.notify(self.sheet.smartsheet_id)
+
+        response = self.client.get(
+            reverse(
+                "checklist:sheet-events",
+                kwargs={"sheet_uuid": self.sheet.uuid},
+            ),
+            HTTP_LAST_EVENT_ID="0",
+        )
+
+        self.assertEqual(
+            read_events(response),
+            [(1, "change", {"since": None, "version": None})],
+        )
+
+    def test_rejects_unsigned_callback(self):
+        self.client.get(self.items_url)
+        self.fake.calls.clear()
+
+        response = self.client.post(
+            reverse("checklist:smartsheet-webhook"),
+            {"webhookId": self.sheet.webhook_id, "events": []},
+            format="json",
+            headers={"Smartsheet-Hmac-SHA256": "0" * 64},
+        )
+        self.client.get(self.items_url)
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.fake.calls["get_sheet_version"], 0)
+
+    def test_deleting_sheet_removes_webhook(self):
+        self.client.delete(
+            reverse(
+                "checklist:sheet-detail",
+                kwargs={"sheet_uuid": self.sheet.uuid},
+            )
+        )
+
+        self.assertEqual(self.fake.webhooks, {})
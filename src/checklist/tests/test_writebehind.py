@@ -0,0 +1,159 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import override_settings
+
+import smartsheet
+from checklist.domain.models import PendingWrite
+from checklist.infrastructure.cache import (
+    sheet_changes,
+    sheet_events,
+)
+from checklist.infrastructure.gateways import SmartsheetGateway
+from checklist.infrastructure.writebehind import WriteBehindProvider
+from checklist.tests.fakes import FakeSheetMixin
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+
+@override_settings(DB_ENCRYPTION_KEY="k" * 32, SMARTSHEET_WRITE_BEHIND=True)
+class WriteBehindTests(FakeSheetMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.a = self.fake.add(self.smartsheet_id, "A")
+        self.a1 = self.fake.add(self.smartsheet_id, "A1", parent_id=self.a)
+        self.b = self.fake.add(self.smartsheet_id, "B")
+
+    def flush(self):
+        call_command("flush_writes", "--once", stdout=StringIO())
+
+    def upstream_names(self):
+        name_column = self.fake.column_id(self.smartsheet_id, "Task Name")
+        return [
+            row["cells"].get(name_column)
+            for row in self.fake.rows(self.smartsheet_id)
+        ]
+
+    def test_edits_are_acknowledged_then_flushed_together(self):
+        self.client.get(self.url("item-list"))
+        self.fake.calls.clear()
+
+        self.client.put(self.url("item-detail", row_id=self.b), {"name": "B2"})
+        self.client.put(
+            self.url("item-detail", row_id=self.a1), {"name": "A1 done"}
+        )
+        response = self.client.put(
+            self.url("item-detail", row_id=self.b), {"status": "Complete"}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[1]["name"], "B2")
+        self.assertEqual(response.data[1]["status"], "Complete")
+        self.assertEqual(response.data[0]["children"][0]["name"], "A1 done")
+        self.assertEqual(self.fake.calls["update_rows"], 0)
+        self.assertEqual(self.fake.calls["get_sheet"], 0)
+
+        self.flush()
+
+        self.assertEqual(self.fake.calls["update_rows"], 1)
+        self.assertEqual(self.upstream_names(), ["A", "A1 done", "B2"])
+        self.assertFalse(PendingWrite.objects.exists())
+
+    def test_queued_delete_hides_subtree(self):
+        response = self.client.delete(self.url("item-detail", row_id=self.a))
+        self.assertEqual([item["name"] for item in response.data], ["B"])
+
+        response = self.client.put(
+            self.url("item-detail", row_id=self.a1), {"name": "X"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.flush()
+
+        self.assertEqual(self.upstream_names(), ["B"])
+
+    def test_rejected_write_is_reported_as_conflict(self):
+        self.client.put(self.url("item-detail", row_id=self.a1), {"name": "X"})
+        self.client.put(self.url("item-detail", row_id=self.b), {"name": "B2"})
+        # Someone else deletes the row before the queue is flushed.
+        self.fake.Sheets.delete_rows(self.smartsheet_id, [self.a1])
+
+        self.flush()
+        response = self.client.get(self.url("sheet-conflicts"))
+
+        self.assertEqual(self.upstream_names(), ["A", "B2"])
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]["row_id"], self.a1)
+        self.assertEqual(response.data[0]["data"], {"name": "X"})
+        self.assertEqual(response.data[0]["error"], "Not Found")
+
+    def test_rejected_delete_is_reported_as_conflict(self):
+        self.client.delete(self.url("item-detail", row_id=self.a1))
+        self.client.delete(self.url("item-detail", row_id=self.b))
+        delete_rows = self.fake.Sheets.delete_rows
+
+        def delete_unlocked(sheet_id, ids, **kwargs):
+            if self.a1 in ids:
+                error = smartsheet.models.Error(
+                    {"result": {"code": 1012, "message": "Row is locked"}}
+                )
+                raise smartsheet.exceptions.ApiError(error, "Row is locked")
+            return delete_rows(sheet_id, ids, **kwargs)
+
+        with mock.patch.object(
+            self.fake.Sheets, "delete_rows", delete_unlocked
+        ):
+            self.flush()
+        response = self.client.get(self.url("sheet-conflicts"))
+
+        self.assertEqual(self.upstream_names(), ["A", "A1"])
+        self.assertEqual(
+            [(item["row_id"], item["error"]) for item in response.data],
+            [(self.a1, "Row is locked")],
+        )
+        self.assertFalse(
+            PendingWrite.objects.filter(
+                status=PendingWrite.Status.PENDING
+            ).exists()
+        )
+
+    def test_update_without_cell_fields_is_not_queued(self):
+        provider = WriteBehindProvider(
+            SmartsheetGateway(token="token", sheet_id=self.smartsheet_id),
+            self.sheet,
+        )
+
+        (item,) = provider.update_rows({self.b: {"parent_id": self.a}})
+
+        self.assertEqual(item.name, "B")
+        self.assertFalse(PendingWrite.objects.exists())
+
+    def test_queued_edits_and_flush_are_published(self):
+        version = self.client.get(self.url("item-list") + "?since=").data[
+            "version"
+        ]
+        start = sheet_events.last_id(self.smartsheet_id)
+
+        self.client.put(
+            self.url("item-detail", row_id=self.b) + f"?since={version}",
+            {"name": "B2"},
+        )
+        self.flush()
+
+        (queued, flushed) = [
+            data for _, data in sheet_events.since(self.smartsheet_id, start)
+        ]
+        self.assertEqual(
+            (queued["since"], queued["version"]), (version, version)
+        )
+        self.assertEqual([node["name"] for node in queued["changed"]], ["B2"])
+        self.assertEqual(flushed, {"since": None, "version": version + 1})
+
+    def test_flush_gives_the_sheet_a_new_change_stamp(self):
+        self.client.put(self.url("item-detail", row_id=self.b), {"name": "B2"})
+
+        with mock.patch.object(sheet_changes, "bump") as bump:
+            self.flush()
+
+        bump.assert_called_with(self.smartsheet_id)
@@ -56,6 +56,7 @@ INSTALLED_APPS = [
 
 
 MIDDLEWARE = [
+    "core.profiling.ProfilingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -64,6 +65,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "checklist.infrastructure.metrics.UpstreamBudgetMiddleware",
 ]
 
 ROOT_URLCONF = "config.urls"
@@ -174,6 +176,128 @@ DB_ENCRYPTION_KEY = config(
     "DB_ENCRYPTION_KEY", default="change-this-key-in-production!!"
 )
 
+# Number of sheets whose rows are kept in the process-wide row cache
+SMARTSHEET_ROW_CACHE_SIZE = config(
+    "SMARTSHEET_ROW_CACHE_SIZE", default=256, cast=int
+)
+
+# Django cache alias that also stores sheet column ids, so every worker
+# can skip the sheet download needed to discover them. Memory only if unset.
+SMARTSHEET_COLUMN_MAP_CACHE = config(
+    "SMARTSHEET_COLUMN_MAP_CACHE", default=None
+)
+
+# Where checklist rows live: "smartsheet", or "memory" for an in-process
+# stand-in used for load tests and offline demos. Rows in memory are lost
+# on restart unless SMARTSHEET_MEMORY_PATH names a SQLite file for them.
+SMARTSHEET_PROVIDER = config("SMARTSHEET_PROVIDER", default="smartsheet")
+SMARTSHEET_MEMORY_PATH = config("SMARTSHEET_MEMORY_PATH", default="")
+
+# Rows per page when reading sheets; 0 reads each sheet in one request
+SMARTSHEET_PAGE_SIZE = config("SMARTSHEET_PAGE_SIZE", default=0, cast=int)
+
+# Smartsheet clients kept for reuse, and seconds an unused one is kept
+SMARTSHEET_CLIENT_POOL_SIZE = config(
+    "SMARTSHEET_CLIENT_POOL_SIZE", default=1024, cast=int
+)
+SMARTSHEET_CLIENT_TTL = config(
+    "SMARTSHEET_CLIENT_TTL", default=3600, cast=float
+)
+
+# Seconds a single-item edit waits for more edits to the same sheet so
+# they can go upstream in one update_rows call; 0 sends edits right away.
+SMARTSHEET_EDIT_COALESCE_WINDOW = config(
+    "SMARTSHEET_EDIT_COALESCE_WINDOW", default=0, cast=float
+)
+
+# Report the Smartsheet calls behind each response in a Server-Timing
+# header, and serve per-process call totals for Prometheus at
+# /api/metrics/. With SMARTSHEET_METRICS_TOKEN set, scrapers must send
+# it as "Authorization: Bearer <token>".
+SMARTSHEET_SERVER_TIMING = config(
+    "SMARTSHEET_SERVER_TIMING", default=DEBUG, cast=bool
+)
+SMARTSHEET_METRICS = config("SMARTSHEET_METRICS", default=DEBUG, cast=bool)
+SMARTSHEET_METRICS_TOKEN = config("SMARTSHEET_METRICS_TOKEN", default="")
+
+# Changes to a sheet are pushed to clients as server-sent events from
+# /api/sheets/<uuid>/events/. Events are kept for SMARTSHEET_EVENTS_TTL
+# seconds in the SMARTSHEET_EVENTS_CACHE alias, so reconnecting clients
+# catch up instead of reloading. With the default per-process
+# LocMemCache a client only hears about writes served by its own
+# worker; use a shared backend when running several workers. A stream holds
+# a worker thread, so it ends after SMARTSHEET_EVENTS_STREAM_SECONDS and
+# the browser reconnects.
+SMARTSHEET_EVENTS_CACHE = config("SMARTSHEET_EVENTS_CACHE", default="default")
+SMARTSHEET_EVENTS_TTL = config("SMARTSHEET_EVENTS_TTL", default=300, cast=int)
+SMARTSHEET_EVENTS_STREAM_SECONDS = config(
+    "SMARTSHEET_EVENTS_STREAM_SECONDS", default=300, cast=float
+)
+
+# Time auth, the sheet lookup, token decryption, tree building and
+# serialization of each request into its Server-Timing header. Requests
+# slower than PROFILING_SLOW_MS are logged, and the PROFILING_SAMPLE_RATE
+# share of them run under cProfile is saved to PROFILING_DIR.
+PROFILING_ENABLED = config("PROFILING_ENABLED", default=False, cast=bool)
+PROFILING_SLOW_MS = config("PROFILING_SLOW_MS", default=500, cast=float)
+PROFILING_SAMPLE_RATE = config(
+    "PROFILING_SAMPLE_RATE", default=0.1, cast=float
+)
+PROFILING_DIR = config("PROFILING_DIR", default=str(BASE_DIR / "profiles"))
+
+# Size of the keep-alive connection pool shared by all Smartsheet clients
+SMARTSHEET_MAX_CONNECTIONS = config(
+    "SMARTSHEET_MAX_CONNECTIONS", default=32, cast=int
+)
+
+# Outbound Smartsheet requests per minute allowed for each API token,
+# how many may go out back to back, and how long a request may queue for
+# its turn before the user gets a 429. The budget lives in the
+# SMARTSHEET_RATE_LIMIT_CACHE cache alias; with the default per-process
+# LocMemCache each worker has its own budget, so point the alias at a
+# shared backend (Redis, Memcached) when running several workers.
+SMARTSHEET_RATE_LIMIT = config("SMARTSHEET_RATE_LIMIT", default=300, cast=int)
+SMARTSHEET_RATE_LIMIT_BURST = config(
+    "SMARTSHEET_RATE_LIMIT_BURST", default=20, cast=int
+)
+SMARTSHEET_RATE_LIMIT_MAX_WAIT = config(
+    "SMARTSHEET_RATE_LIMIT_MAX_WAIT", default=10, cast=float
+)
+SMARTSHEET_RATE_LIMIT_CACHE = config(
+    "SMARTSHEET_RATE_LIMIT_CACHE", default="default"
+)
+
+# Public URL of the webhook receiver (.../api/webhooks/smartsheet/).
+# When set, new sheets get a Smartsheet webhook and change callbacks
+# expire the row mirror. If SMARTSHEET_WEBHOOK_CACHE also names a cache
+# shared by all workers (Redis, Memcached, database), the per-sheet
+# change stamps kept there let cached rows be served without a version
+# check; with a per-process cache such as the default LocMemCache the
+# stamps are ignored.
+SMARTSHEET_WEBHOOK_URL = config("SMARTSHEET_WEBHOOK_URL", default="")
+SMARTSHEET_WEBHOOK_CACHE = config(
+    "SMARTSHEET_WEBHOOK_CACHE", default="default"
+)
+
+# Rows mirrored by `manage.py sync_sheets` within this many seconds are
+# served by the checklist view without calling Smartsheet; 0 only falls
+# back to the mirror while Smartsheet is down for maintenance.
+SMARTSHEET_MIRROR_MAX_AGE = config(
+    "SMARTSHEET_MIRROR_MAX_AGE", default=0, cast=float
+)
+SMARTSHEET_MIRROR_INTERVAL = config(
+    "SMARTSHEET_MIRROR_INTERVAL", default=30, cast=float
+)
+
+# Queue cell edits and deletes and answer right away; a single
+# `manage.py flush_writes` worker sends them to Smartsheet in batches.
+SMARTSHEET_WRITE_BEHIND = config(
+    "SMARTSHEET_WRITE_BEHIND", default=False, cast=bool
+)
+SMARTSHEET_WRITE_BEHIND_INTERVAL = config(
+    "SMARTSHEET_WRITE_BEHIND_INTERVAL", default=2, cast=float
+)
+
 
 LOGGING = {
     "version": 1,
@@ -1,19 +1,26 @@
 from base64 import b64decode, b64encode
+from functools import lru_cache
 
 from django.conf import settings
 
+from core.profiling import span
 from Crypto.Cipher import AES
 
 CIPHER_SEPARATOR = "$"
 
 
-def get_encryption_key():
-    key = getattr(settings, "DB_ENCRYPTION_KEY", "")
+@lru_cache(maxsize=4)
+def _encryption_key(key: str) -> bytes:
     if not key or len(key) != 32:
         raise ValueError("DB_ENCRYPTION_KEY must be exactly 32 characters")
     return bytes(key, "utf-8")
 
 
+def get_encryption_key():
+    # Validated and encoded once per configured key, not per value.
+    return _encryption_key(getattr(settings, "DB_ENCRYPTION_KEY", ""))
+
+
 def encrypt(plaintext):
     if not plaintext:
         return plaintext
@@ -26,6 +33,7 @@ def encrypt(plaintext):
     return f"{nonce_b64}{CIPHER_SEPARATOR}{ciphertext_b64}"
 
 
+@span("decrypt")
 def decrypt(encrypted):
     if not encrypted or CIPHER_SEPARATOR not in encrypted:
         return encrypted
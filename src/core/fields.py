@@ -1,10 +1,60 @@
 from django.db import models
+from django.db.models.query_utils import DeferredAttribute
 
 from core.crypto import decrypt, encrypt
 
 
+class Ciphertext:
+    """Encrypted column value as loaded, not yet decrypted."""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value: str):
+        self.value = value
+
+    def __repr__(self):
+        return "Ciphertext(...)"
+
+
+class EncryptedAttribute(DeferredAttribute):
+    """Decrypt the field on first access and keep the plaintext.
+
+    Loading a row only wraps the stored value, so requests that never
+    read the field never pay for decrypting it.
+    """
+
+    def __get__(self, instance, cls=None):
+        if instance is None:
+            return self
+        value = super().__get__(instance, cls)
+        if isinstance(value, Ciphertext):
+            value = decrypt(value.value)
+            instance.__dict__[self.field.attname] = value
+        return value
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.field.attname] = value
+
+
 class EncryptedCharField(models.CharField):
+    """CharField stored AES-encrypted and decrypted lazily on access.
+
+    values() and values_list() bypass the model attribute and return
+    Ciphertext; pass it through to_python() to get the plaintext.
+    """
+
+    descriptor_class = EncryptedAttribute
+
+    def pre_save(self, model_instance, add):
+        # An untouched value is saved back as it was loaded.
+        value = model_instance.__dict__.get(self.attname)
+        if isinstance(value, Ciphertext):
+            return value
+        return super().pre_save(model_instance, add)
+
     def get_prep_value(self, value):
+        if isinstance(value, Ciphertext):
+            return value.value
         if not value:
             return value
         return encrypt(value)
@@ -12,9 +62,11 @@ class EncryptedCharField(models.CharField):
     def from_db_value(self, value, expression, connection):
         if not value:
             return value
-        return decrypt(value)
+        return Ciphertext(value)
 
     def to_python(self, value):
+        if isinstance(value, Ciphertext):
+            return decrypt(value.value)
         if not value:
             return value
         if "$" in value:
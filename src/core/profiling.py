@@ -0,0 +1,166 @@
+import cProfile
+import logging
+import os
+import random
+import re
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+logger = logging.getLogger(__name__)
+
+
+class RequestTimings:
+    """Time spent in each named span while serving one request."""
+
+    def __init__(self):
+        self.spans: dict[str, list] = {}
+
+    def add(self, name: str, seconds: float) -> None:
+        entry = self.spans.setdefault(name, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += 1
+
+    def server_timing(self, total: float) -> str:
+        entries = [
+            f"{name};dur={seconds * 1000:.1f}"
+            + (f';desc="{count}x"' if count > 1 else "")
+            for name, (seconds, count) in self.spans.items()
+        ]
+        entries.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(entries)
+
+
+_timings: ContextVar[RequestTimings | None] = ContextVar(
+    "request_timings", default=None
+)
+
+
+class Span:
+    """Time a block, or every call of a function, as a Server-Timing entry.
+
+    Spans with the same name add up. Outside a request served by
+    ProfilingMiddleware a span only costs a context variable lookup.
+    """
+
+    __slots__ = ("name", "timings", "started")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.timings = _timings.get()
+        if self.timings is not None:
+            self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.timings is not None:
+            self.timings.add(self.name, time.perf_counter() - self.started)
+
+    def __call__(self, func):
+        name = self.name
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            timings = _timings.get()
+            if timings is None:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                timings.add(name, time.perf_counter() - started)
+
+        return wrapper
+
+
+def span(name: str) -> Span:
+    """A Span named ``name``, for use as a context manager or decorator.
+
+    with span("tree"):
+        ...
+
+    @span("decrypt")
+    def decrypt(value): ...
+    """
+    return Span(name)
+
+
+def _start_profiler() -> cProfile.Profile | None:
+    if random.random() >= settings.PROFILING_SAMPLE_RATE:
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another profiler, such as the debug toolbar's, is running.
+        return None
+    return profiler
+
+
+class ProfilingMiddleware:
+    """Report where each request spends its time.
+
+    Adds the spans recorded while serving the request, plus the total,
+    to the ``Server-Timing`` header. Requests slower than
+    PROFILING_SLOW_MS are logged with their spans, and if the request
+    was one of the PROFILING_SAMPLE_RATE share run under cProfile, the
+    profile is saved to PROFILING_DIR for ``python -m pstats`` or
+    snakeviz. Removed from the stack unless PROFILING_ENABLED is set.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = RequestTimings()
+        token = _timings.set(timings)
+        profiler = _start_profiler()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            _timings.reset(token)
+        total = time.perf_counter() - started
+
+        response.headers["Server-Timing"] = ", ".join(
+            filter(
+                None,
+                [
+                    response.headers.get("Server-Timing"),
+                    timings.server_timing(total),
+                ],
+            )
+        )
+        if total * 1000 >= settings.PROFILING_SLOW_MS:
+            logger.warning(
+                "Slow request %s %s took %.0f ms: %s",
+                request.method,
+                request.path,
+                total * 1000,
+                timings.server_timing(total),
+            )
+            if profiler is not None:
+                self.dump(request, profiler, total)
+        return response
+
+    def dump(self, request, profiler: cProfile.Profile, total: float) -> None:
+        os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+        slug = re.sub(r"[^\w-]+", "-", request.path).strip("-") or "root"
+        path = os.path.join(
+            settings.PROFILING_DIR,
+            f"{time.strftime('%Y%m%d-%H%M%S')}-{request.method}-{slug}-"
+            f"{total * 1000:.0f}ms.prof",
+        )
+        profiler.dump_stats(path)
+        logger.info(
+            "Saved profile of %s %s to %s", request.method, request.path, path
+        )
@@ -107,6 +107,75 @@ async function refreshToken() {
   return false;
 }
 
+// Follows a sheet's server-sent events, calling onEvent(name, data) for
+// each one. EventSource cannot send the Authorization header, so the
+// stream is read with fetch; it reconnects with Last-Event-ID until the
+// returned function is called.
+function watchSheet(sheetId, onEvent) {
+  const controller = new AbortController();
+  let lastId = "";
+
+  const dispatch = (block) => {
+    let name = "message";
+    let data = "";
+    for (const line of block.split("\n")) {
+      const [field, ...rest] = line.split(": ");
+      const value = rest.join(": ");
+      if (field === "id") lastId = value;
+      if (field === "event") name = value;
+      if (field === "data") data += value;
+    }
+    if (data) onEvent(name, JSON.parse(data));
+  };
+
+  const connect = async () => {
+    const headers = { Accept: "text/event-stream" };
+    const token = localStorage.getItem("access_token");
+    if (token) headers["Authorization"] = `Bearer ${token}`;
+    if (lastId) headers["Last-Event-ID"] = lastId;
+
+    const response = await fetch(`${API_BASE}/sheets/${sheetId}/events/`, {
+      headers,
+      signal: controller.signal,
+    });
+    // Retry with a refreshed token, or give up when it cannot be.
+    if (response.status === 401 && !(await refreshToken())) {
+      controller.abort();
+    }
+    if (!response.ok) throw new ApiError("Stream failed", response.status);
+
+    const reader = response.body
+      .pipeThrough(new TextDecoderStream())
+      .getReader();
+    let buffer = "";
+    for (;;) {
+      const { value, done } = await reader.read();
+      if (done) return;
+      buffer += value;
+      const blocks = buffer.split("\n\n");
+      buffer = blocks.pop();
+      blocks.forEach(dispatch);
+    }
+  };
+
+  (async () => {
+    while (!controller.signal.aborted) {
+      try {
+        await connect();
+      } catch (err) {
+        if (controller.signal.aborted) return;
+      }
+      await new Promise((r) => setTimeout(r, 1000));
+    }
+  })();
+
+  return () => controller.abort();
+}
+
+// Item endpoints answer with a delta against the given sheet version,
+// or with {version, items} when the server no longer has that version.
+const since = (version) => `?since=${version ?? ""}`;
+
 export const api = {
   register: (data) =>
     request("/register/", { method: "POST", body: JSON.stringify(data) }),
@@ -125,25 +194,45 @@ export const api = {
   deleteSheet: (sheetId) =>
     request(`/sheets/${sheetId}/`, { method: "DELETE" }),
 
-  getItems: (sheetId) => request(`/sheets/${sheetId}/items/`),
-  createItem: (sheetId, data) =>
-    request(`/sheets/${sheetId}/items/create/`, {
+  getItems: (sheetId, version) =>
+    request(`/sheets/${sheetId}/items/${since(version)}`),
+  createItem: (sheetId, data, version) =>
+    request(`/sheets/${sheetId}/items/create/${since(version)}`, {
       method: "POST",
       body: JSON.stringify(data),
     }),
-  updateItem: (sheetId, rowId, data) =>
-    request(`/sheets/${sheetId}/items/${rowId}/`, {
+  updateItem: (sheetId, rowId, data, version) =>
+    request(`/sheets/${sheetId}/items/${rowId}/${since(version)}`, {
       method: "PUT",
       body: JSON.stringify(data),
     }),
-  deleteItem: (sheetId, rowId) =>
-    request(`/sheets/${sheetId}/items/${rowId}/`, { method: "DELETE" }),
-  indentItem: (sheetId, rowId) =>
-    request(`/sheets/${sheetId}/items/${rowId}/indent/`, { method: "POST" }),
-  outdentItem: (sheetId, rowId) =>
-    request(`/sheets/${sheetId}/items/${rowId}/outdent/`, { method: "POST" }),
-  moveItemUp: (sheetId, rowId) =>
-    request(`/sheets/${sheetId}/items/${rowId}/move-up/`, { method: "POST" }),
-  moveItemDown: (sheetId, rowId) =>
-    request(`/sheets/${sheetId}/items/${rowId}/move-down/`, { method: "POST" }),
+  deleteItem: (sheetId, rowId, version) =>
+    request(`/sheets/${sheetId}/items/${rowId}/${since(version)}`, {
+      method: "DELETE",
+    }),
+  indentItem: (sheetId, rowId, version) =>
+    request(`/sheets/${sheetId}/items/${rowId}/indent/${since(version)}`, {
+      method: "POST",
+    }),
+  outdentItem: (sheetId, rowId, version) =>
+    request(`/sheets/${sheetId}/items/${rowId}/outdent/${since(version)}`, {
+      method: "POST",
+    }),
+  moveItemUp: (sheetId, rowId, version) =>
+    request(`/sheets/${sheetId}/items/${rowId}/move-up/${since(version)}`, {
+      method: "POST",
+    }),
+  moveItemDown: (sheetId, rowId, version) =>
+    request(`/sheets/${sheetId}/items/${rowId}/move-down/${since(version)}`, {
+      method: "POST",
+    }),
+  bulkItems: (sheetId, operations, version) =>
+    request(`/sheets/${sheetId}/items/bulk/${since(version)}`, {
+      method: "POST",
+      body: JSON.stringify({ operations }),
+    }),
+  watchSheet,
+  getConflicts: (sheetId) => request(`/sheets/${sheetId}/conflicts/`),
+  clearConflicts: (sheetId) =>
+    request(`/sheets/${sheetId}/conflicts/`, { method: "DELETE" }),
 };
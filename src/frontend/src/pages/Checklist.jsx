@@ -20,6 +20,36 @@ function updateInTree(items, rowId, data) {
   }));
 }
 
+function applyDelta(items, delta) {
+  const nodes = new Map();
+  const order = new Map();
+
+  const collect = (list, parentId) => {
+    order.set(parentId, list.map((item) => item.id));
+    for (const { children, ...node } of list) {
+      nodes.set(node.id, node);
+      collect(children || [], node.id);
+    }
+  };
+  collect(items, null);
+
+  for (const id of delta.removed) nodes.delete(id);
+  for (const node of delta.changed) nodes.set(node.id, node);
+  for (const { parent_id, children } of delta.order) {
+    order.set(parent_id, children);
+  }
+
+  const build = (parentId) =>
+    (order.get(parentId) || [])
+      .filter((id) => nodes.has(id))
+      .map((id) => ({ ...nodes.get(id), children: build(id) }));
+  return build(null);
+}
+
+function applyResult(items, result) {
+  return result.items ? result.items : applyDelta(items, result);
+}
+
 export default function Checklist() {
   const { sheetId } = useParams();
   const [items, setItems] = useState([]);
@@ -33,18 +63,44 @@ export default function Checklist() {
     parent_id: "",
   });
   const [busyRowId, setBusyRowId] = useState(null);
+  const [conflicts, setConflicts] = useState([]);
   const prevItems = useRef(null);
+  const version = useRef(null);
 
   const isBusy = busyRowId !== null;
 
   useEffect(() => {
+    version.current = null;
     loadItems();
+    loadConflicts();
   }, [sheetId]);
 
+  // Other users' edits arrive as deltas from the version they started
+  // at; when that is not ours, catch up with a delta read instead.
+  useEffect(
+    () =>
+      api.watchSheet(sheetId, (name, event) => {
+        if (
+          name === "change" &&
+          event.changed &&
+          event.since === version.current
+        ) {
+          setItems((prev) => applyDelta(prev, event));
+          version.current = event.version;
+        } else if (name === "reload" || event.version !== version.current) {
+          loadItems();
+          // Queued edits Smartsheet rejected show up after a flush.
+          loadConflicts();
+        }
+      }),
+    [sheetId],
+  );
+
   const loadItems = async () => {
     try {
-      const data = await api.getItems(sheetId);
-      setItems(data);
+      const result = await api.getItems(sheetId, version.current);
+      setItems((prev) => applyResult(prev, result));
+      version.current = result.version;
       setError(null);
     } catch (err) {
       setError(err);
@@ -53,6 +109,19 @@ export default function Checklist() {
     }
   };
 
+  const loadConflicts = async () => {
+    try {
+      setConflicts(await api.getConflicts(sheetId));
+    } catch (err) {
+      // Conflicts are informational; the checklist itself still works.
+    }
+  };
+
+  const dismissConflicts = async () => {
+    await api.clearConflicts(sheetId).catch(() => {});
+    setConflicts([]);
+  };
+
   const withBusy = async (rowId, optimisticUpdate, apiCall) => {
     prevItems.current = items;
     if (optimisticUpdate) optimisticUpdate();
@@ -63,8 +132,11 @@ export default function Checklist() {
     setError(null);
 
     try {
-      const result = await apiCall();
-      if (result) setItems(result);
+      const result = await apiCall(version.current);
+      if (result) {
+        setItems(applyResult(prevItems.current, result));
+        version.current = result.version;
+      }
     } catch (err) {
       if (prevItems.current) setItems(prevItems.current);
       setError(err);
@@ -108,7 +180,7 @@ export default function Checklist() {
     if (!newItem.name.trim()) return;
 
     const payload = { ...newItem, parent_id: newItem.parent_id || null };
-    await withBusy("new", null, () => api.createItem(sheetId, payload));
+    await withBusy("new", null, (v) => api.createItem(sheetId, payload, v));
     setNewItem({
       name: "",
       status: "Not Started",
@@ -122,7 +194,7 @@ export default function Checklist() {
     await withBusy(
       rowId,
       () => setItems((prev) => updateInTree(prev, rowId, data)),
-      () => api.updateItem(sheetId, rowId, data),
+      (v) => api.updateItem(sheetId, rowId, data, v),
     );
   };
 
@@ -132,24 +204,24 @@ export default function Checklist() {
     await withBusy(
       rowId,
       () => setItems((prev) => removeFromTree(prev, rowId)),
-      () => api.deleteItem(sheetId, rowId),
+      (v) => api.deleteItem(sheetId, rowId, v),
     );
   };
 
   const handleIndent = async (rowId) => {
-    await withBusy(rowId, null, () => api.indentItem(sheetId, rowId));
+    await withBusy(rowId, null, (v) => api.indentItem(sheetId, rowId, v));
   };
 
   const handleOutdent = async (rowId) => {
-    await withBusy(rowId, null, () => api.outdentItem(sheetId, rowId));
+    await withBusy(rowId, null, (v) => api.outdentItem(sheetId, rowId, v));
   };
 
   const handleMoveUp = async (rowId) => {
-    await withBusy(rowId, null, () => api.moveItemUp(sheetId, rowId));
+    await withBusy(rowId, null, (v) => api.moveItemUp(sheetId, rowId, v));
   };
 
   const handleMoveDown = async (rowId) => {
-    await withBusy(rowId, null, () => api.moveItemDown(sheetId, rowId));
+    await withBusy(rowId, null, (v) => api.moveItemDown(sheetId, rowId, v));
   };
 
   if (loading) {
@@ -205,6 +277,30 @@ export default function Checklist() {
         </div>
       )}
 
+      {conflicts.length > 0 && (
+        <div className="alert alert-warning py-2">
+          <div className="d-flex justify-content-between align-items-center">
+            <strong>Some changes could not be saved to Smartsheet</strong>
+            <button
+              className="btn btn-sm btn-outline-secondary"
+              onClick={dismissConflicts}
+            >
+              Dismiss
+            </button>
+          </div>
+          <ul className="mb-0 small">
+            {conflicts.map((conflict) => (
+              <li key={conflict.id}>
+                {conflict.op === "delete" ? "Delete" : "Update"} of row{" "}
+                {conflict.row_id}
+                {conflict.data?.name ? ` ("${conflict.data.name}")` : ""}:{" "}
+                {conflict.error}
+              </li>
+            ))}
+          </ul>
+        </div>
+      )}
+
       <form
         onSubmit={handleCreateItem}
         className="mb-4 p-3 bg-light border rounded"